@@ -0,0 +1,49 @@
+"""add active key index to queue jobs
+
+Revision ID: a4d81f6c2e90
+Revises: e7b3c9a4d215
+Create Date: 2026-10-18 21:47:52.630418
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d81f6c2e90"
+down_revision: Union[str, None] = "e7b3c9a4d215"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_STATUSES = "status IN ('PENDING', 'LEASED')"
+
+
+def upgrade() -> None:
+    # Keep the oldest of the active jobs enqueued twice for the same key
+    op.execute(
+        f"""
+        UPDATE queue_jobs
+        SET status = 'FAILED', last_error = 'Duplicate of an active job'
+        WHERE key IS NOT NULL AND {ACTIVE_STATUSES}
+        AND id NOT IN (
+            SELECT MIN(id) FROM queue_jobs
+            WHERE key IS NOT NULL AND {ACTIVE_STATUSES}
+            GROUP BY queue, key
+        )
+        """
+    )
+    op.create_index(
+        "ix_queue_jobs_active_key",
+        "queue_jobs",
+        ["queue", "key"],
+        unique=True,
+        sqlite_where=sa.text(ACTIVE_STATUSES),
+        postgresql_where=sa.text(ACTIVE_STATUSES),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_queue_jobs_active_key", table_name="queue_jobs")
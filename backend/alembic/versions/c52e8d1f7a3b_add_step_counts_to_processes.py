@@ -0,0 +1,52 @@
+"""add step counts to processes
+
+Revision ID: c52e8d1f7a3b
+Revises: 3f7a9e2b6d14
+Create Date: 2026-10-18 19:12:47.305816
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c52e8d1f7a3b"
+down_revision: Union[str, None] = "3f7a9e2b6d14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STEP_COUNT_COLUMNS = {
+    "pending_step_count": "PENDING",
+    "in_progress_step_count": "IN_PROGRESS",
+    "completed_step_count": "COMPLETED",
+    "failed_step_count": "FAILED",
+}
+
+
+def upgrade() -> None:
+    for column in STEP_COUNT_COLUMNS:
+        op.add_column(
+            "processes",
+            sa.Column(column, sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    # Count the steps of the existing processes
+    for column, status in STEP_COUNT_COLUMNS.items():
+        op.execute(
+            f"""
+            UPDATE processes SET {column} = (
+                SELECT COUNT(*) FROM process_steps
+                WHERE process_steps.process_id = processes.id
+                AND process_steps.status = '{status}'
+                AND process_steps.deleted_at IS NULL
+            )
+            """
+        )
+
+
+def downgrade() -> None:
+    for column in STEP_COUNT_COLUMNS:
+        op.drop_column("processes", column)
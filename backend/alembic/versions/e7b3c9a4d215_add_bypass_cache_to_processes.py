@@ -0,0 +1,39 @@
+"""add bypass cache to processes
+
+Revision ID: e7b3c9a4d215
+Revises: c52e8d1f7a3b
+Create Date: 2026-10-18 21:03:26.114592
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b3c9a4d215"
+down_revision: Union[str, None] = "c52e8d1f7a3b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "processes",
+        sa.Column("bypass_cache", sa.Boolean(), nullable=False, server_default="0"),
+    )
+
+    # The flag used to be stored in the process details sent to the extract API
+    op.execute(
+        """
+        UPDATE processes
+        SET bypass_cache = 1, details = json_remove(details, '$.bypass_cache')
+        WHERE json_extract(details, '$.bypass_cache') = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("processes", "bypass_cache")
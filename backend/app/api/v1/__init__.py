@@ -5,6 +5,7 @@ from .processes import process_router
 from .process_steps import process_step_router
 from .extract import extract_router
 from .chat import chat_router
+from .events import event_router
 
 v1_router = APIRouter()
 v1_router.include_router(project_router, prefix="/projects")
@@ -13,3 +14,4 @@ v1_router.include_router(process_router, prefix="/processes")
 v1_router.include_router(process_step_router, prefix="/process_steps")
 v1_router.include_router(extract_router, prefix="/extract")
 v1_router.include_router(chat_router, prefix="/chat")
+v1_router.include_router(event_router, prefix="/events")
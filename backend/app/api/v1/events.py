@@ -0,0 +1,60 @@
+import json
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.database import get_db
+from app.processing.event_bus import event_bus
+from app.repositories import project_repository
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+event_router = APIRouter()
+
+
+def format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def iter_events(
+    project_id: Optional[int] = None, keepalive: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Stream the events of a project, or of all projects, as server-sent events.
+
+    A comment is sent when nothing happened for keepalive seconds so proxies keep
+    the connection open. When the client is too slow and events were dropped, a
+    resync event tells it to reload the state from the REST endpoints.
+    """
+    keepalive = keepalive or settings.event_stream_keepalive
+    subscription = event_bus.subscribe(project_id)
+    dropped = 0
+    try:
+        yield ": connected\n\n"
+        while True:
+            event = await subscription.get(keepalive)
+            if subscription.dropped != dropped:
+                dropped = subscription.dropped
+                yield format_event({"type": "resync", "project_id": project_id, "data": {}})
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(event)
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@event_router.get("/")
+def stream_events(project_id: Optional[int] = None, db: Session = Depends(get_db)):
+    if project_id is not None:
+        project = project_repository.get_project(db=db, project_id=project_id)
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+    # The stream can stay open for hours, it must not hold a database connection
+    db.close()
+
+    return StreamingResponse(
+        iter_events(project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
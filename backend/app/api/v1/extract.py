@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.repositories import project_repository
 from app.repositories import user_repository
-from app.requests import extract_data, extract_field_descriptions
+from app.requests import extract_data_async, extract_field_descriptions_async
 from app.logger import Logger
 import traceback
 from app.config import settings
@@ -52,7 +52,7 @@ async def extract(
         if asset_content:
             asset_content = "\n".join(asset_content.content["content"])
 
-        data = extract_data(
+        data = await extract_data_async(
             api_token=api_key.key,
             fields=fields.dict(),
             file_path=asset.path if not asset_content else None,
@@ -90,7 +90,7 @@ async def get_field_descriptions(
         success = False
         while retries < settings.max_retries and not success:
             try:
-                data = extract_field_descriptions(
+                data = await extract_field_descriptions_async(
                     api_token=api_key.key, fields=fields.fields
                 )
                 success = True
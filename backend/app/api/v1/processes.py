@@ -1,24 +1,34 @@
-import io
+import itertools
 import os
 import traceback
-import zipfile
+from typing import List, Optional, Tuple
 
-from app.processing.process_queue import submit_process
+from app.processing.process_queue import (
+    clear_extraction_cache,
+    get_extraction_cache_stats,
+    submit_process,
+)
 from app.requests import get_user_usage_data
-import dateparser
-from fastapi import APIRouter, Depends, HTTPException, Response
+from app.processing.export_writers import (
+    CsvWriter,
+    ExportFormatUnavailable,
+    get_export_writer,
+    iter_csv,
+)
+from app.processing.process_export import ProcessExport
+from app.processing.zip_stream import iter_zip
+from app.vectorstore.chroma import get_embedding_cache_stats
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-import csv
-from io import StringIO
 
+from app.config import settings
 from app.database import get_db
 from app.repositories import process_repository, user_repository
 from app.repositories import project_repository
-from app.models import ProcessStatus, ProcessStep
+from app.models import ProcessStatus
 from app.schemas.process import ProcessData, ProcessSuggestion
 
-from app.models.process_step import ProcessStepStatus
 from app.logger import Logger
 
 process_router = APIRouter()
@@ -26,6 +36,34 @@ process_router = APIRouter()
 logger = Logger()
 
 
+@process_router.get("/extraction-cache/stats")
+def get_extraction_cache(db: Session = Depends(get_db)):
+    return {
+        "status": "success",
+        "message": "Extraction cache stats successfully returned",
+        "data": get_extraction_cache_stats(db),
+    }
+
+
+@process_router.delete("/extraction-cache")
+def delete_extraction_cache(db: Session = Depends(get_db)):
+    deleted = clear_extraction_cache(db)
+    return {
+        "status": "success",
+        "message": "Extraction cache successfully cleared",
+        "data": {"deleted": deleted},
+    }
+
+
+@process_router.get("/embedding-cache/stats")
+def get_embedding_cache():
+    return {
+        "status": "success",
+        "message": "Embedding cache stats successfully returned",
+        "data": get_embedding_cache_stats(),
+    }
+
+
 @process_router.get("/{process_id}")
 def get_process(process_id: int, db: Session = Depends(get_db)):
     process = process_repository.get_process(db=db, process_id=process_id)
@@ -61,38 +99,73 @@ def get_process(process_id: int, db: Session = Depends(get_db)):
     }
 
 
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+PROCESS_FIELDS = {
+    "id": lambda process: process.id,
+    "name": lambda process: process.name,
+    "type": lambda process: process.type,
+    "status": lambda process: process.status,
+    "project": lambda process: process.project.name,
+    "project_id": lambda process: f"{process.project_id}",
+    "details": lambda process: process.details,
+    "started_at": lambda process: isoformat(process.started_at),
+    "completed_at": lambda process: isoformat(process.completed_at),
+    "created_at": lambda process: isoformat(process.created_at),
+    "updated_at": lambda process: isoformat(process.updated_at),
+    "completed_step_count": lambda process: process.completed_step_count,
+    "pending_step_count": lambda process: process.pending_step_count,
+    "in_progress_step_count": lambda process: process.in_progress_step_count,
+    "failed_step_count": lambda process: process.failed_step_count,
+}
+
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    """Return the requested fields in order, always with the id used as cursor."""
+    if fields is None:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(allowed)}.",
+        )
+    return ["id"] + [field for field in requested if field != "id"]
+
+
+def next_cursor(rows: list, limit: Optional[int], get_id) -> Tuple[list, Optional[int]]:
+    """Trim the extra row fetched past a page and return the cursor of the next page."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, get_id(rows[-1])
+
+
 @process_router.get("/")
-def get_processes(db: Session = Depends(get_db)):
-    processes = process_repository.get_processes(db=db)
+def get_processes(
+    cursor: Optional[int] = Query(None, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    fields = parse_fields(fields, PROCESS_FIELDS) or list(PROCESS_FIELDS)
+    processes = process_repository.get_processes(
+        db=db, cursor=cursor, limit=limit, load_details="details" in fields
+    )
+    processes, cursor = next_cursor(processes, limit, lambda process: process.id)
 
     return {
         "status": "success",
         "message": "Processes successfully returned",
         "data": [
-            {
-                "id": process.id,
-                "name": process.name,
-                "type": process.type,
-                "status": process.status,
-                "project": process.project.name,
-                "project_id": f"{process.project_id}",
-                "details": process.details,
-                "started_at": (
-                    process.started_at.isoformat() if process.started_at else None
-                ),
-                "completed_at": (
-                    process.completed_at.isoformat() if process.completed_at else None
-                ),
-                "created_at": (
-                    process.created_at.isoformat() if process.created_at else None
-                ),
-                "updated_at": (
-                    process.updated_at.isoformat() if process.updated_at else None
-                ),
-                "completed_step_count": step_count,
-            }
-            for process, step_count in processes
+            {field: PROCESS_FIELDS[field](process) for field in fields}
+            for process in processes
         ],
+        "next_cursor": cursor,
     }
 
 
@@ -116,15 +189,9 @@ def start_process(process: ProcessData, db: Session = Depends(get_db)):
     if not assets[0]:
         raise HTTPException(status_code=404, detail="No Asset found!")
 
-    for asset in assets[0]:
-        process_step = ProcessStep(
-            process_id=process.id,
-            asset_id=asset.id,
-            output=None,
-            status=ProcessStepStatus.PENDING,
-        )
-        db.add(process_step)
-        db.commit()
+    process_repository.create_process_steps(
+        db, process.id, [asset.id for asset in assets[0]]
+    )
 
     logger.log(f"Add to process {process.id} to the queue")
     submit_process(process.id)
@@ -151,8 +218,7 @@ def stop_processes(process_id: int, db: Session = Depends(get_db)):
     process = process_repository.get_process(db, process_id)
 
     if process.status in [ProcessStatus.IN_PROGRESS, ProcessStatus.PENDING]:
-        process.status = ProcessStatus.STOPPED
-        db.commit()
+        process_repository.update_process_status(db, process, ProcessStatus.STOPPED)
     else:
         raise HTTPException(
             status_code=404, detail="Process not in a state to be stopped"
@@ -181,8 +247,7 @@ def resume_processes(process_id: int, db: Session = Depends(get_db)):
     process = process_repository.get_process(db, process_id)
 
     if process.status in [ProcessStatus.STOPPED, ProcessStatus.FAILED]:
-        process.status = ProcessStatus.PENDING
-        db.commit()
+        process_repository.update_process_status(db, process, ProcessStatus.PENDING)
         logger.log(f"Add to process {process.id} to the queue")
         submit_process(process.id)
 
@@ -196,219 +261,79 @@ def resume_processes(process_id: int, db: Session = Depends(get_db)):
     }
 
 
-@process_router.get("/{process_id}/download-csv")
-def download_process(process_id: int, db: Session = Depends(get_db)):
+def get_process_export(db: Session, process_id: int):
+    """Return the export of a process, or the error response explaining why there is none."""
     process = process_repository.get_process(db=db, process_id=process_id)
     if not process:
-        return {
+        return None, {
             "status": "error",
             "message": "Process not found",
             "data": None,
         }
 
-    process_steps = process_repository.get_process_steps(db=db, process_id=process_id)
-    if not process_steps:
-        return {
+    if not process_repository.has_process_steps(db=db, process_id=process_id):
+        return None, {
             "status": "error",
             "message": "Process steps not found",
             "data": None,
         }
 
-    completed_steps = [
-        step for step in process_steps if step.status == ProcessStepStatus.COMPLETED
-    ]
-    if not completed_steps:
-        return {
+    export = ProcessExport.for_process(db, process, batch_size=settings.export_batch_size)
+    if export is None:
+        return None, {
             "status": "error",
             "message": "No completed steps found",
             "data": None,
         }
 
-    # Initialize the CSV buffer and writer
-    csv_buffer = StringIO()
-    csv_writer = csv.writer(
-        csv_buffer, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL
-    )
+    return export, None
 
-    # Fetch date columns and number columns
-    date_columns = []
-    number_columns = []
-    if process.type == "extract":
-        if "fields" in process.details:
-            for field in process.details["fields"]:
-                if field["type"] == "date":
-                    date_columns.append(field["key"])
-                elif field["type"] == "number":
-                    number_columns.append(field["key"])
-
-    # Write the header
-    headers = ["Filename"]
-    if process.type == "extract" and completed_steps:
-        # Extract headers from the first completed step's output keys
-        headers += list(
-            completed_steps[0].output[0].keys()
-        )  # Assuming output is a list of dicts
-    else:
-        headers.append("summary")
-    headers.append("___process_step_id")
-    headers.append("___extraction_index")
-    csv_writer.writerow(headers)
-
-    def format_number(value):
-        if value is None:
-            return ""  # or return a default value like "N/A"
-        try:
-            float_value = float(value)
-            if float_value.is_integer():
-                return int(float_value)
-            else:
-                return float_value
-        except ValueError:
-            return value
-
-    # Write data rows
-    for step in completed_steps:
-        if process.type == "extract":
-            for index, output in enumerate(step.output):
-                row = [step.asset.filename]
-                for key in headers[1:-2]:  # Skip "Filename" column
-                    value = output.get(key, "")
-                    if key in date_columns:
-                        try:
-                            parsed_date = dateparser.parse(value)
-                            if parsed_date:
-                                value = parsed_date.strftime("%d-%m-%Y")
-                        except Exception as e:
-                            logger.error(
-                                f"Unable to parse date {value}, fallback to extracted text. Error: {e}"
-                            )
-                    elif key in number_columns:
-                        value = format_number(value)
-                    row.append(value)
-                row.append(step.id)
-                row.append(index)
-                csv_writer.writerow(row)
-        else:
-            row = [step.asset.filename, step.output.get("summary", ""), step.id, 0]
-            csv_writer.writerow(row)
-
-    # Get the CSV content from the buffer
-    csv_content = csv_buffer.getvalue()
-
-    # Create a Response object with the CSV data
-    response = Response(content=csv_content)
-    response.headers["Content-Disposition"] = (
-        f"attachment; filename=process_{process_id}.csv"
-    )
-    response.headers["Content-Type"] = "text/csv"
 
-    return response
+@process_router.get("/{process_id}/download-csv")
+def download_process(process_id: int, db: Session = Depends(get_db)):
+    export, error = get_process_export(db, process_id)
+    if error:
+        return error
 
+    # Rows are read from the database and sent in chunks as the client downloads
+    return StreamingResponse(
+        CsvWriter().write(export),
+        media_type=CsvWriter.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename=process_{process_id}.csv"
+        },
+    )
 
-@process_router.get("/{process_id}/get-csv")
-def get_csv_content(process_id: int, db: Session = Depends(get_db)):
-    process = process_repository.get_process(db=db, process_id=process_id)
-    if not process:
-        return {
-            "status": "error",
-            "message": "Process not found",
-            "data": None,
-        }
 
-    process_steps = process_repository.get_process_steps(db=db, process_id=process_id)
-    if not process_steps:
-        return {
-            "status": "error",
-            "message": "Process steps not found",
-            "data": None,
-        }
+@process_router.get("/{process_id}/export")
+def export_process(process_id: int, format: str = "csv", db: Session = Depends(get_db)):
+    try:
+        writer = get_export_writer(format)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    completed_steps = [
-        step
-        for step in process_steps
-        if step.status == ProcessStepStatus.COMPLETED and step.output is not None
-    ]
-    if not completed_steps:
-        return {
-            "status": "error",
-            "message": "No completed steps found",
-            "data": None,
-        }
+    export, error = get_process_export(db, process_id)
+    if error:
+        return error
 
-    # Initialize the CSV buffer and writer
-    csv_buffer = StringIO()
-    csv_writer = csv.writer(
-        csv_buffer, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL
+    return StreamingResponse(
+        writer.write(export),
+        media_type=writer.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename=process_{process_id}.{writer.extension}"
+        },
     )
 
-    # Fetch date columns and number columns
-    date_columns = []
-    number_columns = []
-    if process.type == "extract":
-        if "fields" in process.details:
-            for field in process.details["fields"]:
-                if field["type"] == "date":
-                    date_columns.append(field["key"])
-                elif field["type"] == "number":
-                    number_columns.append(field["key"])
-
-    # Write the header
-    headers = ["Filename"]
-    if process.type == "extract" and completed_steps:
-        # Extract headers from the first completed step's output keys
-        headers += list(
-            completed_steps[0].output[0].keys()
-        )  # Assuming output is a list of dicts
-    else:
-        headers.append("summary")
-
-    headers.append("___process_step_id")
-    headers.append("___extraction_index")
-    csv_writer.writerow(headers)
-
-    print(completed_steps)
-
-    def format_number(value):
-        if value is None:
-            return ""  # or return a default value like "N/A"
-        try:
-            float_value = float(value)
-            if float_value.is_integer():
-                return int(float_value)
-            else:
-                return float_value
-        except ValueError:
-            return value
-
-    # Write data rows
-    for step in completed_steps:
-        if process.type == "extract":
-            for index, output in enumerate(step.output):
-                row = [step.asset.filename]
-                for key in headers[1:-2]:  # Skip "Filename" column
-                    value = output.get(key, "")
-                    if key in date_columns:
-                        try:
-                            parsed_date = dateparser.parse(value)
-                            if parsed_date:
-                                value = parsed_date.strftime("%d-%m-%Y")
-                        except Exception as e:
-                            logger.error(
-                                f"Unable to parse date {value}, fallback to extracted text. Error: {e}"
-                            )
-                    elif key in number_columns:
-                        value = format_number(value)
-                    row.append(value)
-
-                row.append(step.id)
-                row.append(index)
-                csv_writer.writerow(row)
-        else:
-            row = [step.asset.filename, step.output.get("summary", ""), step.id, 0]
-            csv_writer.writerow(row)
-
-    # Get the CSV content from the buffer
-    csv_content = csv_buffer.getvalue()
+
+@process_router.get("/{process_id}/get-csv")
+def get_csv_content(process_id: int, db: Session = Depends(get_db)):
+    export, error = get_process_export(db, process_id)
+    if error:
+        return error
+
+    csv_content = "".join(
+        iter_csv(export.headers, export.iter_rows(), settings.export_rows_per_chunk)
+    )
 
     return {
         "status": "success",
@@ -418,16 +343,44 @@ def get_csv_content(process_id: int, db: Session = Depends(get_db)):
 
 
 @process_router.get("/{process_id}/get-steps")
-def get_process_steps(process_id: int, db: Session = Depends(get_db)):
-    process_steps = process_repository.get_process_steps(db, process_id)
+def get_process_steps(
+    process_id: int,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    columns = parse_fields(fields, process_repository.PROCESS_STEP_COLUMNS)
+    if columns is None and cursor is None and limit is None:
+        # Full steps with their process and asset
+        process_steps = process_repository.get_process_steps(db, process_id)
+        next_step_cursor = None
+    else:
+        # Only the requested columns are read, output is left out unless asked for
+        process_steps = process_repository.get_process_step_columns(
+            db,
+            process_id,
+            columns
+            or [
+                column
+                for column in process_repository.PROCESS_STEP_COLUMNS
+                if column not in ("output", "output_references")
+            ],
+            cursor=cursor,
+            limit=limit,
+        )
+        process_steps, next_step_cursor = next_cursor(
+            process_steps, limit, lambda row: row["id"]
+        )
 
-    if not process_steps:
+    if not process_steps and not cursor:
         raise Exception("No process found!")
 
     return {
         "status": "success",
         "message": "Process steps successfully returned",
         "data": process_steps,
+        "next_cursor": next_step_cursor,
     }
 
 
@@ -448,40 +401,20 @@ def download_process_steps_zip(process_id: int, db: Session = Depends(get_db)):
     if not process_steps:
         raise HTTPException(status_code=404, detail="No process steps found!")
 
-    # Initialize an in-memory file to store the zip data
-    memory_file = io.BytesIO()
-
-    file_exists = False
-    # Create a zip archive in the memory file
-    with zipfile.ZipFile(memory_file, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for step in process_steps:
-
-            if step.output and "highlighted_pdf" in step.output:
-
-                pdf_path = step.output["highlighted_pdf"]
-
-                filename = os.path.basename(pdf_path)
-
-                # Read the PDF file content
-                try:
-                    with open(pdf_path, "rb") as pdf_file:
-                        pdf_content = pdf_file.read()
-
-                    zipf.writestr(filename, pdf_content)
-
-                    file_exists = True
-                except FileNotFoundError:
-                    continue
+    highlighted_pdfs = [
+        (step.output["highlighted_pdf"], os.path.basename(step.output["highlighted_pdf"]))
+        for step in process_steps
+        if step.output and "highlighted_pdf" in step.output
+    ]
 
-    if not file_exists:
+    # The archive is written while it is sent, reading the first PDF tells if any exists
+    zip_chunks = iter_zip(highlighted_pdfs)
+    first_chunk = next(zip_chunks, None)
+    if first_chunk is None:
         raise HTTPException(status_code=404, detail="No Highlighted pdf's exists!")
 
-    # Set the pointer to the beginning of the in-memory file
-    memory_file.seek(0)
-
-    # Return the zip file as a StreamingResponse
     return StreamingResponse(
-        memory_file,
+        itertools.chain([first_chunk], zip_chunks),
         media_type="application/zip",
         headers={
             "Content-Disposition": f"attachment; filename=highlighted_pdfs_{process_id}.zip"
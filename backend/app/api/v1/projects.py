@@ -1,8 +1,14 @@
 import os
 import traceback
 from typing import List
-from app.processing.file_preprocessing import process_file
-from fastapi import APIRouter, File, HTTPException, Depends, UploadFile, Query
+from app.processing.file_preprocessing import (
+    clear_text_extraction_cache,
+    fetch_url_assets,
+    segmentation_pipeline,
+    submit_asset_batch,
+)
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Depends, UploadFile, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, FileResponse  # Add FileResponse here
 from sqlalchemy.orm import Session
 
@@ -10,10 +16,15 @@ from app.database import get_db
 from app.schemas.project import ProjectCreate, ProjectUpdate
 from app.repositories import project_repository
 from app.config import settings
-from app.models.asset import Asset
+from app.models.asset_content import AssetProcessingStatus
 from datetime import datetime, timezone
 from app.logger import Logger
-from app.utils import fetch_html_and_save, generate_unique_filename, is_valid_url
+from app.utils import (
+    FileTooLargeError,
+    generate_unique_filename,
+    is_valid_url,
+    save_stream,
+)
 from app.schemas.asset import UrlAssetCreate
 from app.vectorstore.chroma import ChromaDB
 
@@ -23,6 +34,16 @@ project_router = APIRouter()
 logger = Logger()
 
 
+@project_router.delete("/text-extraction-cache")
+def delete_text_extraction_cache(db: Session = Depends(get_db)):
+    deleted = clear_text_extraction_cache(db)
+    return {
+        "status": "success",
+        "message": "Text extraction cache successfully cleared",
+        "data": {"deleted": deleted},
+    }
+
+
 @project_router.post("/", status_code=201)
 def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     if not project.name.strip():
@@ -143,6 +164,61 @@ def get_assets(
         )
 
 
+async def save_uploaded_files(id: int, files: List[UploadFile]) -> List[dict]:
+    """Validate and store uploaded PDFs, returning the asset rows to insert."""
+    # Ensure the upload directory exists
+    os.makedirs(os.path.join(settings.upload_dir, str(id)), exist_ok=True)
+
+    assets = []
+    for file in files:
+        # Check if the uploaded file is a PDF
+        if file.content_type != "application/pdf":
+            raise HTTPException(
+                status_code=400,
+                detail=f"The file '{file.filename}' is not a valid PDF. Please upload only PDF files.",
+            )
+
+        # Check if the file size is greater than 20MB
+        if file.size > settings.max_file_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The file '{file.filename}' exceeds the maximum allowed size of 20MB. Please upload a smaller file.",
+            )
+
+        # Generate a secure filename
+        filename = file.filename.replace(" ", "_")
+        filepath = os.path.join(settings.upload_dir, str(id), filename)
+
+        # Stream the uploaded file to disk outside of the event loop
+        try:
+            content_hash, file_size = await run_in_threadpool(
+                save_stream, file.file, filepath, max_size=settings.max_file_size
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The file '{file.filename}' exceeds the maximum allowed size of 20MB. Please upload a smaller file.",
+            )
+
+        assets.append(
+            {
+                "filename": filename,
+                "path": filepath,
+                "size": file_size,
+                "details": {"content_hash": content_hash},
+            }
+        )
+
+    return assets
+
+
+def ingest_assets(db: Session, id: int, assets: List[dict]):
+    """Insert the assets in one transaction and preprocess them as one batch."""
+    new_assets, asset_batch = project_repository.add_assets(db, id, assets)
+    submit_asset_batch(asset_batch.id)
+    return new_assets, asset_batch
+
+
 @project_router.post("/{id}/assets")
 async def upload_files(
     id: int, files: List[UploadFile] = File(...), db: Session = Depends(get_db)
@@ -154,54 +230,42 @@ async def upload_files(
                 status_code=404, detail="The specified project could not be found."
             )
 
-        # Ensure the upload directory exists
-        os.makedirs(os.path.join(settings.upload_dir, str(id)), exist_ok=True)
-
-        file_processing_tasks = []
-        for file in files:
-            # Check if the uploaded file is a PDF
-            if file.content_type != "application/pdf":
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"The file '{file.filename}' is not a valid PDF. Please upload only PDF files.",
-                )
-
-            # Check if the file size is greater than 20MB
-            if file.size > settings.max_file_size:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"The file '{file.filename}' exceeds the maximum allowed size of 20MB. Please upload a smaller file.",
-                )
-
-            # Generate a secure filename
-            filename = file.filename.replace(" ", "_")
-            filepath = os.path.join(settings.upload_dir, str(id), filename)
+        assets = await save_uploaded_files(id, files)
+        ingest_assets(db, id, assets)
 
-            # Save the uploaded file
-            with open(filepath, "wb") as buffer:
-                buffer.write(await file.read())
+        return JSONResponse(content="Successfully uploaded the files")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while uploading files. Please try again later.",
+        )
 
-            file_size = os.path.getsize(filepath)
 
-            # Save the file info in the database
-            new_asset = Asset(
-                filename=filename, path=filepath, project_id=id, size=file_size
+@project_router.post("/{id}/assets/bulk", status_code=201)
+async def bulk_upload_files(
+    id: int, files: List[UploadFile] = File(...), db: Session = Depends(get_db)
+):
+    try:
+        project = project_repository.get_project(db=db, project_id=id)
+        if project is None:
+            raise HTTPException(
+                status_code=404, detail="The specified project could not be found."
             )
 
-            db.add(new_asset)
-
-            # Store processing task to run after commit
-            file_processing_tasks.append(new_asset)
-
-        db.commit()
+        assets = await save_uploaded_files(id, files)
+        new_assets, asset_batch = ingest_assets(db, id, assets)
 
-        # Add missing Asset Content
-        assets = project_repository.get_assets_without_content(db=db, project_id=id)
-        for asset in assets:
-            project_repository.add_asset_content(db, asset.id, None)
-            process_file(asset.id)
-
-        return JSONResponse(content="Successfully uploaded the files")
+        return {
+            "status": "success",
+            "message": "Files uploaded successfully",
+            "data": {
+                "batch_id": asset_batch.id,
+                "asset_ids": [asset.id for asset in new_assets],
+            },
+        }
     except HTTPException:
         raise
     except Exception:
@@ -212,8 +276,47 @@ async def upload_files(
         )
 
 
+@project_router.get("/{id}/assets/batches/{batch_id}")
+def get_asset_batch(id: int, batch_id: int, db: Session = Depends(get_db)):
+    asset_batch = project_repository.get_asset_batch(db, batch_id)
+    if asset_batch is None or asset_batch.project_id != id:
+        raise HTTPException(
+            status_code=404, detail="The requested upload batch could not be found."
+        )
+
+    return {
+        "status": "success",
+        "message": "Upload batch successfully returned",
+        "data": {
+            "id": asset_batch.id,
+            "asset_ids": asset_batch.asset_ids,
+            "total": asset_batch.total,
+            "processed": asset_batch.processed,
+            "failed": asset_batch.failed,
+        },
+    }
+
+
+def url_asset_refresh(asset) -> dict:
+    """Describe the download refreshing a URL asset, conditional when its content is usable."""
+    return {
+        "id": asset.id,
+        "project_id": asset.project_id,
+        "path": asset.path,
+        "details": asset.details,
+        "refresh": True,
+        "reuse_content": asset.content is not None
+        and asset.content.processing == AssetProcessingStatus.COMPLETED,
+    }
+
+
 @project_router.post("/{id}/assets/url")
-async def add_url_asset(id: int, data: UrlAssetCreate, db: Session = Depends(get_db)):
+async def add_url_asset(
+    id: int,
+    data: UrlAssetCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     try:
         urls = data.url
         project = project_repository.get_project(db=db, project_id=id)
@@ -235,38 +338,71 @@ async def add_url_asset(id: int, data: UrlAssetCreate, db: Session = Depends(get
                     detail=f"Invalid URL format: {url}. Please provide a valid URL.",
                 )
 
+        os.makedirs(os.path.join(settings.upload_dir, str(id)), exist_ok=True)
+
+        urls = list(dict.fromkeys(urls))
+        # URLs already added to the project refresh their existing asset
+        existing_assets = project_repository.get_url_assets(db, id, urls)
+        refreshed_assets = [
+            asset
+            for asset in existing_assets.values()
+            if asset.content is None
+            or asset.content.processing
+            in (AssetProcessingStatus.COMPLETED, AssetProcessingStatus.FAILED)
+        ]
+
         url_assets = []
         for url in urls:
-            os.makedirs(os.path.join(settings.upload_dir, str(id)), exist_ok=True)
+            if url in existing_assets:
+                continue
 
             # Generate a secure filename
             filename = generate_unique_filename(url)
             filepath = os.path.join(settings.upload_dir, str(id), filename)
 
-            fetch_html_and_save(url, filepath)
-
-            # Save the file info in the database
-            new_asset = Asset(
-                filename=filename,
-                path=filepath,
-                project_id=id,
-                type="url",
-                details={"url": url},
+            url_assets.append(
+                {
+                    "filename": filename,
+                    "path": filepath,
+                    "type": "url",
+                    "details": {"url": url},
+                }
             )
 
-            url_assets.append(new_asset)
-
-            db.add(new_asset)
+        new_assets, asset_batch = project_repository.add_assets(
+            db, id, url_assets, [asset.id for asset in refreshed_assets]
+        )
 
-        db.commit()
+        # The pages are downloaded after the response is sent
+        background_tasks.add_task(
+            fetch_url_assets,
+            asset_batch.id,
+            [
+                {**url_asset, "id": asset.id, "project_id": id}
+                for url_asset, asset in zip(url_assets, new_assets)
+            ]
+            + [url_asset_refresh(asset) for asset in refreshed_assets],
+        )
 
-        # Add missing Asset Content
-        assets = project_repository.get_assets_without_content(db=db, project_id=id)
-        for asset in assets:
-            project_repository.add_asset_content(db, asset.id, None)
-            process_file(asset.id)
+        url_statuses = {
+            url_asset["details"]["url"]: {"asset_id": asset.id, "status": "queued"}
+            for url_asset, asset in zip(url_assets, new_assets)
+        }
+        for url, asset in existing_assets.items():
+            url_statuses[url] = {
+                "asset_id": asset.id,
+                # Assets still being processed are left as they are
+                "status": "refreshing" if asset in refreshed_assets else "processing",
+            }
 
-        return JSONResponse(content="Successfully uploaded the files")
+        return {
+            "status": "success",
+            "message": "Successfully queued the URLs for download",
+            "data": {
+                "batch_id": asset_batch.id,
+                "assets": [{"url": url, **url_statuses[url]} for url in urls],
+            },
+        }
     except HTTPException:
         raise
     except Exception:
@@ -277,6 +413,58 @@ async def add_url_asset(id: int, data: UrlAssetCreate, db: Session = Depends(get
         )
 
 
+@project_router.post("/{id}/assets/{asset_id}/refresh")
+async def refresh_url_asset(
+    id: int,
+    asset_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    try:
+        asset = project_repository.get_asset(db, asset_id)
+        if asset is None or asset.project_id != id:
+            raise HTTPException(
+                status_code=404,
+                detail="The specified asset could not be found in the project.",
+            )
+
+        if asset.type != "url":
+            raise HTTPException(
+                status_code=400, detail="Only URL assets can be refreshed."
+            )
+
+        if asset.content is not None and asset.content.processing in (
+            AssetProcessingStatus.PENDING,
+            AssetProcessingStatus.IN_PROGRESS,
+        ):
+            raise HTTPException(
+                status_code=409, detail="The asset is still being processed."
+            )
+
+        _, asset_batch = project_repository.add_assets(db, id, [], [asset.id])
+        background_tasks.add_task(
+            fetch_url_assets, asset_batch.id, [url_asset_refresh(asset)]
+        )
+
+        return {
+            "status": "success",
+            "message": "Successfully queued the URL for refresh",
+            "data": {
+                "batch_id": asset_batch.id,
+                "asset_id": asset.id,
+                "status": "refreshing",
+            },
+        }
+    except HTTPException:
+        raise
+    except Exception:
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while refreshing the URL asset. Please try again later.",
+        )
+
+
 @project_router.get("/{id}/assets/{asset_id}")
 async def get_file(asset_id: int, db: Session = Depends(get_db)):
     try:
@@ -312,6 +500,35 @@ async def get_file(asset_id: int, db: Session = Depends(get_db)):
         )
 
 
+@project_router.get("/{id}/assets/{asset_id}/progress")
+def get_asset_progress(id: int, asset_id: int, db: Session = Depends(get_db)):
+    asset = project_repository.get_asset(db, asset_id)
+    if asset is None or asset.project_id != id:
+        raise HTTPException(
+            status_code=404,
+            detail="The requested file could not be found in the database.",
+        )
+
+    # Assets not in the segmentation stage report their stored processing status
+    progress = segmentation_pipeline.get_progress(asset_id)
+    if progress is None:
+        asset_content = project_repository.get_asset_content(db, asset_id)
+        progress = {
+            "asset_id": asset_id,
+            "status": (
+                asset_content.processing.name.lower()
+                if asset_content
+                else AssetProcessingStatus.PENDING.name.lower()
+            ),
+        }
+
+    return {
+        "status": "success",
+        "message": "Asset progress successfully returned",
+        "data": progress,
+    }
+
+
 @project_router.get("/{id}/processes")
 def get_processes(id: int, db: Session = Depends(get_db)):
     try:
@@ -336,9 +553,9 @@ def get_processes(id: int, db: Session = Depends(get_db)):
                     "completed_at": process.completed_at,
                     "created_at": process.created_at,
                     "updated_at": process.updated_at,
-                    "completed_step_count": step_count,
+                    "completed_step_count": process.completed_step_count,
                 }
-                for process, step_count in processes
+                for process in processes
             ],
         }
     except HTTPException:
@@ -441,6 +658,7 @@ async def delete_asset(project_id: int, asset_id: int, db: Session = Depends(get
         try:
             vectorstore = ChromaDB(f"panda-etl-{asset.project_id}")
             vectorstore.delete_docs(where={"asset_id": str(asset.id)})
+            vectorstore.delete_sentence_index(asset.id)
         except Exception as vec_error:
             logger.error(f"Error deleting from vectorstore: {str(vec_error)}")
             # Continue with the asset deletion even if vectorstore deletion fails
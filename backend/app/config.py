@@ -20,11 +20,86 @@ class Settings(BaseSettings):
     max_relevant_docs: int = 10
     max_file_size: int = 20 * 1024 * 1024
     chroma_batch_size: int = 5
+    chroma_max_batch_size: int = 512
+    embedding_batch_max_chars: int = 400000
+
+    # Persistent process queue
+    process_queue_workers: int = 5
+    queue_lease_seconds: int = 300
+    queue_poll_interval: float = 1.0
+    queue_max_attempts: int = 3
+    queue_retry_delay: float = 30
+    preprocess_queue_workers: int = 2
+
+    # Shared HTTP client used for the PandaETL and API server calls
+    http_timeout: float = 360
+    http_connect_timeout: float = 10
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30
+    http_enable_http2: bool = True
+
+    # Client-side rate limiting of the PandaETL server calls made by the workers
+    pandaetl_rate_limit: float = 5
+    pandaetl_rate_burst: int = 10
+    pandaetl_max_concurrency: int = 10
+    pandaetl_min_concurrency: int = 1
+    retry_base_delay: float = 1
+    retry_max_delay: float = 60
+
+    # Normalization of extracted dates and numbers
+    normalization_cache_size: int = 10000
+    normalization_max_processes: int = 128
+
+    # Exports of process results
+    export_batch_size: int = 1000
+    export_rows_per_chunk: int = 500
+    export_row_group_size: int = 10000  # Rows per Parquet row group or Arrow record batch
+
+    # Archives of highlighted PDFs
+    zip_read_workers: int = 8
+    zip_prefetch_files: int = 4
+
+    # Downloads of URL assets
+    url_fetch_concurrency: int = 10
+    url_fetch_per_host_limit: int = 2
+    url_fetch_timeout: float = 30
+
+    # Cache of parsed file contents keyed by the SHA-256 of the file bytes
+    text_extraction_cache_enabled: bool = True
+    text_extraction_cache_max_size: int = 256 * 1024 * 1024
+
+    # Cache of extraction results keyed by document content and field schema
+    extraction_cache_enabled: bool = True
+    extraction_cache_max_size: int = 128 * 1024 * 1024
+
+    # Cache of text embeddings, kept in memory and on disk per embedding model
+    embedding_cache_enabled: bool = True
+    embedding_cache_memory_size: int = 10000
+    embedding_cache_dir: str = os.path.join(
+        os.path.dirname(__file__), "..", "instance", "embeddings"
+    )
+
+    # Segmentation stage embedding the sentences of parsed assets
+    segmentation_workers: int = os.cpu_count() or 1
+    segmentation_batch_size: int = 256
+    segmentation_batch_wait: float = 0.5
+
+    # Maximum number of process steps running at once across all processes
+    max_concurrent_steps: int = 10
+
+    # Status change events streamed to the clients
+    event_queue_size: int = 1000  # Events kept per listener before dropping the oldest
+    event_stream_keepalive: float = 15
+
+    # Seconds between two recounts of the process step counts, 0 to only recount on startup
+    step_count_repair_interval: float = 3600
 
     # OpenAI embeddings config
     use_openai_embeddings: bool = False
     openai_api_key: str = ""
     openai_embedding_model: str = "text-embedding-ada-002"
+    openai_embedding_batch_size: int = 2048
 
     # Extraction References for chat
     chat_extraction_doc_threshold: float = 0.5
@@ -25,8 +25,9 @@ Base = declarative_base()
 
 @event.listens_for(Session, "do_orm_execute")
 def _add_filtering_criteria(execute_state):
-    logger.debug(f"Executing query: {execute_state.statement}")
+    # Only selects are logged: compiling an ORM bulk insert here breaks its execution
     if execute_state.is_select:
+        logger.debug(f"Executing query: {execute_state.statement}")
         stmt = execute_state.statement
 
         if isinstance(stmt, Select):
@@ -45,7 +46,7 @@ def _add_filtering_criteria(execute_state):
 
             execute_state.statement = stmt
 
-    logger.debug(f"Final query: {execute_state.statement}")
+        logger.debug(f"Final query: {execute_state.statement}")
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -1,2 +1,11 @@
 class CreditLimitExceededException(Exception):
     pass
+
+
+class UpstreamServiceException(Exception):
+    """Raised when the remote server is overloaded or failing and the call can be retried"""
+
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
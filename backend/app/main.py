@@ -1,11 +1,21 @@
 from app import models
-from app.processing.process_queue import submit_process
+from app.processing.process_queue import (
+    process_job_queue,
+    start_step_count_repair,
+    step_count_repair_stopped,
+    submit_process,
+)
 from app.repositories import process_repository, project_repository
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from .database import SessionLocal
 from fastapi.middleware.cors import CORSMiddleware
-from app.processing.file_preprocessing import process_file
+from app.processing.file_preprocessing import (
+    preprocess_job_queue,
+    process_file,
+    segmentation_pipeline,
+)
+from app.requests.http_client import close_async_client, close_client
 from .config import settings
 from .api import v1_router
 
@@ -50,6 +60,9 @@ def startup_pending_processes():
 
             processes = process_repository.get_all_pending_processes(db)
 
+            # Jobs are keyed by process, so this only enqueues processes that have
+            # no job in the persistent queue yet. Leased jobs of a previous run are
+            # picked up again by the workers once their lease expires.
             for process in processes:
                 submit_process(process.id)
 
@@ -70,5 +83,22 @@ app.mount("/assets", StaticFiles(directory=settings.upload_dir), name="assets")
 app.include_router(v1_router, prefix="/v1")
 
 
+@app.on_event("startup")
+def start_process_job_queue():
+    process_job_queue.start()
+    preprocess_job_queue.start()
+    start_step_count_repair()
+
+
+@app.on_event("shutdown")
+async def shutdown_background_services():
+    process_job_queue.stop()
+    preprocess_job_queue.stop()
+    step_count_repair_stopped.set()
+    segmentation_pipeline.stop()
+    close_client()
+    await close_async_client()
+
+
 startup_pending_processes()
 startup_file_preprocessing()
@@ -7,6 +7,9 @@ from .process import Process, ProcessStatus
 from .process_step import ProcessStep, ProcessStepStatus
 from .conversation_message import ConversationMessage
 from .conversation import Conversation
+from .queue_job import QueueJob, QueueJobStatus
+from .cache_entry import CacheEntry
+from .asset_batch import AssetBatch
 
 __all__ = [
     "User",
@@ -20,4 +23,8 @@ __all__ = [
     "AssetContent",
     "ConversationMessage",
     "Conversation",
+    "QueueJob",
+    "QueueJobStatus",
+    "CacheEntry",
+    "AssetBatch",
 ]
@@ -0,0 +1,16 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer
+from .base import Base
+
+
+class AssetBatch(Base):
+    __tablename__ = "asset_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    asset_ids = Column(JSON, nullable=False, default=[])
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AssetBatch {self.id}: {self.processed}/{self.total}>"
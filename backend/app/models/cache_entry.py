@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Integer, String, UniqueConstraint
+from .base import Base
+
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+    __table_args__ = (UniqueConstraint("namespace", "key", name="uq_cache_entries_namespace_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    namespace = Column(String(64), nullable=False, index=True)
+    key = Column(String(128), nullable=False)
+    value = Column(JSON, nullable=False)
+    size = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<CacheEntry {self.namespace}:{self.key}>"
@@ -1,5 +1,6 @@
 from sqlalchemy import (
     JSON,
+    Boolean,
     Column,
     Integer,
     String,
@@ -33,6 +34,14 @@ class Process(Base):
     details = Column(JSON, nullable=True)
     message = Column(String(255), nullable=False)
     output = Column(JSON, nullable=True)
+    # Extract every step again instead of reusing cached extraction results
+    bypass_cache = Column(Boolean, nullable=False, default=False, server_default="0")
+
+    # Step counts per status, kept up to date as the steps change status
+    pending_step_count = Column(Integer, nullable=False, default=0, server_default="0")
+    in_progress_step_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_step_count = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_step_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="processes")
     process_steps = relationship(
@@ -0,0 +1,58 @@
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    Text,
+    Enum as SQLAlchemyEnum,
+    text,
+)
+from .base import Base
+
+
+class QueueJobStatus(Enum):
+    PENDING = 1
+    LEASED = 2
+    COMPLETED = 3
+    FAILED = 4
+
+
+class QueueJob(Base):
+    __tablename__ = "queue_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    queue = Column(String(255), nullable=False, index=True)
+    key = Column(String(255), nullable=True, index=True)
+    payload = Column(JSON, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(
+        SQLAlchemyEnum(QueueJobStatus),
+        nullable=False,
+        default=QueueJobStatus.PENDING,
+        index=True,
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # A key has at most one pending or leased job, even when enqueued concurrently
+        Index(
+            "ix_queue_jobs_active_key",
+            "queue",
+            "key",
+            unique=True,
+            sqlite_where=text("status IN ('PENDING', 'LEASED')"),
+            postgresql_where=text("status IN ('PENDING', 'LEASED')"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<QueueJob {self.queue}:{self.id}>"
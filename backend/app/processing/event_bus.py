@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+from app.config import settings
+from app.logger import Logger
+
+
+class Subscription:
+    """
+    The events of one project, or of all projects, delivered to one listener.
+
+    Events are queued on the event loop of the listener. When it falls more than
+    max_size events behind, the oldest ones are dropped and `dropped` counts them.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        project_id: Optional[int] = None,
+        max_size: int = 1000,
+    ):
+        self.loop = loop
+        self.project_id = project_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def put(self, event: dict) -> None:
+        """Queue an event, from any thread."""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Return the next event, or None when none came within the timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """
+    Hands the status changes of processes, process steps and assets to the
+    listeners of their project as they are committed, instead of having clients
+    poll the database for them. Events only reach the listeners of this server
+    process and are not stored: a listener only gets what is published while it
+    is subscribed.
+    """
+
+    def __init__(self, max_queue_size: int = 1000, logger: Logger = None):
+        self.max_queue_size = max_queue_size
+        self.logger = logger or Logger()
+        self.subscriptions: Dict[Optional[int], Set[Subscription]] = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, project_id: Optional[int] = None) -> Subscription:
+        """
+        Subscribe the running event loop to the events of a project, or of all
+        projects when no project is given.
+        """
+        subscription = Subscription(
+            asyncio.get_running_loop(), project_id, self.max_queue_size
+        )
+        with self.lock:
+            self.subscriptions.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.project_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.project_id]
+
+    def has_subscribers(self, project_id: Optional[int] = None) -> bool:
+        """Whether anyone listens to the events of a project, of any project by default."""
+        with self.lock:
+            if project_id is None:
+                return bool(self.subscriptions)
+            return project_id in self.subscriptions or None in self.subscriptions
+
+    def publish(self, project_id: int, event_type: str, data: dict) -> None:
+        """Send an event to the listeners of its project and of all projects."""
+        with self.lock:
+            subscriptions = [
+                *self.subscriptions.get(project_id, ()),
+                *self.subscriptions.get(None, ()),
+            ]
+        if not subscriptions:
+            return
+
+        event = {"type": event_type, "project_id": project_id, "data": data}
+        for subscription in subscriptions:
+            try:
+                subscription.put(event)
+            except RuntimeError:
+                # The loop of the listener is closed, it will not read anymore
+                self.unsubscribe(subscription)
+
+
+event_bus = EventBus(settings.event_queue_size)
@@ -0,0 +1,202 @@
+import csv
+import json
+from datetime import date
+from io import StringIO
+from typing import Dict, Iterable, Iterator, List, Optional, Type
+
+from app.config import settings
+from app.processing.process_export import ProcessExport
+
+
+class ExportFormatUnavailable(Exception):
+    pass
+
+
+def iter_csv(headers: List[str], rows: Iterable[list], rows_per_chunk: int = 500) -> Iterator[str]:
+    """Write rows as CSV, yielding the text every rows_per_chunk rows."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(headers)
+
+    # Send the header right away
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending == rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if pending:
+        yield buffer.getvalue()
+
+
+def iter_chunks(rows: Iterable[list], chunk_size: int) -> Iterator[List[list]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ExportWriter:
+    """Writes the rows of a process export in one file format, chunk by chunk."""
+
+    extension: str
+    media_type: str
+
+    def __init__(self, rows_per_chunk: Optional[int] = None):
+        self.rows_per_chunk = rows_per_chunk or settings.export_rows_per_chunk
+
+    def write(self, export: ProcessExport) -> Iterator[bytes]:
+        raise NotImplementedError
+
+
+class CsvWriter(ExportWriter):
+    extension = "csv"
+    media_type = "text/csv"
+
+    def write(self, export: ProcessExport) -> Iterator[bytes]:
+        for chunk in iter_csv(export.headers, export.iter_rows(), self.rows_per_chunk):
+            yield chunk.encode("utf-8")
+
+
+class NdjsonWriter(ExportWriter):
+    extension = "ndjson"
+    media_type = "application/x-ndjson"
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def write(self, export: ProcessExport) -> Iterator[bytes]:
+        headers = export.headers
+        for chunk in iter_chunks(export.iter_typed_rows(), self.rows_per_chunk):
+            yield "".join(
+                json.dumps(dict(zip(headers, row)), default=self._default) + "\n"
+                for row in chunk
+            ).encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object collecting what is written until it is drained."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArrowWriter(ExportWriter):
+    """Writes record batches of the columns typed after the process fields."""
+
+    def __init__(self, rows_per_chunk: Optional[int] = None):
+        super().__init__(rows_per_chunk or settings.export_row_group_size)
+
+    def _schema(self, pa, export: ProcessExport):
+        arrow_types = {
+            "text": pa.string(),
+            "number": pa.float64(),
+            "date": pa.date32(),
+            "integer": pa.int64(),
+        }
+        return pa.schema(
+            [(column, arrow_types[column_type]) for column, column_type in export.column_types.items()]
+        )
+
+    def _open(self, sink: _ChunkSink, schema):
+        raise NotImplementedError
+
+    def write(self, export: ProcessExport) -> Iterator[bytes]:
+        pa = import_pyarrow()
+        schema = self._schema(pa, export)
+        sink = _ChunkSink()
+        writer = self._open(sink, schema)
+        for chunk in iter_chunks(export.iter_typed_rows(), self.rows_per_chunk):
+            columns = [list(column) for column in zip(*chunk)]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+
+class ParquetWriter(ArrowWriter):
+    extension = "parquet"
+    media_type = "application/vnd.apache.parquet"
+
+    def _open(self, sink: _ChunkSink, schema):
+        import pyarrow.parquet as pq
+
+        # Each batch is written as its own row group
+        return pq.ParquetWriter(sink, schema)
+
+
+class ArrowIpcWriter(ArrowWriter):
+    extension = "arrow"
+    media_type = "application/vnd.apache.arrow.file"
+
+    def _open(self, sink: _ChunkSink, schema):
+        import pyarrow as pa
+
+        return pa.ipc.new_file(sink, schema)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportFormatUnavailable(
+            "This export format needs pyarrow, install the backend with the export extra."
+        )
+    return pyarrow
+
+
+EXPORT_WRITERS: Dict[str, Type[ExportWriter]] = {
+    "csv": CsvWriter,
+    "ndjson": NdjsonWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowIpcWriter,
+}
+
+
+def get_export_writer(export_format: str) -> ExportWriter:
+    """Return the writer of a format, raising ExportFormatUnavailable if it cannot be used."""
+    writer_class = EXPORT_WRITERS.get(export_format)
+    if writer_class is None:
+        raise ExportFormatUnavailable(
+            f"Unknown export format {export_format}, use one of {', '.join(EXPORT_WRITERS)}."
+        )
+    if issubclass(writer_class, ArrowWriter):
+        import_pyarrow()
+    return writer_class()
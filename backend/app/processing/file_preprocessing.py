@@ -1,66 +1,219 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 from app.requests.schemas import TextExtractionResponse
 from sqlalchemy.orm.exc import ObjectDeletedError
 from app.models.asset_content import AssetProcessingStatus
 from app.database import SessionLocal
+from app.processing.job_queue import JobQueue
+from app.processing.readiness_tracker import readiness_tracker
+from app.repositories import cache_repository
 from app.repositories import project_repository
 from app.repositories import user_repository
 from app.requests import extract_text_from_file
+from app.requests.rate_limiter import backoff_delay
+from app.requests.url_fetcher import UrlFetcher
 from app.logger import Logger
 from app.config import settings
+from app.utils import compute_file_hash
+from app.processing.segmentation_pipeline import SegmentationPipeline
 
 from app.vectorstore.chroma import ChromaDB
 
 
 # Thread pool executor for background tasks
 file_preprocessor = ThreadPoolExecutor(max_workers=5)
-file_segmentation_executor = ThreadPoolExecutor(max_workers=1)
+segmentation_pipeline = SegmentationPipeline(
+    settings.segmentation_workers,
+    settings.segmentation_batch_size,
+    settings.segmentation_batch_wait,
+)
 
 logger = Logger()
 
+TEXT_EXTRACTION_CACHE = "text_extraction"
+
+
+def get_cached_text_extraction(content_hash: str) -> Optional[TextExtractionResponse]:
+    try:
+        with SessionLocal() as db:
+            cached_content = cache_repository.get_cache_entry(
+                db, TEXT_EXTRACTION_CACHE, content_hash
+            )
+        return TextExtractionResponse(**cached_content) if cached_content else None
+    except Exception as e:
+        logger.error(f"Failed to read text extraction cache for {content_hash}: {e}")
+        return None
+
+
+def cache_text_extraction(content_hash: str, pdf_content: TextExtractionResponse) -> None:
+    try:
+        with SessionLocal() as db:
+            cache_repository.set_cache_entry(
+                db,
+                TEXT_EXTRACTION_CACHE,
+                content_hash,
+                pdf_content.model_dump(),
+                max_size=settings.text_extraction_cache_max_size,
+            )
+    except Exception as e:
+        logger.error(f"Failed to store text extraction cache for {content_hash}: {e}")
+
+
+def clear_text_extraction_cache(db) -> int:
+    return cache_repository.clear_cache(db, TEXT_EXTRACTION_CACHE)
+
 
 def process_file(asset_id: int):
     file_preprocessor.submit(preprocess_file, asset_id)
 
 
-def process_segmentation(project_id: int, asset_id: int, asset_file_name: str):
-    try:
+def run_asset_batch(payload: dict) -> None:
+    """Preprocess the assets of a batch, counting them as they finish."""
+    batch_id = payload["batch_id"]
+    with SessionLocal() as db:
+        asset_batch = project_repository.get_asset_batch(db, batch_id)
+        if asset_batch is None:
+            logger.error(f"Asset batch {batch_id} not found in the database")
+            return
+        asset_ids = list(asset_batch.asset_ids)
+        # A retried batch is counted again from the start
+        project_repository.reset_asset_batch(db, batch_id)
+
+    futures = {}
+    for asset_id in asset_ids:
         with SessionLocal() as db:
             asset_content = project_repository.get_asset_content(db, asset_id)
+            # Assets that failed before preprocessing, such as unreachable URLs, and
+            # assets already preprocessed, such as unchanged URLs, are only counted
+            if asset_content and asset_content.processing in (
+                AssetProcessingStatus.FAILED,
+                AssetProcessingStatus.COMPLETED,
+            ):
+                project_repository.increment_asset_batch(
+                    db,
+                    batch_id,
+                    failed=asset_content.processing == AssetProcessingStatus.FAILED,
+                )
+                continue
+        futures[file_preprocessor.submit(preprocess_file, asset_id)] = asset_id
 
-        vectorstore = ChromaDB(f"panda-etl-{project_id}")
-
-        docs = []
-        metadatas = []
-        for content in asset_content.content["content"]:
-            docs.append(content["text"])
-            metadatas.append({
-                    "asset_id": asset_id,
-                    "filename": asset_file_name,
-                    "project_id": project_id,
-                    **(content["metadata"] if content.get("metadata") else {"page_number": 1}),  # Unpack all metadata or default to page_number: 1
-                })
-
-        vectorstore.add_docs(
-            docs=docs,
-            metadatas=metadatas
-        )
-
-        project_repository.update_asset_content_status(
-            db,
-            asset_id=asset_id,
-            status=AssetProcessingStatus.COMPLETED,
-        )
-
-    except Exception as e:
-        logger.error(f"Error during segmentation for asset {asset_id}: {e}")
+    for future in as_completed(futures):
         with SessionLocal() as db:
-            project_repository.update_asset_content_status(
+            asset_content = project_repository.get_asset_content(db, futures[future])
+            failed = (
+                future.exception() is not None
+                or asset_content is None
+                or asset_content.processing == AssetProcessingStatus.FAILED
+            )
+            project_repository.increment_asset_batch(db, batch_id, failed=failed)
+
+    logger.info(f"Preprocessed the {len(asset_ids)} assets of batch {batch_id}")
+
+
+preprocess_job_queue = JobQueue(
+    "preprocess",
+    run_asset_batch,
+    workers=settings.preprocess_queue_workers,
+    lease_seconds=settings.queue_lease_seconds,
+    poll_interval=settings.queue_poll_interval,
+    max_attempts=settings.queue_max_attempts,
+    retry_delay=settings.queue_retry_delay,
+    logger=logger,
+)
+
+
+def submit_asset_batch(batch_id: int) -> None:
+    preprocess_job_queue.enqueue({"batch_id": batch_id}, key=f"asset_batch:{batch_id}")
+
+
+url_fetcher = UrlFetcher(
+    max_concurrency=settings.url_fetch_concurrency,
+    per_host_limit=settings.url_fetch_per_host_limit,
+    timeout=settings.url_fetch_timeout,
+    max_size=settings.max_file_size,
+)
+
+
+async def fetch_url_assets(batch_id: int, url_assets: List[dict]) -> None:
+    """
+    Download the pages of URL assets, then preprocess them as a batch.
+
+    URL assets being refreshed are fetched with a conditional request when their
+    content can be reused, and keep it when the page has not changed.
+    """
+    reusable = [
+        bool(asset.get("reuse_content")) and os.path.exists(asset["path"])
+        for asset in url_assets
+    ]
+    results = await url_fetcher.fetch_all(
+        [(asset["details"]["url"], asset["path"]) for asset in url_assets],
+        validators=[
+            asset["details"] if reuse else None for asset, reuse in zip(url_assets, reusable)
+        ],
+    )
+    # Recording the results touches the database and vector store, off the event loop
+    await asyncio.to_thread(store_url_assets, batch_id, url_assets, reusable, results)
+
+
+def store_url_assets(
+    batch_id: int, url_assets: List[dict], reusable: List[bool], results: List
+) -> None:
+    """Record the fetch results of URL assets, then submit their batch for preprocessing."""
+    failed_asset_ids = []
+    with SessionLocal() as db:
+        for asset, reuse, result in zip(url_assets, reusable, results):
+            details = asset["details"]
+            if isinstance(result, Exception):
+                logger.error(f"Failed to fetch {details['url']}: {result}")
+                project_repository.update_asset(
+                    db,
+                    asset["id"],
+                    details={**details, "fetch_status": "failed", "fetch_error": str(result)},
+                )
+                # A refreshed asset keeps the content of its previous download
+                if not reuse:
+                    project_repository.update_asset_content_status(
+                        db, asset_id=asset["id"], status=AssetProcessingStatus.FAILED
+                    )
+                    failed_asset_ids.append(asset["id"])
+                continue
+
+            unchanged = reuse and (
+                result["not_modified"] or result["content_hash"] == details.get("content_hash")
+            )
+            fetched_details = {
+                **details,
+                "fetch_status": "unchanged" if unchanged else "fetched",
+                "etag": result["etag"],
+                "last_modified": result["last_modified"],
+            }
+            fetched_details.pop("fetch_error", None)
+            if not result["not_modified"]:
+                fetched_details["content_hash"] = result["content_hash"]
+            project_repository.update_asset(
                 db,
-                asset_id=asset_id,
-                status=AssetProcessingStatus.FAILED,
+                asset["id"],
+                size=None if result["not_modified"] else result["size"],
+                details=fetched_details,
             )
 
+            if asset.get("refresh") and not unchanged:
+                # The previous sentences of the page are replaced once preprocessed again
+                vectorstore = ChromaDB(f"panda-etl-{asset['project_id']}")
+                vectorstore.delete_docs(where={"asset_id": asset["id"]})
+                vectorstore.delete_sentence_index(asset["id"])
+                project_repository.update_asset_content_status(
+                    db, asset_id=asset["id"], status=AssetProcessingStatus.PENDING
+                )
+
+    for asset_id in failed_asset_ids:
+        readiness_tracker.asset_failed(asset_id)
+
+    submit_asset_batch(batch_id)
+
 
 def preprocess_file(asset_id: int):
     try:
@@ -81,10 +234,21 @@ def preprocess_file(asset_id: int):
             # Refresh the asset object
             db.refresh(asset)
 
+        # Identical file contents were already parsed, skip the remote parse
+        content_hash = None
+        pdf_content = None
+        if settings.text_extraction_cache_enabled:
+            # Uploads are hashed while written to disk
+            content_hash = (asset.details or {}).get("content_hash") or compute_file_hash(
+                asset.path
+            )
+            pdf_content = get_cached_text_extraction(content_hash)
+            if pdf_content:
+                logger.info(f"Using cached text extraction for asset {asset_id}")
+
         # Perform text extraction
         retries = 0
-        success = False
-        pdf_content = None
+        success = pdf_content is not None
 
         while retries < settings.max_retries and not success:
             try:
@@ -93,6 +257,9 @@ def preprocess_file(asset_id: int):
 
                 success = True
 
+                if content_hash:
+                    cache_text_extraction(content_hash, pdf_content)
+
             except ObjectDeletedError:
                 logger.error(f"Asset with id {asset_id} was deleted during processing")
                 return
@@ -106,8 +273,18 @@ def preprocess_file(asset_id: int):
                         project_repository.update_asset_content_status(
                             db, asset_id=asset_id, status=AssetProcessingStatus.FAILED
                         )
+                    readiness_tracker.asset_failed(asset_id)
                     return
 
+                time.sleep(
+                    backoff_delay(
+                        retries,
+                        getattr(e, "retry_after", None),
+                        settings.retry_base_delay,
+                        settings.retry_max_delay,
+                    )
+                )
+
         # After extraction, store the extracted content in the database
         if success and pdf_content:
             with SessionLocal() as db:
@@ -115,8 +292,7 @@ def preprocess_file(asset_id: int):
                     db, asset_id, pdf_content.model_dump()
                 )
                 # Submit the segmentation task once the content is saved
-                file_segmentation_executor.submit(
-                    process_segmentation,
+                segmentation_pipeline.submit(
                     asset.project_id,
                     asset_content.asset_id,
                     asset.filename,
@@ -128,4 +304,5 @@ def preprocess_file(asset_id: int):
             project_repository.update_asset_content_status(
                 db, asset_id=asset_id, status=AssetProcessingStatus.FAILED
             )
+        readiness_tracker.asset_failed(asset_id)
         logger.error(f"Failed to preprocess asset {asset_id}: {e}")
@@ -0,0 +1,191 @@
+import os
+import socket
+import threading
+import traceback
+from typing import Callable, Dict, Optional
+from app.database import SessionLocal
+from app.logger import Logger
+from app.models.queue_job import QueueJobStatus
+from app.repositories import queue_repository
+
+
+class JobQueue:
+    """
+    A durable work queue backed by the queue_jobs table.
+
+    Jobs survive restarts: a worker leases a job for a visibility timeout and keeps
+    extending the lease while the handler runs. If the worker dies, the lease expires
+    and another worker picks the job up again, until it runs out of attempts.
+    Workers claim jobs one at a time, so a long backlog is drained at a bounded
+    concurrency instead of being submitted all at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[dict], None],
+        workers: int = 5,
+        lease_seconds: int = 300,
+        poll_interval: float = 1.0,
+        max_attempts: int = 3,
+        retry_delay: float = 30,
+        session_factory=SessionLocal,
+        logger: Logger = None,
+        on_failure: Optional[Callable[[dict], None]] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.session_factory = session_factory
+        self.logger = logger or Logger()
+        # Called with the payload of each job given up after its last attempt
+        self.on_failure = on_failure
+
+        self.running = False
+        self.worker_threads = []
+        self.heartbeat_thread = None
+        self.active_jobs: Dict[int, str] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue(
+        self,
+        payload: dict,
+        key: Optional[str] = None,
+        priority: int = 0,
+        delay: float = 0,
+    ) -> int:
+        """Persist a job and wake up an idle worker. Returns the job id."""
+        with self.session_factory() as db:
+            job = queue_repository.enqueue_job(
+                db,
+                self.name,
+                payload,
+                key=key,
+                priority=priority,
+                max_attempts=self.max_attempts,
+                delay=delay,
+            )
+            job_id = job.id
+
+        self.wakeup.set()
+        return job_id
+
+    def start(self) -> None:
+        """Start the worker and heartbeat threads if they are not running yet."""
+        if self.running:
+            self.logger.info(f"[JobQueue:{self.name}]: Workers are already running")
+            return
+
+        self.logger.info(f"[JobQueue:{self.name}]: Starting {self.workers} workers")
+        self.running = True
+        self.stopped.clear()
+        self.worker_threads = [
+            threading.Thread(
+                target=self._run_worker,
+                args=(f"{self.owner_prefix}:{index}",),
+                daemon=True,
+            )
+            for index in range(self.workers)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+
+        self.heartbeat_thread = threading.Thread(target=self._run_heartbeat, daemon=True)
+        self.heartbeat_thread.start()
+
+    def stop(self) -> None:
+        """Stop the workers. Leased jobs are picked up again once their lease expires."""
+        self.running = False
+        self.stopped.set()
+        self.wakeup.set()
+        self.logger.info(f"[JobQueue:{self.name}]: Workers stopped")
+
+    def run_next(self, owner: str) -> bool:
+        """Claim and execute a single job. Returns False when the queue is empty."""
+        with self.session_factory() as db:
+            job = queue_repository.claim_job(db, self.name, owner, self.lease_seconds)
+            if job is None:
+                exhausted_payloads = [
+                    exhausted_job.payload
+                    for exhausted_job in queue_repository.fail_exhausted_jobs(db, self.name)
+                ]
+            else:
+                job_id, payload, attempts = job.id, job.payload, job.attempts
+
+        if job is None:
+            for exhausted_payload in exhausted_payloads:
+                self._give_up(exhausted_payload)
+            return False
+
+        self.logger.info(f"[JobQueue:{self.name}]: Executing job [{job_id}] attempt {attempts}")
+        with self.lock:
+            self.active_jobs[job_id] = owner
+
+        try:
+            self.handler(payload)
+        except Exception:
+            self.logger.error(traceback.format_exc())
+            with self.session_factory() as db:
+                queue_repository.fail_job(
+                    db, job_id, owner, traceback.format_exc(), retry_delay=self.retry_delay
+                )
+                failed = queue_repository.get_job(db, job_id).status == QueueJobStatus.FAILED
+            if failed:
+                self._give_up(payload)
+        else:
+            with self.session_factory() as db:
+                queue_repository.complete_job(db, job_id, owner)
+        finally:
+            with self.lock:
+                self.active_jobs.pop(job_id, None)
+
+        return True
+
+    def _give_up(self, payload: dict) -> None:
+        self.logger.error(f"[JobQueue:{self.name}]: Giving up on job {payload}")
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(payload)
+        except Exception:
+            self.logger.error(traceback.format_exc())
+
+    def _run_worker(self, owner: str) -> None:
+        while self.running:
+            try:
+                if self.run_next(owner):
+                    continue
+            except Exception:
+                self.logger.error(traceback.format_exc())
+
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def _run_heartbeat(self) -> None:
+        interval = max(self.lease_seconds / 3, 1)
+        while self.running:
+            self.extend_leases()
+            self.stopped.wait(interval)
+
+    def extend_leases(self) -> None:
+        """Extend the lease of every job currently executed by this queue."""
+        with self.lock:
+            active_jobs = list(self.active_jobs.items())
+
+        if not active_jobs:
+            return
+
+        try:
+            with self.session_factory() as db:
+                for job_id, owner in active_jobs:
+                    if not queue_repository.extend_lease(db, job_id, owner, self.lease_seconds):
+                        self.logger.error(f"[JobQueue:{self.name}]: Lost lease of job [{job_id}]")
+        except Exception:
+            self.logger.error(traceback.format_exc())
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from dateparser.date import DateDataParser
+
+from app.config import settings
+from app.logger import Logger
+
+logger = Logger()
+
+
+@lru_cache(maxsize=32)
+def _get_date_parser(languages: Optional[Tuple[str, ...]]) -> DateDataParser:
+    return DateDataParser(languages=list(languages) if languages else None)
+
+
+@lru_cache(maxsize=settings.normalization_cache_size)
+def parse_date(
+    value: str, languages: Optional[Tuple[str, ...]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return the ISO date read from a text with the language it was read in,
+    or (None, None) when it is not a date.
+    """
+    try:
+        date_data = _get_date_parser(languages).get_date_data(value)
+    except Exception as e:
+        logger.error(f"Unable to parse date {value}, fallback to extracted text. Error: {e}")
+        return None, None
+
+    if date_data.date_obj is None:
+        return None, None
+    language = date_data.locale.split("-")[0] if date_data.locale else None
+    return date_data.date_obj.date().isoformat(), language
+
+
+@lru_cache(maxsize=settings.normalization_cache_size)
+def parse_number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FieldNormalizer:
+    """
+    Normalizes the values extracted for the date and number fields of a process.
+
+    Dates become ISO dates and numbers become floats, None when a value cannot
+    be read. Dates are read in the language detected on the first date of the
+    process, and only values that do not parse in it go through detection again.
+    """
+
+    def __init__(self, fields: List[dict], language: Optional[str] = None):
+        self.date_keys = {field["key"] for field in fields if field.get("type") == "date"}
+        self.number_keys = {field["key"] for field in fields if field.get("type") == "number"}
+        self.language = language
+
+    def normalize_date(self, value) -> Optional[str]:
+        if not isinstance(value, str) or not value.strip():
+            return None
+
+        language = self.language
+        if language:
+            normalized, _ = parse_date(value, (language,))
+            if normalized:
+                return normalized
+
+        normalized, detected_language = parse_date(value)
+        if normalized and language is None and detected_language:
+            self.language = detected_language
+        return normalized
+
+    def normalize_number(self, value) -> Optional[float]:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return None
+        return parse_number(value)
+
+    def normalize(self, extraction: dict) -> dict:
+        """Return the normalized values of the date and number fields of an extraction."""
+        normalized = {}
+        for key, value in extraction.items():
+            if key in self.date_keys:
+                normalized[key] = self.normalize_date(value)
+            elif key in self.number_keys:
+                normalized[key] = self.normalize_number(value)
+        return normalized
+
+    def normalize_output(self, output) -> Optional[List[dict]]:
+        if not isinstance(output, list):
+            return None
+        return [
+            self.normalize(extraction) if isinstance(extraction, dict) else {}
+            for extraction in output
+        ]
+
+
+_normalizers: "OrderedDict[int, FieldNormalizer]" = OrderedDict()
+_normalizers_lock = threading.Lock()
+
+
+def get_field_normalizer(process_id: int, fields: List[dict]) -> FieldNormalizer:
+    """Return the normalizer of a process, shared by its steps to keep its date language."""
+    with _normalizers_lock:
+        normalizer = _normalizers.get(process_id)
+        if normalizer is None:
+            normalizer = FieldNormalizer(fields)
+            _normalizers[process_id] = normalizer
+            while len(_normalizers) > settings.normalization_max_processes:
+                _normalizers.popitem(last=False)
+        _normalizers.move_to_end(process_id)
+        return normalizer
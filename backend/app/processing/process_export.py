@@ -0,0 +1,166 @@
+import json
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.database import SessionLocal
+from app.processing.normalization import get_field_normalizer
+from app.repositories import process_repository
+
+STEP_ID_COLUMN = "___process_step_id"
+EXTRACTION_INDEX_COLUMN = "___extraction_index"
+
+
+def format_number(value, normalized: Optional[float]):
+    if normalized is None:
+        return "" if value is None else value
+    if normalized.is_integer():
+        return int(normalized)
+    return normalized
+
+
+def format_date(value, normalized: Optional[str]):
+    if normalized is None:
+        return value
+    return date.fromisoformat(normalized).strftime("%d-%m-%Y")
+
+
+def format_text(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+class ProcessExport:
+    """
+    Rows of the results of a process, read from its completed steps.
+
+    The steps are streamed from the database in batches with their own session,
+    so an export can be consumed after the request session is closed.
+    """
+
+    def __init__(
+        self,
+        process_id: int,
+        process_type: str,
+        fields: List[dict],
+        first_output,
+        batch_size: int = 1000,
+    ):
+        self.process_id = process_id
+        self.process_type = process_type
+        self.batch_size = batch_size
+        self.normalizer = get_field_normalizer(process_id, fields)
+        self.date_columns = set()
+        self.number_columns = set()
+        if process_type == "extract":
+            self.date_columns = self.normalizer.date_keys
+            self.number_columns = self.normalizer.number_keys
+
+        if process_type == "extract":
+            # Extract columns from the first completed step's output keys
+            self.columns = (
+                list(first_output[0].keys()) if first_output else []
+            )  # Assuming output is a list of dicts
+        else:
+            self.columns = ["summary"]
+
+    @classmethod
+    def for_process(cls, db, process, batch_size: int = 1000) -> Optional["ProcessExport"]:
+        """Return the export of a process, or None when it has no completed step."""
+        first_step = next(
+            process_repository.iter_completed_step_outputs(db, process.id, batch_size=1),
+            None,
+        )
+        if first_step is None:
+            return None
+
+        return cls(
+            process.id,
+            process.type,
+            (process.details or {}).get("fields", []),
+            first_step[2],
+            batch_size=batch_size,
+        )
+
+    @property
+    def headers(self) -> List[str]:
+        return ["Filename", *self.columns, STEP_ID_COLUMN, EXTRACTION_INDEX_COLUMN]
+
+    @property
+    def column_types(self) -> Dict[str, str]:
+        """Type of each column, one of text, number, date or integer."""
+        column_types = {"Filename": "text"}
+        for column in self.columns:
+            if column in self.date_columns:
+                column_types[column] = "date"
+            elif column in self.number_columns:
+                column_types[column] = "number"
+            else:
+                column_types[column] = "text"
+        column_types[STEP_ID_COLUMN] = "integer"
+        column_types[EXTRACTION_INDEX_COLUMN] = "integer"
+        return column_types
+
+    def iter_steps(self) -> Iterator[Tuple[int, str, object, Optional[list]]]:
+        with SessionLocal() as db:
+            yield from process_repository.iter_completed_step_outputs(
+                db, self.process_id, batch_size=self.batch_size
+            )
+
+    def iter_extractions(self) -> Iterator[Tuple[str, dict, dict, int, int]]:
+        """
+        Yield the filename, values, normalized values, step id and index of each
+        extracted row.
+        """
+        for step_id, filename, output, normalized_output in self.iter_steps():
+            if self.process_type == "extract":
+                normalized_output = normalized_output or []
+                for index, extraction in enumerate(output):
+                    normalized = normalized_output[index] if index < len(normalized_output) else {}
+                    yield filename, extraction, normalized, step_id, index
+            else:
+                yield filename, {"summary": output.get("summary", "")}, {}, step_id, 0
+
+    def normalized_value(self, extraction: dict, normalized: dict, key: str):
+        """Return the normalized value of a date or number column."""
+        if key in normalized:
+            return normalized[key]
+        # Steps extracted before normalization are normalized on the fly
+        if key in self.date_columns:
+            return self.normalizer.normalize_date(extraction.get(key))
+        return self.normalizer.normalize_number(extraction.get(key))
+
+    def iter_rows(self) -> Iterator[list]:
+        """Yield the rows formatted as text, as written in CSV exports."""
+        for filename, extraction, normalized, step_id, index in self.iter_extractions():
+            row = [filename]
+            for key in self.columns:
+                value = extraction.get(key, "")
+                if key in self.date_columns:
+                    value = format_date(value, self.normalized_value(extraction, normalized, key))
+                elif key in self.number_columns:
+                    value = format_number(value, self.normalized_value(extraction, normalized, key))
+                row.append(value)
+            row.append(step_id)
+            row.append(index)
+            yield row
+
+    def iter_typed_rows(self) -> Iterator[list]:
+        """
+        Yield the rows with values of their column type, None when a value
+        cannot be read as a number or a date.
+        """
+        for filename, extraction, normalized, step_id, index in self.iter_extractions():
+            row = [filename]
+            for key in self.columns:
+                if key in self.date_columns:
+                    value = self.normalized_value(extraction, normalized, key)
+                    value = date.fromisoformat(value) if value else None
+                elif key in self.number_columns:
+                    value = self.normalized_value(extraction, normalized, key)
+                else:
+                    value = format_text(extraction.get(key))
+                row.append(value)
+            row.append(step_id)
+            row.append(index)
+            yield row
@@ -1,38 +1,110 @@
+from collections import Counter
 from functools import wraps
-from typing import List
+import hashlib
+import json
+from typing import List, Optional
 from app.database import SessionLocal
 from app.exceptions import CreditLimitExceededException
 from app.models.asset_content import AssetProcessingStatus
-from app.processing.process_scheduler import ProcessScheduler
+from app.processing.job_queue import JobQueue
+from app.processing.normalization import get_field_normalizer
+from app.processing.readiness_tracker import readiness_tracker
+from app.processing.step_scheduler import StepScheduler
+from app.repositories import cache_repository
 from app.repositories import process_repository
 from app.repositories import project_repository
-from concurrent.futures import ThreadPoolExecutor
 from app.models import ProcessStatus
 from app.requests import (
     extract_data,
 )
+from app.requests.rate_limiter import backoff_delay
 from datetime import datetime
 from app.models.process_step import ProcessStepStatus
 from app.repositories import user_repository
 from app.config import settings
 import concurrent.futures
 from app.logger import Logger
+import threading
+import time
 import traceback
 
-from app.utils import clean_text
+from app.utils import clean_text, compute_file_hash
 from app.vectorstore.chroma import ChromaDB
 import re
 
-executor = ThreadPoolExecutor(max_workers=5)
-
 logger = Logger()
 
 
-def submit_process(process_id: int) -> None:
-    executor.submit(process_task, process_id)
+def run_process_job(payload: dict) -> None:
+    process_task(payload["process_id"])
+
+
+def fail_process_job(payload: dict) -> None:
+    """Fail the process of a job the queue gave up on, so it does not stay in progress."""
+    with SessionLocal() as db:
+        process = process_repository.get_process(db, payload["process_id"])
+        if process is None or process.status in (ProcessStatus.COMPLETED, ProcessStatus.STOPPED):
+            return
+        process_repository.update_process_status(
+            db, process, ProcessStatus.FAILED, message="Process ran out of attempts"
+        )
+
+
+process_job_queue = JobQueue(
+    "process",
+    run_process_job,
+    workers=settings.process_queue_workers,
+    lease_seconds=settings.queue_lease_seconds,
+    poll_interval=settings.queue_poll_interval,
+    max_attempts=settings.queue_max_attempts,
+    retry_delay=settings.queue_retry_delay,
+    logger=logger,
+    on_failure=fail_process_job,
+)
+
+
+step_scheduler = StepScheduler(settings.max_concurrent_steps, logger)
+
+EXTRACTION_CACHE = "extraction"
+extraction_cache_counters = Counter()
+
+
+def submit_process(process_id: int, priority: int = 0) -> None:
+    process_job_queue.enqueue(
+        {"process_id": process_id}, key=f"process:{process_id}", priority=priority
+    )
 
 
-process_execution_scheduler = ProcessScheduler(60, submit_process, logger)
+step_count_repair_stopped = threading.Event()
+
+
+def repair_step_counts() -> None:
+    """Recount the steps of every process, fixing the counts that drifted."""
+    with SessionLocal() as db:
+        repaired = process_repository.repair_step_counts(db)
+    if repaired:
+        logger.warning(f"Repaired the step counts of processes {repaired}")
+
+
+def run_step_count_repair(interval: float) -> None:
+    while not step_count_repair_stopped.is_set():
+        try:
+            repair_step_counts()
+        except Exception:
+            logger.error(traceback.format_exc())
+        if not interval or step_count_repair_stopped.wait(interval):
+            return
+
+
+def start_step_count_repair() -> None:
+    """Repair the step counts in the background now, then every configured interval."""
+    step_count_repair_stopped.clear()
+    threading.Thread(
+        target=run_step_count_repair,
+        args=(settings.step_count_repair_interval,),
+        daemon=True,
+    ).start()
+
 
 # Background task processing function
 def process_step_task(
@@ -66,14 +138,34 @@ def process_step_task(
                 db, asset_id=process_step.asset.id
             )
 
+            cache_key = None
+            if (
+                process.type == "extract"
+                and settings.extraction_cache_enabled
+                and not process.bypass_cache
+            ):
+                cache_key = extraction_cache_key(
+                    process.details, asset_content, process_step.asset.path
+                )
+
         # Move the expensive external operations out of the DB session
         while retries < settings.max_retries and not success:
             try:
                 if process.type == "extract":
-                    # Handle non-extractive summary process
-                    data = extract_process(
-                        api_key, process, process_step, asset_content
-                    )
+                    # Unchanged documents extracted with the same fields are answered from cache
+                    data = get_cached_extraction(cache_key) if cache_key else None
+                    if data is None:
+                        # Handle non-extractive summary process
+                        data = extract_process(
+                            api_key, process, process_step, asset_content
+                        )
+                        if cache_key:
+                            cache_extraction(cache_key, data)
+
+                    # Dates and numbers are normalized once here instead of on every export
+                    normalized_output = get_field_normalizer(
+                        process_id, (process.details or {}).get("fields", [])
+                    ).normalize_output(data["fields"])
 
                     # Update process step output outside the expensive operations
                     with SessionLocal() as db:
@@ -83,6 +175,7 @@ def process_step_task(
                             ProcessStepStatus.COMPLETED,
                             output=data["fields"],
                             output_references=data["context"],
+                            normalized_output=normalized_output,
                         )
 
                     # vectorize extraction result
@@ -102,8 +195,10 @@ def process_step_task(
                     process_repository.update_process_status(
                         db, process, ProcessStatus.STOPPED
                     )
+                # Retrying cannot succeed until the credits are topped up
+                break
 
-            except Exception:
+            except Exception as e:
                 logger.error(traceback.format_exc())
                 retries += 1
                 if retries == settings.max_retries:
@@ -112,6 +207,16 @@ def process_step_task(
                         update_process_step_status(
                             db, process_step, ProcessStepStatus.FAILED
                         )
+                else:
+                    # Back off before retrying so a struggling server is not hammered
+                    time.sleep(
+                        backoff_delay(
+                            retries,
+                            getattr(e, "retry_after", None),
+                            settings.retry_base_delay,
+                            settings.retry_max_delay,
+                        )
+                    )
 
         return True
 
@@ -125,9 +230,9 @@ def process_task(process_id: int):
         # Step 1: Fetch process details from the database and update its status
         with SessionLocal() as db:
             process = process_repository.get_process(db, process_id)
-            process.status = ProcessStatus.IN_PROGRESS
-            process.started_at = datetime.utcnow()
-            db.commit()
+            process_repository.update_process_status(
+                db, process, ProcessStatus.IN_PROGRESS, started_at=datetime.utcnow()
+            )
 
             process_steps = process_repository.get_process_steps_with_asset_content(db, process.id, [ProcessStepStatus.PENDING.name, ProcessStepStatus.FAILED.name, ProcessStepStatus.IN_PROGRESS.name])
             if not process_steps:
@@ -137,58 +242,205 @@ def process_task(process_id: int):
             api_key = api_key.key
             db.refresh(process)
 
-        # Step 2: Process each step in parallel outside the database connection
+        # Step 2: Steps whose asset is still being preprocessed wait for it in the
+        # readiness tracker, which starts them as soon as their asset is ready
         failed_docs = []
         summaries = []
 
-        ready_process_steps = [process_step for process_step in process_steps if process_step.asset.content.processing == AssetProcessingStatus.COMPLETED]
+        ready_process_steps = []
+        waiting_asset_steps = {}
+        for process_step in process_steps:
+            asset_content = process_step.asset.content
+            if asset_content and asset_content.processing == AssetProcessingStatus.COMPLETED:
+                ready_process_steps.append(process_step)
+            else:
+                waiting_asset_steps.setdefault(process_step.asset_id, []).append(process_step.id)
+
+        # Counted before any step is parked, so the process cannot look finished meanwhile
+        readiness_tracker.start_steps(process_id, len(ready_process_steps))
+        if waiting_asset_steps:
+            logger.info(
+                f"Process id: [{process_id}] {len(process_steps) - len(ready_process_steps)} "
+                "steps are waiting for the preprocessing of their asset"
+            )
+            readiness_tracker.wait(process_id, waiting_asset_steps)
+            release_preprocessed_assets(list(waiting_asset_steps))
+
+        # Step 3: Hand the steps to the shared step scheduler, which runs them
+        # alongside the steps of other processes within the global concurrency limit
+        futures = [
+            submit_step(process_id, process_step.id, summaries, failed_docs, api_key)
+            for process_step in ready_process_steps
+        ]
+        # Wait for all submitted tasks to complete. The last step of the process to
+        # finish, here or released later by the readiness tracker, completes it.
+        concurrent.futures.wait(futures)
 
-        all_process_steps_ready = len(ready_process_steps) == len(process_steps) # Check if all process steps are ready
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        # Step 5: Handle failure cases and update the status accordingly
+        with SessionLocal() as db:
+            process = process_repository.get_process(db, process_id)
+            process_repository.update_process_status(
+                db, process, ProcessStatus.FAILED, message=str(e)
+            )
+
+
+def submit_step(
+    process_id: int,
+    process_step_id: int,
+    summaries: List[str],
+    failed_docs: List[int],
+    api_key: str,
+) -> concurrent.futures.Future:
+    """Run a step counted as running in the readiness tracker."""
+    future = step_scheduler.submit(
+        process_id,
+        process_step_task,
+        process_id,
+        process_step_id,
+        summaries,
+        failed_docs,
+        api_key,
+    )
+    future.add_done_callback(lambda _: finish_step(process_id))
+    return future
+
+
+def finish_step(process_id: int) -> None:
+    if readiness_tracker.finish_step(process_id):
+        complete_process(process_id)
 
-        # Step 3: Concurrently process all process steps
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            futures = [
-                executor.submit(
-                    process_step_task,
-                    process.id,
-                    process_step.id,
-                    summaries,
-                    failed_docs,
-                    api_key,
-                )
-                for process_step in ready_process_steps
-            ]
-            # Wait for all submitted tasks to complete
-            concurrent.futures.wait(futures)
 
-        # Step 4: After all steps are processed, update the process status and output in the DB
+def complete_process(process_id: int) -> None:
+    """Set the final status of a process once none of its steps is left to run."""
+    try:
         with SessionLocal() as db:
             process = process_repository.get_process(db, process_id)
+            # Stopped processes keep their status, and finished ones are not finished twice
+            if process.status != ProcessStatus.IN_PROGRESS:
+                return
+
+            process_repository.update_process_status(
+                db,
+                process,
+                ProcessStatus.FAILED if process.failed_step_count else ProcessStatus.COMPLETED,
+                completed_at=datetime.utcnow(),
+            )
+    except Exception:
+        logger.error(traceback.format_exc())
 
-            if process.status != ProcessStatus.STOPPED:
-                # If summary extraction was performed, add it to the process output
-                if not all_process_steps_ready:
-                    logger.info(f"Process id: [{process.id}] some steps preprocessing is missing moving to waiting queue")
-                    process_execution_scheduler.add_process_to_queue(process.id)
-                    db.commit()
-                    # Skip status update since not all steps are ready
-                    return
-
-                process.status = (
-                    ProcessStatus.COMPLETED if not failed_docs else ProcessStatus.FAILED
-                )
-                process.completed_at = datetime.utcnow()
 
-            db.commit()
+def release_steps(process_id: int, process_step_ids: List[int], ready: bool) -> None:
+    """
+    Start the steps released by the readiness tracker, or fail them when the
+    preprocessing of their asset failed.
+    """
+    try:
+        with SessionLocal() as db:
+            if ready:
+                api_key = user_repository.get_user_api_key(db).key
+            else:
+                for process_step_id in process_step_ids:
+                    process_step = process_repository.get_process_step(db, process_step_id)
+                    update_process_step_status(db, process_step, ProcessStepStatus.FAILED)
+    except Exception:
+        logger.error(traceback.format_exc())
+        if ready:
+            for _ in process_step_ids:
+                finish_step(process_id)
+            return
+
+    if not ready:
+        if readiness_tracker.is_idle(process_id):
+            complete_process(process_id)
+        return
+
+    for process_step_id in process_step_ids:
+        submit_step(process_id, process_step_id, [], [], api_key)
 
+
+readiness_tracker.set_release_handler(release_steps)
+
+
+def release_preprocessed_assets(asset_ids: List[int]) -> None:
+    """Release the steps of the assets whose preprocessing ended before they were parked."""
+    with SessionLocal() as db:
+        statuses = project_repository.get_asset_content_statuses(db, asset_ids)
+
+    for asset_id, status in statuses.items():
+        if status == AssetProcessingStatus.COMPLETED:
+            readiness_tracker.asset_ready(asset_id)
+        elif status == AssetProcessingStatus.FAILED:
+            readiness_tracker.asset_failed(asset_id)
+
+
+def extraction_cache_key(details: dict, asset_content, file_path: str) -> Optional[str]:
+    """
+    Key of an extraction result: the document content plus the canonicalized
+    field schema, so the same template on the same document maps to one entry.
+    """
+    try:
+        if asset_content and asset_content.content:
+            content_hash = hashlib.sha256(
+                json.dumps(asset_content.content, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+        else:
+            content_hash = compute_file_hash(file_path)
+
+        schema = json.dumps(
+            {
+                "fields": details.get("fields", []),
+                "multiple_fields": bool(details.get("multiple_fields")),
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
     except Exception as e:
-        logger.error(traceback.format_exc())
-        # Step 5: Handle failure cases and update the status accordingly
+        logger.error(f"Unable to compute extraction cache key: {e}")
+        return None
+
+    return hashlib.sha256(f"{content_hash}:{schema}".encode("utf-8")).hexdigest()
+
+
+def get_cached_extraction(cache_key: str) -> Optional[dict]:
+    try:
         with SessionLocal() as db:
-            process = process_repository.get_process(db, process_id)
-            process.status = ProcessStatus.FAILED
-            process.message = str(e)
-            db.commit()
+            data = cache_repository.get_cache_entry(db, EXTRACTION_CACHE, cache_key)
+    except Exception as e:
+        logger.error(f"Failed to read extraction cache: {e}")
+        data = None
+
+    extraction_cache_counters["hits" if data is not None else "misses"] += 1
+    return data
+
+
+def cache_extraction(cache_key: str, data: dict) -> None:
+    try:
+        with SessionLocal() as db:
+            cache_repository.set_cache_entry(
+                db,
+                EXTRACTION_CACHE,
+                cache_key,
+                data,
+                max_size=settings.extraction_cache_max_size,
+            )
+    except Exception as e:
+        logger.error(f"Failed to store extraction cache: {e}")
+
+
+def get_extraction_cache_stats(db) -> dict:
+    return {
+        **cache_repository.get_cache_stats(db, EXTRACTION_CACHE),
+        "session_hits": extraction_cache_counters["hits"],
+        "session_misses": extraction_cache_counters["misses"],
+    }
+
+
+def clear_extraction_cache(db) -> int:
+    deleted = cache_repository.clear_cache(db, EXTRACTION_CACHE)
+    extraction_cache_counters.clear()
+    return deleted
 
 
 def handle_exceptions(func):
@@ -216,39 +468,38 @@ def extract_process(api_key, process, process_step, asset_content):
         and asset_content.content
         and asset_content.content.get("word_count", 0) > 500
     ):
-        for field in process.details["fields"]:
-            relevant_docs = vectorstore.get_relevant_docs(
-                field["key"],
-                where={
-                    "$and": [
-                        {"asset_id": process_step.asset.id},
-                        {"project_id": process.project_id},
-                    ]
-                },
-                k=5,
-            )
-
-            for index, metadata in enumerate(relevant_docs["metadatas"][0]):
-                segment_data = [relevant_docs["documents"][0][index]]
-                if metadata.get("previous_sentence_id", -1) != -1:
-                    prev_sentence = vectorstore.get_relevant_docs_by_id(
-                        ids=[metadata["previous_sentence_id"]]
-                    )
-                    if prev_sentence["documents"] and len(prev_sentence["documents"][0]) > 0:
-                        segment_data = [prev_sentence["documents"][0]] + segment_data
-                    else:
-                        logger.warning("Previous sentence document is empty.")
-
-                if metadata.get("next_sentence_id", -1) != -1:
-                    next_sentence = vectorstore.get_relevant_docs_by_id(
-                        ids=[metadata["next_sentence_id"]]
-                    )
-                    if next_sentence["documents"] and len(next_sentence["documents"][0]) > 0:
-                        segment_data.append(next_sentence["documents"][0])
-                    else:
-                        logger.warning("Next sentence document is empty.")
+        field_docs = vectorstore.get_relevant_docs_batch(
+            [field["key"] for field in process.details["fields"]],
+            where={
+                "$and": [
+                    {"asset_id": process_step.asset.id},
+                    {"project_id": process.project_id},
+                ]
+            },
+            k=5,
+        )
 
-                pdf_content += "\n" + " ".join(segment_data)
+        # Chunks relevant to several fields are only sent once
+        seen_ids = set()
+        hit_ids = []
+        hit_documents = []
+        hit_metadatas = []
+        for relevant_docs in field_docs:
+            for doc_id, document, metadata in zip(
+                relevant_docs["ids"][0],
+                relevant_docs["documents"][0],
+                relevant_docs["metadatas"][0],
+            ):
+                if doc_id not in seen_ids:
+                    seen_ids.add(doc_id)
+                    hit_ids.append(doc_id)
+                    hit_documents.append(document)
+                    hit_metadatas.append(metadata)
+
+        for segment_data in vectorstore.get_sentence_windows(
+            hit_ids, hit_documents, hit_metadatas, 1
+        ):
+            pdf_content += "\n" + " ".join(segment_data)
 
     if not pdf_content:
         pdf_content = (
@@ -356,7 +607,7 @@ def find_best_match_for_short_reference(source, all_relevant_docs, asset_id, pro
 
 
 def update_process_step_status(
-    db, process_step, status, output=None, output_references=None
+    db, process_step, status, output=None, output_references=None, normalized_output=None
 ):
     """
     Update the status of a process step.
@@ -367,9 +618,15 @@ def update_process_step_status(
     status: The new status
     output: Optional output data
     output_references: Optional output references
+    normalized_output: Optional normalized dates and numbers of the output
     """
     process_repository.update_process_step_status(
-        db, process_step, status, output=output, output_references=output_references
+        db,
+        process_step,
+        status,
+        output=output,
+        output_references=output_references,
+        normalized_output=normalized_output,
     )
 
 def vectorize_extraction_process_step(project_id: int, process_step_id: int, filename: str, references: dict) -> None:
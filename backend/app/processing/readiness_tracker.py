@@ -0,0 +1,101 @@
+import threading
+import traceback
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from app.logger import Logger
+
+
+class ReadinessTracker:
+    """
+    Tracks the process steps waiting for the preprocessing of their asset.
+
+    Steps are parked under their asset instead of having their process rescanned
+    until every asset is ready. Once an asset is preprocessed, the steps waiting for
+    it, and only them, are handed at once to the release handler, which is also told
+    when the preprocessing failed instead.
+
+    The tracker also counts the steps of each process that are running, so that the
+    last step to finish, however it was started, can complete its process.
+    """
+
+    def __init__(self, logger: Logger = None):
+        self.logger = logger or Logger()
+        # Asset id -> process id -> ids of the steps waiting for the asset
+        self.waiting: Dict[int, Dict[int, Set[int]]] = {}
+        self.waiting_steps: Counter = Counter()
+        self.running_steps: Counter = Counter()
+        self.release_handler: Optional[Callable[[int, List[int], bool], None]] = None
+        self.lock = threading.Lock()
+
+    def set_release_handler(self, handler: Callable[[int, List[int], bool], None]) -> None:
+        """
+        Set the function called with a process id, the ids of its released steps
+        and whether their asset is ready, or failed to be preprocessed.
+        """
+        self.release_handler = handler
+
+    def wait(self, process_id: int, asset_steps: Dict[int, Iterable[int]]) -> None:
+        """Park steps of a process until their asset, the key of asset_steps, is ready."""
+        with self.lock:
+            for asset_id, step_ids in asset_steps.items():
+                waiting = self.waiting.setdefault(asset_id, {}).setdefault(process_id, set())
+                for step_id in step_ids:
+                    if step_id not in waiting:
+                        waiting.add(step_id)
+                        self.waiting_steps[process_id] += 1
+
+    def has_waiting_steps(self, process_id: Optional[int] = None) -> bool:
+        with self.lock:
+            if process_id is None:
+                return bool(self.waiting)
+            return self.waiting_steps[process_id] > 0
+
+    def start_steps(self, process_id: int, count: int) -> None:
+        with self.lock:
+            self.running_steps[process_id] += count
+
+    def finish_step(self, process_id: int) -> bool:
+        """Count a running step as finished. Returns True when the process has no step left."""
+        with self.lock:
+            self.running_steps[process_id] -= 1
+            return self._is_idle(process_id)
+
+    def is_idle(self, process_id: int) -> bool:
+        """Whether the process has no step waiting or running."""
+        with self.lock:
+            return self._is_idle(process_id)
+
+    def _is_idle(self, process_id: int) -> bool:
+        if self.waiting_steps[process_id] > 0 or self.running_steps[process_id] > 0:
+            return False
+        del self.waiting_steps[process_id]
+        del self.running_steps[process_id]
+        return True
+
+    def asset_ready(self, asset_id: int) -> None:
+        self._release(asset_id, True)
+
+    def asset_failed(self, asset_id: int) -> None:
+        self._release(asset_id, False)
+
+    def _release(self, asset_id: int, ready: bool) -> None:
+        with self.lock:
+            released = self.waiting.pop(asset_id, {})
+            for process_id, step_ids in released.items():
+                self.waiting_steps[process_id] -= len(step_ids)
+                if ready:
+                    # Counted as running right away, so the process never looks idle meanwhile
+                    self.running_steps[process_id] += len(step_ids)
+
+        for process_id, step_ids in released.items():
+            self.logger.info(
+                f"[ReadinessTracker]: Asset [{asset_id}] {'ready' if ready else 'failed'}, "
+                f"releasing {len(step_ids)} steps of process [{process_id}]"
+            )
+            try:
+                self.release_handler(process_id, sorted(step_ids), ready)
+            except Exception:
+                self.logger.error(traceback.format_exc())
+
+
+readiness_tracker = ReadinessTracker()
@@ -0,0 +1,304 @@
+import multiprocessing
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from app.database import SessionLocal
+from app.logger import Logger
+from app.models.asset_content import AssetProcessingStatus
+from app.processing.readiness_tracker import readiness_tracker
+from app.repositories import project_repository
+from app.vectorstore.chroma import ChromaDB
+from app.vectorstore.embedding_cache import CachedEmbeddingFunction, embed_with_default_model
+
+logger = Logger()
+
+
+def load_segments(
+    project_id: int, asset_id: int, asset_file_name: str
+) -> Tuple[List[str], List[dict]]:
+    """Return the sentences of an asset content with their vectorstore metadata."""
+    with SessionLocal() as db:
+        asset_content = project_repository.get_asset_content(db, asset_id)
+
+    docs = []
+    metadatas = []
+    for content in asset_content.content["content"]:
+        docs.append(content["text"])
+        metadatas.append({
+                "asset_id": asset_id,
+                "filename": asset_file_name,
+                "project_id": project_id,
+                **(content["metadata"] if content.get("metadata") else {"page_number": 1}),  # Unpack all metadata or default to page_number: 1
+            })
+
+    return docs, metadatas
+
+
+def store_segments(
+    vectorstore: ChromaDB,
+    asset_id: int,
+    docs: List[str],
+    metadatas: List[dict],
+    embeddings: Optional[List[List[float]]] = None,
+    batch_size: Optional[int] = None,
+) -> None:
+    ids = vectorstore.add_docs(
+        docs=docs, metadatas=metadatas, embeddings=embeddings, batch_size=batch_size
+    )
+    vectorstore.save_sentence_index(asset_id, ids, docs, metadatas)
+
+    with SessionLocal() as db:
+        project_repository.update_asset_content_status(
+            db,
+            asset_id=asset_id,
+            status=AssetProcessingStatus.COMPLETED,
+        )
+    # Start the process steps that were waiting for the asset
+    readiness_tracker.asset_ready(asset_id)
+
+
+class SegmentationJob:
+    def __init__(self, project_id: int, asset_id: int, asset_file_name: str):
+        self.project_id = project_id
+        self.asset_id = asset_id
+        self.asset_file_name = asset_file_name
+        self.collection_name = f"panda-etl-{project_id}"
+        self.status = "queued"
+        self.docs: List[str] = []
+        self.metadatas: List[dict] = []
+        self.embeddings: List[Optional[List[float]]] = []
+        self.embedded = 0
+
+    def progress(self) -> dict:
+        return {
+            "asset_id": self.asset_id,
+            "status": self.status,
+            "sentences": len(self.docs),
+            "embedded": self.embedded,
+        }
+
+
+class SegmentationPipeline:
+    """
+    Embeds and stores the sentences of parsed assets in the vectorstore.
+
+    A collector thread packs the sentences of the queued assets into embedding
+    batches of up to batch_size sentences, spanning several assets when they are
+    small. Batches are embedded in parallel, in a process pool when the local
+    embedding model is used, and an asset is written to its collection as soon as
+    all its sentences are embedded. Writes into the same collection are serialized.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        batch_wait: float,
+        use_processes: bool = True,
+        logger: Logger = logger,
+    ):
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self.batch_wait = batch_wait
+        self.use_processes = use_processes
+        self.logger = logger
+
+        self._queue: queue.Queue = queue.Queue()
+        self._jobs: Dict[int, SegmentationJob] = {}
+        self._lock = threading.Lock()
+        self._collection_locks = defaultdict(threading.Lock)
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._collector: Optional[threading.Thread] = None
+        self._dispatcher: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._collector is not None:
+                return
+
+            self._dispatcher = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="segmentation"
+            )
+            if self.use_processes:
+                # Spawn so that the workers do not inherit the threads and locks of the server
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            self._collector = threading.Thread(
+                target=self._collect, name="segmentation-collector", daemon=True
+            )
+            self._collector.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            collector = self._collector
+            self._collector = None
+        if collector is None:
+            return
+
+        self._queue.put(None)
+        collector.join()
+        self._dispatcher.shutdown(wait=True)
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, project_id: int, asset_id: int, asset_file_name: str) -> None:
+        self.start()
+        job = SegmentationJob(project_id, asset_id, asset_file_name)
+        with self._lock:
+            self._jobs[asset_id] = job
+        self._queue.put(job)
+
+    def get_progress(self, asset_id: int) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(asset_id)
+            return job.progress() if job else None
+
+    def _collect(self) -> None:
+        pending: List[Tuple[SegmentationJob, int, int]] = []
+        pending_size = 0
+
+        while True:
+            try:
+                job = self._queue.get(timeout=self.batch_wait if pending else None)
+            except queue.Empty:
+                # No more assets coming for now, send the partial batch
+                self._dispatch(pending)
+                pending, pending_size = [], 0
+                continue
+
+            if job is None:
+                self._dispatch(pending)
+                return
+
+            try:
+                job.docs, job.metadatas = load_segments(
+                    job.project_id, job.asset_id, job.asset_file_name
+                )
+            except Exception as e:
+                self._fail(job, e)
+                continue
+
+            job.embeddings = [None] * len(job.docs)
+            job.status = "embedding"
+            if not job.docs:
+                self._dispatcher.submit(self._store, job)
+                continue
+
+            start = 0
+            while start < len(job.docs):
+                end = min(len(job.docs), start + self.batch_size - pending_size)
+                pending.append((job, start, end))
+                pending_size += end - start
+                start = end
+
+                if pending_size >= self.batch_size:
+                    self._dispatch(pending)
+                    pending, pending_size = [], 0
+
+    def _dispatch(self, batch: List[Tuple[SegmentationJob, int, int]]) -> None:
+        if not batch:
+            return
+        # Bound the number of batches waiting for an embedding worker
+        self._slots.acquire()
+        self._dispatcher.submit(self._embed_batch, batch)
+
+    def _embed_batch(self, batch: List[Tuple[SegmentationJob, int, int]]) -> None:
+        try:
+            texts = [text for job, start, end in batch for text in job.docs[start:end]]
+            try:
+                embeddings = self._embed(ChromaDB(batch[0][0].collection_name), texts)
+            except Exception as e:
+                for job in {job for job, _, _ in batch}:
+                    self._fail(job, e)
+                return
+
+            offset = 0
+            for job, start, end in batch:
+                with self._lock:
+                    job.embeddings[start:end] = embeddings[offset : offset + end - start]
+                    job.embedded += end - start
+                    completed = job.status == "embedding" and job.embedded == len(job.docs)
+                    if completed:
+                        job.status = "storing"
+                offset += end - start
+
+                if completed:
+                    self._store(job)
+        finally:
+            self._slots.release()
+
+    def _embed(self, vectorstore: ChromaDB, texts: List[str]) -> List[List[float]]:
+        embed_missing = (
+            self._embed_in_pool if self._pool and vectorstore.uses_default_embeddings else None
+        )
+        embedding_function = vectorstore.collection_embedding_function
+        if isinstance(embedding_function, CachedEmbeddingFunction):
+            return embedding_function.embed(texts, embed_missing)
+        return [
+            [float(value) for value in embedding]
+            for embedding in (embed_missing or embedding_function)(texts)
+        ]
+
+    def _embed_in_pool(self, texts: List[str]):
+        pool = self._pool
+        if pool is None:
+            return embed_with_default_model(texts)
+
+        try:
+            return pool.submit(embed_with_default_model, texts).result()
+        except BrokenProcessPool:
+            self.logger.error("Embedding worker processes died, embedding in threads")
+            self._pool = None
+            return embed_with_default_model(texts)
+
+    def _store(self, job: SegmentationJob) -> None:
+        try:
+            with self._collection_locks[job.collection_name]:
+                store_segments(
+                    ChromaDB(job.collection_name),
+                    job.asset_id,
+                    job.docs,
+                    job.metadatas,
+                    embeddings=job.embeddings,
+                    batch_size=self.batch_size,
+                )
+        except Exception as e:
+            self._fail(job, e)
+            return
+
+        self.logger.info(
+            f"Stored {len(job.docs)} sentences of asset {job.asset_id} in the vector store"
+        )
+        self._finish(job, "completed")
+
+    def _fail(self, job: SegmentationJob, error: Exception) -> None:
+        self.logger.error(f"Error during segmentation for asset {job.asset_id}: {error}")
+        with self._lock:
+            if job.status == "failed":
+                return
+            job.status = "failed"
+        try:
+            with SessionLocal() as db:
+                project_repository.update_asset_content_status(
+                    db,
+                    asset_id=job.asset_id,
+                    status=AssetProcessingStatus.FAILED,
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to mark asset {job.asset_id} as failed: {e}")
+        readiness_tracker.asset_failed(job.asset_id)
+        self._finish(job, "failed")
+
+    def _finish(self, job: SegmentationJob, status: str) -> None:
+        with self._lock:
+            job.status = status
+            job.docs, job.metadatas, job.embeddings = [], [], []
+            if self._jobs.get(job.asset_id) is job:
+                del self._jobs[job.asset_id]
@@ -0,0 +1,83 @@
+import threading
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Optional, Tuple
+from app.logger import Logger
+
+
+class StepScheduler:
+    """
+    A single bounded worker pool shared by the steps of every running process.
+
+    Steps are queued per process and handed out in weighted round-robin order, so a
+    process with thousands of steps cannot starve one with a handful. The number of
+    steps running at the same time never exceeds max_in_flight, regardless of how
+    many processes are active.
+    """
+
+    def __init__(self, max_in_flight: int, logger: Logger = None):
+        self.max_in_flight = max_in_flight
+        self.logger = logger or Logger()
+        self.queues: OrderedDict[int, Deque[Tuple[Future, Callable, tuple]]] = OrderedDict()
+        self.weights: Dict[int, int] = {}
+        self.served: Dict[int, int] = {}
+        self.condition = threading.Condition()
+        self.worker_threads = []
+
+    def submit(
+        self, process_id: int, fn: Callable, *args, weight: Optional[int] = None
+    ) -> Future:
+        """
+        Queue a step of the given process. Weight is the number of steps the process
+        may start per round-robin turn.
+        """
+        future = Future()
+        with self.condition:
+            self._start_workers()
+            self.queues.setdefault(process_id, deque()).append((future, fn, args))
+            if weight is not None:
+                self.weights[process_id] = max(weight, 1)
+            self.condition.notify()
+        return future
+
+    def _start_workers(self) -> None:
+        if self.worker_threads:
+            return
+
+        self.worker_threads = [
+            threading.Thread(target=self._run_worker, daemon=True)
+            for _ in range(self.max_in_flight)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+
+    def _next_task(self) -> Tuple[Future, Callable, tuple]:
+        """Pop the next step in round-robin order. Must be called with the lock held."""
+        process_id, queue = next(iter(self.queues.items()))
+        task = queue.popleft()
+
+        self.served[process_id] = self.served.get(process_id, 0) + 1
+        if not queue:
+            del self.queues[process_id]
+            self.served.pop(process_id, None)
+            self.weights.pop(process_id, None)
+        elif self.served[process_id] >= self.weights.get(process_id, 1):
+            self.served[process_id] = 0
+            self.queues.move_to_end(process_id)
+
+        return task
+
+    def _run_worker(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queues:
+                    self.condition.wait()
+                future, fn, args = self._next_task()
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    self.logger.error(traceback.format_exc())
+                    future.set_exception(e)
@@ -0,0 +1,105 @@
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+# Formats that are already compressed and gain nothing from deflate
+STORED_EXTENSIONS = {".pdf", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".gz"}
+
+zip_reader = ThreadPoolExecutor(
+    max_workers=settings.zip_read_workers, thread_name_prefix="zip-reader"
+)
+
+
+class _StreamSink:
+    """Unseekable file object handing over what zipfile writes, chunk by chunk."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        """Yield what was written since the last drain, if anything."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        if data:
+            yield data
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _compress_type(filename: str) -> int:
+    if os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def iter_zip(
+    files: Iterable[Tuple[str, str]],
+    prefetch: Optional[int] = None,
+    chunk_size: int = 1024 * 1024,
+) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive of (path, arcname) files, skipping missing files.
+
+    Up to `prefetch` files are read ahead in parallel while the archive is
+    written. Entries are sent as soon as they are written, at most chunk_size
+    bytes at a time, so nothing is yielded when none of the files exist.
+    """
+    prefetch = prefetch or settings.zip_prefetch_files
+    files = iter(files)
+    pending: Deque[Tuple[str, Future]] = deque()
+    sink = _StreamSink()
+    archive: Optional[zipfile.ZipFile] = None
+
+    def schedule():
+        while len(pending) < prefetch:
+            next_file = next(files, None)
+            if next_file is None:
+                return
+            path, arcname = next_file
+            pending.append((arcname, zip_reader.submit(_read_file, path)))
+
+    try:
+        schedule()
+        while pending:
+            arcname, future = pending.popleft()
+            content = future.result()
+            schedule()
+            if content is None:
+                continue
+
+            if archive is None:
+                archive = zipfile.ZipFile(sink, "w", allowZip64=True)
+            entry = zipfile.ZipInfo(arcname)
+            entry.compress_type = _compress_type(arcname)
+            entry.file_size = len(content)
+            with archive.open(entry, "w", force_zip64=len(content) > 0xFFFFFFFF) as dest:
+                for start in range(0, len(content), chunk_size):
+                    dest.write(content[start : start + chunk_size])
+                    yield from sink.drain()
+            del content
+            yield from sink.drain()
+
+        if archive is not None:
+            archive.close()
+            yield from sink.drain()
+    finally:
+        # The client went away, drop the reads not started yet
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.cache_entry import CacheEntry
+
+
+def get_cache_entry(db: Session, namespace: str, key: str):
+    """Return the cached value for the key and mark it as recently used."""
+    entry = (
+        db.query(CacheEntry)
+        .filter(CacheEntry.namespace == namespace, CacheEntry.key == key)
+        .first()
+    )
+    if entry is None:
+        return None
+
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+    return entry.value
+
+
+def set_cache_entry(db: Session, namespace: str, key: str, value: dict, max_size: int = None):
+    """
+    Store a value in the cache. When max_size (bytes of serialized values) is given,
+    the least recently used entries of the namespace are evicted to stay under it.
+    """
+    size = len(json.dumps(value))
+    entry = (
+        db.query(CacheEntry)
+        .filter(CacheEntry.namespace == namespace, CacheEntry.key == key)
+        .first()
+    )
+
+    if entry:
+        entry.value = value
+        entry.size = size
+        entry.last_used_at = datetime.utcnow()
+    else:
+        entry = CacheEntry(
+            namespace=namespace,
+            key=key,
+            value=value,
+            size=size,
+            hits=0,
+            last_used_at=datetime.utcnow(),
+        )
+        db.add(entry)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker cached the same key in the meantime
+        db.rollback()
+
+    if max_size is not None:
+        evict_cache_entries(db, namespace, max_size)
+
+
+def evict_cache_entries(db: Session, namespace: str, max_size: int) -> int:
+    """Delete least recently used entries until the namespace fits in max_size bytes."""
+    total_size = (
+        db.query(func.coalesce(func.sum(CacheEntry.size), 0))
+        .filter(CacheEntry.namespace == namespace)
+        .scalar()
+    )
+    if total_size <= max_size:
+        return 0
+
+    evicted_ids = []
+    for entry_id, size in (
+        db.query(CacheEntry.id, CacheEntry.size)
+        .filter(CacheEntry.namespace == namespace)
+        .order_by(CacheEntry.last_used_at, CacheEntry.id)
+        .all()
+    ):
+        if total_size <= max_size:
+            break
+        evicted_ids.append(entry_id)
+        total_size -= size
+
+    db.query(CacheEntry).filter(CacheEntry.id.in_(evicted_ids)).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    return len(evicted_ids)
+
+
+def get_cache_stats(db: Session, namespace: str) -> dict:
+    entries, size, hits = (
+        db.query(
+            func.count(CacheEntry.id),
+            func.coalesce(func.sum(CacheEntry.size), 0),
+            func.coalesce(func.sum(CacheEntry.hits), 0),
+        )
+        .filter(CacheEntry.namespace == namespace)
+        .one()
+    )
+    return {"entries": entries, "size": size, "hits": hits}
+
+
+def clear_cache(db: Session, namespace: str) -> int:
+    deleted = (
+        db.query(CacheEntry)
+        .filter(CacheEntry.namespace == namespace)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
@@ -1,50 +1,62 @@
-from typing import List
+from typing import List, Optional
 from app.models.process import ProcessStatus
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session, joinedload, defer, aliased
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session, joinedload, defer
 
 from app import models
+from app.processing.event_bus import event_bus
 from app.schemas.process import ProcessData, ProcessSuggestion
 from app.models.process_step import ProcessStep, ProcessStepStatus
 from datetime import datetime, timezone
 
 
-def get_processes(db: Session):
-    # Alias for the ProcessStep model to use in the query
-    ProcessStepAlias = aliased(models.ProcessStep)
+# Process column counting the steps in each status
+STEP_COUNT_COLUMNS = {
+    ProcessStepStatus.PENDING: "pending_step_count",
+    ProcessStepStatus.IN_PROGRESS: "in_progress_step_count",
+    ProcessStepStatus.COMPLETED: "completed_step_count",
+    ProcessStepStatus.FAILED: "failed_step_count",
+}
+
+PROCESS_STEP_COLUMNS = (
+    "id",
+    "process_id",
+    "asset_id",
+    "status",
+    "output",
+    "output_references",
+    "created_at",
+    "updated_at",
+)
 
-    # Subquery to get the count of completed ProcessStep
-    completed_steps_count_subquery = (
-        db.query(
-            ProcessStepAlias.process_id,
-            func.count(ProcessStepAlias.id).label("completed_steps_count"),
-        )
-        .filter(ProcessStepAlias.status == ProcessStepStatus.COMPLETED)
-        .group_by(ProcessStepAlias.process_id)
-        .subquery()
-    )
 
-    # Main query to get processes with the count of completed steps
+def get_processes(
+    db: Session,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+    load_details: bool = True,
+):
+    """
+    Return the processes, newest first, with their step counts per status.
+    With a cursor only the processes older than the cursor id are returned,
+    and with a limit at most limit + 1 of them to tell if another page follows.
+    """
     processes = (
-        db.query(
-            models.Process,
-            func.coalesce(
-                completed_steps_count_subquery.c.completed_steps_count, 0
-            ).label("completed_steps_count"),
-        )
+        db.query(models.Process)
         .filter(
             models.Process.deleted_at.is_(None),
         )
-        .outerjoin(
-            completed_steps_count_subquery,
-            models.Process.id == completed_steps_count_subquery.c.process_id,
-        )
         .options(joinedload(models.Process.project), defer(models.Process.output))
         .order_by(models.Process.id.desc())
-        .all()
     )
+    if cursor is not None:
+        processes = processes.filter(models.Process.id < cursor)
+    if not load_details:
+        processes = processes.options(defer(models.Process.details))
+    if limit is not None:
+        processes = processes.limit(limit + 1)
 
-    return processes
+    return processes.all()
 
 
 def get_all_pending_processes(db: Session):
@@ -63,6 +75,7 @@ def create_process(db: Session, process_data: ProcessData):
         status=models.ProcessStatus.PENDING,
         project_id=process_data.project_id,
         details=process_data.data,
+        bypass_cache=process_data.bypass_cache,
         message="Starting process",
     )
     db.add(process)
@@ -71,6 +84,25 @@ def create_process(db: Session, process_data: ProcessData):
     return process
 
 
+def create_process_steps(db: Session, process_id: int, asset_ids: List[int]):
+    """Add a pending step per asset to a process and count them in its progress."""
+    for asset_id in asset_ids:
+        db.add(
+            models.ProcessStep(
+                process_id=process_id,
+                asset_id=asset_id,
+                output=None,
+                status=ProcessStepStatus.PENDING,
+            )
+        )
+    db.execute(
+        update(models.Process)
+        .where(models.Process.id == process_id)
+        .values(pending_step_count=models.Process.pending_step_count + len(asset_ids))
+    )
+    db.commit()
+
+
 def get_process(db: Session, process_id: int):
     return (
         db.query(models.Process)
@@ -92,6 +124,72 @@ def get_process_steps(db: Session, process_id: int):
     )
 
 
+def get_process_step_columns(
+    db: Session,
+    process_id: int,
+    columns: List[str],
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Return only the given columns of the steps of a process, in id order.
+    With a cursor only the steps after the cursor id are returned, and with a
+    limit at most limit + 1 of them to tell if another page follows.
+    """
+    query = (
+        select(*(getattr(models.ProcessStep, column) for column in columns))
+        .where(
+            models.ProcessStep.process_id == process_id,
+            models.ProcessStep.deleted_at.is_(None),
+        )
+        .order_by(models.ProcessStep.id)
+    )
+    if cursor is not None:
+        query = query.where(models.ProcessStep.id > cursor)
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    return db.execute(query).mappings().all()
+
+
+def has_process_steps(db: Session, process_id: int) -> bool:
+    return db.execute(
+        select(models.ProcessStep.id)
+        .where(models.ProcessStep.process_id == process_id)
+        .limit(1)
+    ).first() is not None
+
+
+def iter_completed_step_outputs(db: Session, process_id: int, batch_size: int = 1000):
+    """
+    Yield the id, asset filename, output and normalized output of the completed
+    steps of a process in id order, fetched from the database batch_size rows at
+    a time.
+    """
+    result = db.execute(
+        select(
+            models.ProcessStep.id,
+            models.Asset.filename,
+            models.ProcessStep.output,
+            models.ProcessStep.normalized_output,
+        )
+        .join(models.Asset, models.ProcessStep.asset_id == models.Asset.id)
+        .where(
+            models.ProcessStep.process_id == process_id,
+            models.ProcessStep.status == ProcessStepStatus.COMPLETED,
+            models.ProcessStep.deleted_at.is_(None),
+        )
+        .order_by(models.ProcessStep.id)
+        .execution_options(yield_per=batch_size)
+    )
+    try:
+        for step_id, filename, output, normalized_output in result:
+            if output is not None:
+                yield step_id, filename, output, normalized_output
+    finally:
+        result.close()
+
+
 def get_process_steps_with_asset_content(db: Session, process_id: int, status: List[ProcessStatus]):
     return (
         db.query(models.ProcessStep)
@@ -137,13 +235,19 @@ def delete_process_steps(db: Session, process_id: int):
     db.query(ProcessStep).filter(ProcessStep.process_id == process_id).update(
         {ProcessStep.deleted_at: current_timestamp}
     )
+    db.execute(
+        update(models.Process)
+        .where(models.Process.id == process_id)
+        .values({column: 0 for column in STEP_COUNT_COLUMNS.values()})
+    )
 
     db.commit()
 
 
 def update_process_step_status(
-    db, process_step, status, output=None, output_references=None
+    db, process_step, status, output=None, output_references=None, normalized_output=None
 ):
+    previous_status = process_step.status
     process_step.status = status
     if output:
         process_step.output = output
@@ -151,13 +255,101 @@ def update_process_step_status(
     if output_references:
         process_step.output_references = output_references
 
+    if normalized_output:
+        process_step.normalized_output = normalized_output
+
     db.add(process_step)
+    if previous_status != status:
+        # Moved in the same transaction as the step, so the counts cannot miss it
+        move_step_count(db, process_step.process_id, previous_status, status)
+
+    event = None
+    if event_bus.has_subscribers():
+        event = (
+            process_step.process.project_id,
+            {
+                "process_id": process_step.process_id,
+                "step_id": process_step.id,
+                "asset_id": process_step.asset_id,
+                "status": status.value,
+            },
+        )
+    db.commit()
+
+    if event:
+        event_bus.publish(event[0], "process_step", event[1])
+
+
+def move_step_count(db: Session, process_id: int, from_status, to_status):
+    """Move one step of a process from the count of a status to another."""
+    values = {}
+    if from_status in STEP_COUNT_COLUMNS:
+        column = getattr(models.Process, STEP_COUNT_COLUMNS[from_status])
+        values[column] = column - 1
+    if to_status in STEP_COUNT_COLUMNS:
+        column = getattr(models.Process, STEP_COUNT_COLUMNS[to_status])
+        values[column] = column + 1
+    if values:
+        db.execute(
+            update(models.Process).where(models.Process.id == process_id).values(values)
+        )
+
+
+def repair_step_counts(db: Session, process_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    Recount the steps of the processes, all of them by default, and fix the
+    counts that drifted. Returns the ids of the processes that were fixed.
+    """
+    step_counts = select(
+        models.ProcessStep.process_id,
+        models.ProcessStep.status,
+        func.count(models.ProcessStep.id),
+    ).where(models.ProcessStep.deleted_at.is_(None))
+    processes = select(
+        models.Process.id,
+        *(getattr(models.Process, column) for column in STEP_COUNT_COLUMNS.values()),
+    )
+    if process_ids is not None:
+        step_counts = step_counts.where(models.ProcessStep.process_id.in_(process_ids))
+        processes = processes.where(models.Process.id.in_(process_ids))
+
+    counted = {}
+    for process_id, status, count in db.execute(
+        step_counts.group_by(models.ProcessStep.process_id, models.ProcessStep.status)
+    ):
+        if status in STEP_COUNT_COLUMNS:
+            counted.setdefault(process_id, {})[STEP_COUNT_COLUMNS[status]] = count
+
+    repaired = []
+    for process_id, *current in db.execute(processes).all():
+        expected = {
+            column: counted.get(process_id, {}).get(column, 0)
+            for column in STEP_COUNT_COLUMNS.values()
+        }
+        if list(expected.values()) != current:
+            db.execute(
+                update(models.Process).where(models.Process.id == process_id).values(expected)
+            )
+            repaired.append(process_id)
+
     db.commit()
+    return repaired
 
 
-def update_process_status(db, process, status, completed_at=None):
+def update_process_status(
+    db, process, status, completed_at=None, started_at=None, message=None
+):
     process.status = status
     if completed_at:
         process.completed_at = completed_at
+    if started_at:
+        process.started_at = started_at
+    if message:
+        process.message = message
     db.add(process)
+    project_id, process_id = process.project_id, process.id
     db.commit()
+
+    event_bus.publish(
+        project_id, "process", {"process_id": process_id, "status": status.value}
+    )
@@ -1,13 +1,14 @@
 from typing import List, Union
 from app.models.asset_content import AssetProcessingStatus
-from sqlalchemy.orm import Session, joinedload, defer, aliased
-from sqlalchemy import and_, asc, desc, func, or_
+from sqlalchemy.orm import Session, joinedload, defer
+from sqlalchemy import and_, asc, desc, func, insert, or_, select
 
 from app import models
+from app.processing.event_bus import event_bus
 from app.schemas.project import ProjectCreate, ProjectUpdate
 from app.models.asset import Asset
 from app.models.process import Process
-from app.models.process_step import ProcessStep, ProcessStepStatus
+from app.models.process_step import ProcessStep
 from datetime import datetime, timezone
 
 
@@ -86,40 +87,14 @@ def get_asset(db: Session, asset_id: int):
 
 
 def get_processes(db: Session, project_id: int):
-    # Alias for the ProcessStep model to use in the query
-    ProcessStepAlias = aliased(models.ProcessStep)
-
-    # Subquery to get the count of completed ProcessStep
-    completed_steps_count_subquery = (
-        db.query(
-            ProcessStepAlias.process_id,
-            func.count(ProcessStepAlias.id).label("completed_steps_count"),
-        )
-        .filter(ProcessStepAlias.status == ProcessStepStatus.COMPLETED)
-        .group_by(ProcessStepAlias.process_id)
-        .subquery()
-    )
-
-    # Main query to get processes with the count of completed steps
-    processes = (
-        db.query(
-            models.Process,
-            func.coalesce(
-                completed_steps_count_subquery.c.completed_steps_count, 0
-            ).label("completed_steps_count"),
-        )
+    return (
+        db.query(models.Process)
         .filter(models.Process.project_id == project_id)
-        .outerjoin(
-            completed_steps_count_subquery,
-            models.Process.id == completed_steps_count_subquery.c.process_id,
-        )
         .options(joinedload(models.Process.project), defer(models.Process.output))
         .order_by(models.Process.id.desc())
         .all()
     )
 
-    return processes
-
 
 def add_asset_content(db: Session, asset_id: int, content: dict):
     if content:
@@ -139,6 +114,91 @@ def add_asset_content(db: Session, asset_id: int, content: dict):
     return asset_content
 
 
+def add_assets(
+    db: Session,
+    project_id: int,
+    assets: List[dict],
+    existing_asset_ids: List[int] = (),
+):
+    """
+    Insert the assets of a project with their pending contents and the batch
+    tracking their preprocessing, in a single transaction. The batch also
+    covers the existing assets given, such as refreshed URL assets.
+    """
+    new_assets = []
+    if assets:
+        new_assets = db.scalars(
+            insert(models.Asset).returning(models.Asset),
+            [{**asset, "project_id": project_id} for asset in assets],
+        ).all()
+        db.execute(
+            insert(models.AssetContent),
+            [
+                {"asset_id": asset.id, "processing": AssetProcessingStatus.PENDING}
+                for asset in new_assets
+            ],
+        )
+
+    asset_ids = [asset.id for asset in new_assets] + list(existing_asset_ids)
+    asset_batch = models.AssetBatch(
+        project_id=project_id,
+        asset_ids=asset_ids,
+        total=len(asset_ids),
+        processed=0,
+        failed=0,
+    )
+    db.add(asset_batch)
+    db.commit()
+    return new_assets, asset_batch
+
+
+def get_url_assets(db: Session, project_id: int, urls: List[str]):
+    """Return the URL assets of a project added from any of the urls, by url."""
+    urls = set(urls)
+    assets = (
+        db.query(models.Asset)
+        .filter(models.Asset.project_id == project_id, models.Asset.type == "url")
+        .order_by(models.Asset.id)
+        .all()
+    )
+    return {
+        asset.details["url"]: asset
+        for asset in assets
+        if asset.details and asset.details.get("url") in urls
+    }
+
+
+def update_asset(db: Session, asset_id: int, size: int = None, details: dict = None):
+    values = {}
+    if size is not None:
+        values[models.Asset.size] = size
+    if details is not None:
+        values[models.Asset.details] = details
+    if values:
+        db.query(models.Asset).filter(models.Asset.id == asset_id).update(values)
+        db.commit()
+
+
+def get_asset_batch(db: Session, batch_id: int):
+    return db.query(models.AssetBatch).filter(models.AssetBatch.id == batch_id).first()
+
+
+def reset_asset_batch(db: Session, batch_id: int):
+    db.query(models.AssetBatch).filter(models.AssetBatch.id == batch_id).update(
+        {models.AssetBatch.processed: 0, models.AssetBatch.failed: 0}
+    )
+    db.commit()
+
+
+def increment_asset_batch(db: Session, batch_id: int, failed: bool = False):
+    """Count a preprocessed asset of the batch, updated in place so workers don't race."""
+    values = {models.AssetBatch.processed: models.AssetBatch.processed + 1}
+    if failed:
+        values[models.AssetBatch.failed] = models.AssetBatch.failed + 1
+    db.query(models.AssetBatch).filter(models.AssetBatch.id == batch_id).update(values)
+    db.commit()
+
+
 def update_or_add_asset_content(db: Session, asset_id: int, content: dict):
     asset_content = (
         db.query(models.AssetContent)
@@ -171,15 +231,40 @@ def update_asset_content_status(
     asset_id: int = None,
 ):
     if asset_content_id:
-        db.query(models.AssetContent).filter(
-            models.AssetContent.id == asset_content_id
-        ).update({models.AssetContent.processing: status})
-        db.commit()
+        condition = models.AssetContent.id == asset_content_id
     elif asset_id:
-        db.query(models.AssetContent).filter(
-            models.AssetContent.asset_id == asset_id
-        ).update({models.AssetContent.processing: status})
-        db.commit()
+        condition = models.AssetContent.asset_id == asset_id
+    else:
+        return
+
+    db.query(models.AssetContent).filter(condition).update(
+        {models.AssetContent.processing: status}
+    )
+    db.commit()
+
+    if event_bus.has_subscribers():
+        assets = db.execute(
+            select(models.Asset.project_id, models.Asset.id)
+            .join(models.AssetContent, models.AssetContent.asset_id == models.Asset.id)
+            .where(condition)
+        ).all()
+        for project_id, updated_asset_id in assets:
+            event_bus.publish(
+                project_id,
+                "asset",
+                {"asset_id": updated_asset_id, "status": status.name.lower()},
+            )
+
+
+def get_asset_content_statuses(db: Session, asset_ids: List[int]):
+    """Return the processing status of the content of each asset, by asset id."""
+    return dict(
+        db.execute(
+            select(models.AssetContent.asset_id, models.AssetContent.processing).where(
+                models.AssetContent.asset_id.in_(asset_ids)
+            )
+        ).all()
+    )
 
 
 def get_asset_content(db: Session, asset_id: int):
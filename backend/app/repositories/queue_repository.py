@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.queue_job import QueueJob, QueueJobStatus
+
+ACTIVE_STATUSES = [QueueJobStatus.PENDING, QueueJobStatus.LEASED]
+
+
+def _claimable(queue: str, now: datetime):
+    # A job can be claimed when it is pending and due, or when the worker
+    # holding it let the lease expire and it still has attempts left.
+    return and_(
+        QueueJob.queue == queue,
+        QueueJob.deleted_at.is_(None),
+        or_(
+            and_(
+                QueueJob.status == QueueJobStatus.PENDING,
+                QueueJob.available_at <= now,
+            ),
+            and_(
+                QueueJob.status == QueueJobStatus.LEASED,
+                QueueJob.lease_expires_at < now,
+                QueueJob.attempts < QueueJob.max_attempts,
+            ),
+        ),
+    )
+
+
+def get_job(db: Session, job_id: int):
+    return db.query(QueueJob).filter(QueueJob.id == job_id).first()
+
+
+def get_active_job(db: Session, queue: str, key: str):
+    return (
+        db.query(QueueJob)
+        .filter(
+            QueueJob.queue == queue,
+            QueueJob.key == key,
+            QueueJob.status.in_(ACTIVE_STATUSES),
+        )
+        .first()
+    )
+
+
+def enqueue_job(
+    db: Session,
+    queue: str,
+    payload: dict,
+    key: Optional[str] = None,
+    priority: int = 0,
+    max_attempts: int = 3,
+    delay: float = 0,
+):
+    """
+    Add a job to the queue. When a key is given and a job with the same key
+    is still pending or leased, that job is returned instead of a duplicate.
+    """
+    if key:
+        existing_job = get_active_job(db, queue, key)
+        if existing_job:
+            return _raise_priority(db, existing_job, priority)
+
+    job = QueueJob(
+        queue=queue,
+        key=key,
+        payload=payload,
+        priority=priority,
+        status=QueueJobStatus.PENDING,
+        attempts=0,
+        max_attempts=max_attempts,
+        available_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same key was enqueued concurrently, the active key index kept one job
+        db.rollback()
+        existing_job = get_active_job(db, queue, key) if key else None
+        if existing_job is None:
+            raise
+        return _raise_priority(db, existing_job, priority)
+    db.refresh(job)
+    return job
+
+
+def _raise_priority(db: Session, job: QueueJob, priority: int) -> QueueJob:
+    if priority > job.priority:
+        job.priority = priority
+        db.commit()
+    return job
+
+
+def claim_job(db: Session, queue: str, owner: str, lease_seconds: int, candidates: int = 5):
+    """
+    Atomically lease the next due job of the queue to the given owner.
+
+    The lease is taken with a conditional UPDATE, so when several workers race
+    for the same row only one of them sees it change and the others move on.
+    """
+    now = datetime.utcnow()
+    job_ids = [
+        job_id
+        for (job_id,) in db.query(QueueJob.id)
+        .filter(_claimable(queue, now))
+        .order_by(QueueJob.priority.desc(), QueueJob.available_at, QueueJob.id)
+        .limit(candidates)
+        .all()
+    ]
+
+    for job_id in job_ids:
+        updated = (
+            db.query(QueueJob)
+            .filter(QueueJob.id == job_id, _claimable(queue, now))
+            .update(
+                {
+                    QueueJob.status: QueueJobStatus.LEASED,
+                    QueueJob.lease_owner: owner,
+                    QueueJob.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                    QueueJob.attempts: QueueJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if updated == 1:
+            return get_job(db, job_id)
+
+    return None
+
+
+def extend_lease(db: Session, job_id: int, owner: str, lease_seconds: int) -> bool:
+    updated = (
+        db.query(QueueJob)
+        .filter(
+            QueueJob.id == job_id,
+            QueueJob.lease_owner == owner,
+            QueueJob.status == QueueJobStatus.LEASED,
+        )
+        .update(
+            {QueueJob.lease_expires_at: datetime.utcnow() + timedelta(seconds=lease_seconds)},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def complete_job(db: Session, job_id: int, owner: str) -> bool:
+    updated = (
+        db.query(QueueJob)
+        .filter(
+            QueueJob.id == job_id,
+            QueueJob.lease_owner == owner,
+            QueueJob.status == QueueJobStatus.LEASED,
+        )
+        .update(
+            {
+                QueueJob.status: QueueJobStatus.COMPLETED,
+                QueueJob.lease_expires_at: None,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def fail_job(db: Session, job_id: int, owner: str, error: str, retry_delay: float = 0) -> bool:
+    """
+    Release a leased job after a failure. The job goes back to the queue after
+    retry_delay seconds, or is marked failed once it ran out of attempts.
+    """
+    job = get_job(db, job_id)
+    if job is None or job.lease_owner != owner or job.status != QueueJobStatus.LEASED:
+        return False
+
+    if job.attempts >= job.max_attempts:
+        job.status = QueueJobStatus.FAILED
+    else:
+        job.status = QueueJobStatus.PENDING
+        job.available_at = datetime.utcnow() + timedelta(seconds=retry_delay)
+
+    job.lease_owner = None
+    job.lease_expires_at = None
+    job.last_error = error
+    db.commit()
+    return True
+
+
+def fail_exhausted_jobs(db: Session, queue: str) -> List[QueueJob]:
+    """Mark jobs whose lease expired on their last attempt as failed and return them."""
+    exhausted = and_(
+        QueueJob.queue == queue,
+        QueueJob.status == QueueJobStatus.LEASED,
+        QueueJob.lease_expires_at < datetime.utcnow(),
+        QueueJob.attempts >= QueueJob.max_attempts,
+    )
+    jobs = db.query(QueueJob).filter(exhausted).all()
+    if not jobs:
+        return []
+
+    db.query(QueueJob).filter(
+        QueueJob.id.in_([job.id for job in jobs]), exhausted
+    ).update(
+        {
+            QueueJob.status: QueueJobStatus.FAILED,
+            QueueJob.last_error: "Lease expired on the last attempt",
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return jobs
@@ -1,21 +1,41 @@
+import asyncio
 import json
 import os
-from app.exceptions import CreditLimitExceededException
+from app.exceptions import CreditLimitExceededException, UpstreamServiceException
 from fastapi import HTTPException
 from .schemas import ExtractFieldsResponse, TextExtractionResponse
-import requests
+from .http_client import get_async_client, get_client
+from .rate_limiter import RETRYABLE_STATUS_CODES, AdaptiveRateLimiter, parse_retry_after
 from app.config import settings
 from app.logger import Logger
 
 logger = Logger()
 
+# Shared by the preprocessing and processing workers calling the PandaETL server
+pandaetl_rate_limiter = AdaptiveRateLimiter(
+    rate=settings.pandaetl_rate_limit,
+    burst=settings.pandaetl_rate_burst,
+    max_concurrency=settings.pandaetl_max_concurrency,
+    min_concurrency=settings.pandaetl_min_concurrency,
+)
+
+
+def _raise_if_retryable(response, message: str) -> None:
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        logger.error(f"{message} It returned {response.status_code} code: {response.text}")
+        raise UpstreamServiceException(
+            message,
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+
 
 def request_api_key(email: str):
     url = f"{settings.api_server_url}/api/auth/register-pandaetl"
 
     headers = {"Content-Type": "application/json"}
 
-    response = requests.post(url, json={"email": email}, headers=headers)
+    response = get_client().post(url, json={"email": email}, headers=headers)
 
     if response.status_code not in [200, 201]:
         logger.error(
@@ -25,7 +45,7 @@ def request_api_key(email: str):
 
     try:
         data = response.json()
-    except requests.exceptions.JSONDecodeError:
+    except json.JSONDecodeError:
         logger.error(f"Invalid JSON response from API server: {response.text}")
         raise Exception("Invalid JSON response")
 
@@ -40,15 +60,17 @@ def extract_text_from_file(api_token: str, file_path: str, metadata: bool=True)
     with open(file_path, "rb") as file:
         files["file"] = (os.path.basename(file_path), file)
 
-        response = requests.post(
-            f"{settings.pandaetl_server_url}/v1/parse",
-            files=files,
-            headers=headers,
-            timeout=360,
-            params={"metadata": metadata}
+        response = pandaetl_rate_limiter.call(
+            lambda: get_client().post(
+                f"{settings.pandaetl_server_url}/v1/parse",
+                files=files,
+                headers=headers,
+                params={"metadata": metadata}
+            )
         )
 
     # Check the response status code
+    _raise_if_retryable(response, f"Server busy during text extraction of {file_path}.")
     if response.status_code == 201 or response.status_code == 200:
         data = response.json()
         return TextExtractionResponse(**data)
@@ -59,36 +81,23 @@ def extract_text_from_file(api_token: str, file_path: str, metadata: bool=True)
         raise Exception("Unable to process file!")
 
 
-def extract_data(api_token, fields, file_path=None, pdf_content=None) -> ExtractFieldsResponse:
+def _extract_data_request(api_token, fields, pdf_content=None) -> dict:
     fields_data = fields if isinstance(fields, str) else json.dumps(fields)
 
-    # Prepare the headers with the Bearer token
-    headers = {"x-authorization": f"Bearer {api_token}"}
-
-    # Prepare the data and files dictionaries
+    # Prepare the data dictionary and the headers with the Bearer token
     data = {"fields": fields_data}
-    files = {}
-
-    if file_path:
-        if not os.path.isfile(file_path):
-            raise FileNotFoundError(f"The file at {file_path} does not exist.")
-
-        with open(file_path, "rb") as file:
-            files["file"] = (os.path.basename(file_path), file)
-
-    elif pdf_content:
+    if pdf_content:
         data["pdf_content"] = pdf_content
 
-    # Send the request
-    response = requests.post(
-        f"{settings.pandaetl_server_url}/v1/extract",
-        files=files if files else None,
-        data=data,
-        headers=headers,
-        timeout=360,
-        params={"references": True}
-    )
+    return {
+        "url": f"{settings.pandaetl_server_url}/v1/extract",
+        "data": data,
+        "headers": {"x-authorization": f"Bearer {api_token}"},
+        "params": {"references": True},
+    }
 
+
+def _extract_data_response(response, file_path=None) -> ExtractFieldsResponse:
     # Check the response status code
     if response.status_code == 201 or response.status_code == 200:
 
@@ -104,27 +113,64 @@ def extract_data(api_token, fields, file_path=None, pdf_content=None) -> Extract
         )
 
     else:
+        _raise_if_retryable(response, f"Server busy during extraction of {file_path}.")
         logger.error(
             f"Unable to process file ${file_path} during extraction. It returned {response.status_code} code: {response.text}"
         )
         raise Exception("Unable to process file!")
 
 
-def extract_field_descriptions(api_token, fields):
+def extract_data(api_token, fields, file_path=None, pdf_content=None) -> ExtractFieldsResponse:
+    request = _extract_data_request(api_token, fields, None if file_path else pdf_content)
 
-    # Prepare the headers with the Bearer token
-    headers = {"x-authorization": f"Bearer {api_token}"}
+    if file_path:
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"The file at {file_path} does not exist.")
+
+        with open(file_path, "rb") as file:
+            response = pandaetl_rate_limiter.call(
+                lambda: get_client().post(
+                    files={"file": (os.path.basename(file_path), file)}, **request
+                )
+            )
+    else:
+        response = pandaetl_rate_limiter.call(lambda: get_client().post(**request))
 
-    # Prepare the data and files dictionaries
-    data = {"fields": fields}
+    return _extract_data_response(response, file_path)
 
-    # Send the request
-    response = requests.post(
-        f"{settings.pandaetl_server_url}/v1/extract/field-descriptions",
-        json=data,
-        headers=headers,
-        timeout=360,
-    )
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+async def extract_data_async(api_token, fields, file_path=None, pdf_content=None) -> ExtractFieldsResponse:
+    request = _extract_data_request(api_token, fields, None if file_path else pdf_content)
+
+    if file_path:
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"The file at {file_path} does not exist.")
+
+        # Read off the event loop, the file can take a while to load
+        content = await asyncio.to_thread(_read_file, file_path)
+        response = await get_async_client().post(
+            files={"file": (os.path.basename(file_path), content)}, **request
+        )
+    else:
+        response = await get_async_client().post(**request)
+
+    return _extract_data_response(response, file_path)
+
+
+def _extract_field_descriptions_request(api_token, fields) -> dict:
+    return {
+        "url": f"{settings.pandaetl_server_url}/v1/extract/field-descriptions",
+        "json": {"fields": fields},
+        "headers": {"x-authorization": f"Bearer {api_token}"},
+    }
+
+
+def _extract_field_descriptions_response(response):
     if response.status_code not in [200, 201]:
         logger.error(
             f"Failed to field description. It returned {response.status_code} code: {response.text}"
@@ -140,29 +186,36 @@ def extract_field_descriptions(api_token, fields):
     return response.json()
 
 
+def extract_field_descriptions(api_token, fields):
+    response = get_client().post(**_extract_field_descriptions_request(api_token, fields))
+    return _extract_field_descriptions_response(response)
+
+
+async def extract_field_descriptions_async(api_token, fields):
+    response = await get_async_client().post(
+        **_extract_field_descriptions_request(api_token, fields)
+    )
+    return _extract_field_descriptions_response(response)
+
+
 def highlight_sentences_in_pdf(api_token, sentences, file_path, output_path):
     # Prepare the headers with the Bearer token
     headers = {"x-authorization": f"Bearer {api_token}"}
 
-    # Prepare the data and files dictionaries
+    # Prepare the data dictionary
     data = {"sentences": json.dumps(sentences)}
-    files = {}
 
-    if file_path:
-        if not os.path.isfile(file_path):
-            raise FileNotFoundError(f"The file at {file_path} does not exist.")
-
-        file = open(file_path, "rb")
-        files["file"] = (os.path.basename(file_path), file)
+    if not file_path or not os.path.isfile(file_path):
+        raise FileNotFoundError(f"The file at {file_path} does not exist.")
 
     # Send the request
-    response = requests.post(
-        f"{settings.pandaetl_server_url}/v1/extract/highlight-pdf",
-        files=files,
-        data=data,
-        headers=headers,
-        timeout=360,
-    )
+    with open(file_path, "rb") as file:
+        response = get_client().post(
+            f"{settings.pandaetl_server_url}/v1/extract/highlight-pdf",
+            files={"file": (os.path.basename(file_path), file)},
+            data=data,
+            headers=headers,
+        )
 
     # Check the response status code
     if response.status_code == 200:
@@ -177,20 +230,15 @@ def highlight_sentences_in_pdf(api_token, sentences, file_path, output_path):
         raise Exception("Unable to process file!")
 
 
-def chat_query(api_token, query, docs):
+def _chat_query_request(api_token, query, docs) -> dict:
+    return {
+        "url": f"{settings.pandaetl_server_url}/v1/chat",
+        "json": {"query": query, "docs": docs},
+        "headers": {"x-authorization": f"Bearer {api_token}"},
+    }
 
-    # Prepare the headers with the Bearer token
-    headers = {"x-authorization": f"Bearer {api_token}"}
 
-    # Prepare the data and files dictionaries
-    data = {"query": query, "docs": docs}
-    # Send the request
-    response = requests.post(
-        f"{settings.pandaetl_server_url}/v1/chat",
-        json=data,
-        headers=headers,
-        timeout=360,
-    )
+def _chat_query_response(response):
     # Check the response status code
     if response.status_code == 201 or response.status_code == 200:
         return response.json()
@@ -201,13 +249,18 @@ def chat_query(api_token, query, docs):
         raise Exception("Unable to process user query!")
 
 
+def chat_query(api_token, query, docs):
+    response = get_client().post(**_chat_query_request(api_token, query, docs))
+    return _chat_query_response(response)
+
+
 def get_user_usage_data(api_token: str):
     url = f"{settings.pandaetl_server_url}/v1/user/usage"
 
     # Prepare the headers with the Bearer token
     headers = {"x-authorization": f"Bearer {api_token}"}
 
-    response = requests.post(url, headers=headers)
+    response = get_client().post(url, headers=headers)
 
     try:
         if response.status_code not in [200, 201]:
@@ -217,6 +270,6 @@ def get_user_usage_data(api_token: str):
             raise Exception(response.text)
 
         return response.json()
-    except requests.exceptions.JSONDecodeError:
+    except json.JSONDecodeError:
         logger.error(f"Invalid JSON response from API server: {response.text}")
         raise Exception("Invalid JSON response")
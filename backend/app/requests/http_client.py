@@ -0,0 +1,62 @@
+import importlib.util
+import threading
+from typing import Optional
+import httpx
+from app.config import settings
+
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    # HTTP/2 needs the optional h2 package, fall back to HTTP/1.1 keep-alive without it
+    return settings.http_enable_http2 and importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "timeout": httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide pooled client used by the blocking request helpers."""
+    global _client
+    if _client is None or _client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(**_client_options())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client used by the asyncio request helpers."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        with _lock:
+            if _async_client is None or _async_client.is_closed:
+                _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def close_client() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def close_async_client() -> None:
+    global _async_client
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,166 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+import httpx
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(tz=timezone.utc)).total_seconds(), 0)
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base_delay: float = 1,
+    max_delay: float = 60,
+) -> float:
+    """
+    Delay before retry number `attempt` (starting at 1): the server's Retry-After
+    when it sent one, exponential backoff with full jitter otherwise.
+    """
+    if retry_after is not None:
+        return min(retry_after, max_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+class AdaptiveRateLimiter:
+    """
+    Client-side limiter for calls to a remote service shared by many worker threads.
+
+    A token bucket caps the request rate, and an AIMD window caps the number of
+    requests in flight: the window grows by one request per window of successful
+    calls and is cut multiplicatively when the server throttles, fails or answers
+    much slower than usual. A Retry-After from the server pauses every caller.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        decrease_factor: float = 0.5,
+        slow_decrease_factor: float = 0.9,
+        latency_tolerance: float = 2.0,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+        self.slow_decrease_factor = slow_decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.tokens = float(self.burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> None:
+        """Block until the caller may send a request."""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    self.condition.wait(self.blocked_until - now)
+                    continue
+
+                if self.in_flight >= max(int(self.concurrency_limit), self.min_concurrency):
+                    self.condition.wait()
+                    continue
+
+                if self.rate > 0:
+                    self._refill(now)
+                    if self.tokens < 1:
+                        self.condition.wait((1 - self.tokens) / self.rate)
+                        continue
+                    self.tokens -= 1
+
+                self.in_flight += 1
+                return
+
+    def release(
+        self, latency: float, throttled: bool = False, retry_after: Optional[float] = None
+    ) -> None:
+        """Record the outcome of a request and adjust the concurrency window."""
+        with self.condition:
+            self.in_flight -= 1
+
+            if throttled:
+                self.concurrency_limit = max(
+                    self.min_concurrency, self.concurrency_limit * self.decrease_factor
+                )
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            elif (
+                self.latency_ewma is not None
+                and latency > self.latency_ewma * self.latency_tolerance
+            ):
+                self.concurrency_limit = max(
+                    self.min_concurrency, self.concurrency_limit * self.slow_decrease_factor
+                )
+            else:
+                self.concurrency_limit = min(
+                    self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit
+                )
+
+            if not throttled:
+                self.latency_ewma = (
+                    latency
+                    if self.latency_ewma is None
+                    else 0.8 * self.latency_ewma + 0.2 * latency
+                )
+
+            self.condition.notify_all()
+
+    def call(self, send: Callable[[], httpx.Response]) -> httpx.Response:
+        """Send a request through the limiter and learn from its response."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            response = send()
+        except httpx.TransportError:
+            self.release(time.monotonic() - start, throttled=True)
+            raise
+        except Exception:
+            self.release(time.monotonic() - start)
+            raise
+
+        throttled = response.status_code in RETRYABLE_STATUS_CODES
+        self.release(
+            time.monotonic() - start,
+            throttled=throttled,
+            retry_after=(
+                parse_retry_after(response.headers.get("Retry-After")) if throttled else None
+            ),
+        )
+        return response
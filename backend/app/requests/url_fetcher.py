@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from collections import defaultdict
+from typing import List, Optional, Tuple, Union
+from urllib.parse import urlparse
+import httpx
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:91.0) "
+        "Gecko/20100101 Firefox/91.0"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class UrlFetchError(Exception):
+    pass
+
+
+def normalize_url(url: str) -> str:
+    if not urlparse(url).scheme:
+        return "https://" + url
+    return url
+
+
+class UrlFetcher:
+    """
+    Downloads web pages to disk concurrently.
+
+    All the pages of a call share one pooled client. The number of downloads in
+    flight is bounded overall and per host, every download has a timeout, and
+    pages are streamed to a temporary file renamed once complete, aborting past
+    max_size bytes. The file is hashed while it is written.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        per_host_limit: int = 2,
+        timeout: float = 30,
+        max_size: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.transport = transport
+
+    async def fetch_all(
+        self,
+        downloads: List[Tuple[str, str]],
+        validators: Optional[List[Optional[dict]]] = None,
+    ) -> List[Union[dict, Exception]]:
+        """
+        Download each (url, file_path) pair. Returns, in the same order, the
+        download details or the exception that made it fail.
+
+        A download with validators, the `etag` and `last_modified` of the copy
+        already on disk, is conditional and leaves the file untouched when the
+        server answers that the page has not been modified.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphores = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        validators = validators or [None] * len(downloads)
+
+        async def fetch(client, url, file_path, validator):
+            url = normalize_url(url)
+            async with semaphore, host_semaphores[urlparse(url).netloc]:
+                return await self.fetch(
+                    client,
+                    url,
+                    file_path,
+                    etag=(validator or {}).get("etag"),
+                    last_modified=(validator or {}).get("last_modified"),
+                )
+
+        async with httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            follow_redirects=True,
+            transport=self.transport,
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    fetch(client, url, file_path, validator)
+                    for (url, file_path), validator in zip(downloads, validators)
+                ),
+                return_exceptions=True,
+            )
+
+    async def fetch(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        file_path: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> dict:
+        directory, filename = os.path.split(file_path)
+        tmp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.part")
+        file_hash = hashlib.sha256()
+        size = 0
+
+        headers = {"Referer": url}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return {
+                    "url": url,
+                    "not_modified": True,
+                    "etag": response.headers.get("ETag", etag),
+                    "last_modified": response.headers.get("Last-Modified", last_modified),
+                }
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length")
+            if self.max_size and content_length and int(content_length) > self.max_size:
+                raise UrlFetchError(f"{url} exceeds the maximum size of {self.max_size} bytes")
+
+            file = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    size += len(chunk)
+                    if self.max_size and size > self.max_size:
+                        raise UrlFetchError(
+                            f"{url} exceeds the maximum size of {self.max_size} bytes"
+                        )
+                    file_hash.update(chunk)
+                    await asyncio.to_thread(file.write, chunk)
+                await asyncio.to_thread(file.close)
+                await asyncio.to_thread(os.replace, tmp_path, file_path)
+            except BaseException:
+                await asyncio.to_thread(file.close)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        return {
+            "url": url,
+            "not_modified": False,
+            "size": size,
+            "content_hash": file_hash.hexdigest(),
+            "content_type": response.headers.get("Content-Type"),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
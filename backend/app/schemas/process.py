@@ -7,6 +7,7 @@ class ProcessData(BaseModel):
     type: str
     data: Dict[str, Any]
     project_id: str | int
+    bypass_cache: bool = False
 
 
 class ProcessSuggestion(BaseModel):
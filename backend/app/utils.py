@@ -1,8 +1,7 @@
 import hashlib
+import os
 from typing import List
-from urllib.parse import urlparse
 import uuid
-import requests
 import re
 import string
 
@@ -16,6 +15,46 @@ def generate_unique_filename(url, extension=".html"):
     return filename
 
 
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+def save_stream(source, destination, chunk_size=1024 * 1024, max_size=None):
+    """
+    Copy a binary stream to destination in chunks, through a temporary file in the
+    same directory renamed once complete. Returns the SHA-256 hex digest and size.
+    """
+    file_hash = hashlib.sha256()
+    size = 0
+    directory, filename = os.path.split(destination)
+    tmp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.part")
+
+    try:
+        with open(tmp_path, "wb") as file:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(f"File exceeds the maximum size of {max_size} bytes")
+                file_hash.update(chunk)
+                file.write(chunk)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return file_hash.hexdigest(), size
+
+
 def is_valid_url(url):
     # Define the regular expression for URL validation
     regex = re.compile(
@@ -42,30 +81,6 @@ def clean_text(text):
     return text
 
 
-def fetch_html_and_save(url, file_path):
-    parsed_url = urlparse(url)
-    if not parsed_url.scheme:
-        url = "https://" + url
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:91.0) "
-            "Gecko/20100101 Firefox/91.0"
-        ),
-        "Referer": url,
-        "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive",
-    }
-
-    session = requests.Session()
-    response = session.get(url, headers=headers)
-    response.raise_for_status()
-
-    # Save the content to a file
-    with open(file_path, "wb") as file:
-        file.write(response.content)
-
-
 def find_sentence_endings(text: str) -> List[int]:
     # Regex to find periods, exclamation marks, and question marks followed by a space or the end of the text
     sentence_endings = [match.end() for match in re.finditer(r'[.!?](?:\s|$)', text)]
@@ -0,0 +1,78 @@
+import threading
+from typing import List, Optional
+
+TOKEN_LIMIT_ERROR_MARKERS = (
+    "maximum context length",
+    "max_tokens_per_request",
+    "too many tokens",
+    "token limit",
+)
+
+
+def is_token_limit_error(error: Exception) -> bool:
+    """Whether the embedding provider rejected a batch for holding too many tokens."""
+    message = str(error).lower()
+    return any(marker in message for marker in TOKEN_LIMIT_ERROR_MARKERS)
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses how many documents to embed per call.
+
+    Batches are capped by a number of documents and a character budget. The
+    document cap doubles while the measured time per document keeps improving,
+    is held once larger batches stop paying off and shrinks when they get slower
+    or when the provider rejects a batch as too large.
+    """
+
+    def __init__(
+        self,
+        initial_size: int,
+        min_size: int = 1,
+        max_size: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        tolerance: float = 0.1,
+    ):
+        self.min_size = max(min_size, 1)
+        self.max_size = max(max_size or initial_size, self.min_size)
+        self.size = min(max(initial_size, self.min_size), self.max_size)
+        self.max_chars = max_chars
+        self.tolerance = tolerance
+        self.best_item_latency: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def next_batch_end(self, docs: List[str], start: int) -> int:
+        """Return the end of the batch starting at `start`, at least one document long."""
+        end = min(len(docs), start + self.size)
+        if self.max_chars is None:
+            return end
+
+        chars = 0
+        for index in range(start, end):
+            chars += len(docs[index])
+            if chars > self.max_chars and index > start:
+                return index
+        return end
+
+    def record(self, batch_size: int, elapsed: float) -> None:
+        """Adjust the batch size from the time it took to embed a batch."""
+        if batch_size <= 0:
+            return
+
+        item_latency = elapsed / batch_size
+        with self._lock:
+            if self.best_item_latency is None or item_latency < self.best_item_latency * (
+                1 - self.tolerance
+            ):
+                self.best_item_latency = item_latency
+                if batch_size >= self.size:
+                    self.size = min(self.max_size, self.size * 2)
+            elif item_latency > self.best_item_latency * (1 + self.tolerance):
+                self.best_item_latency = item_latency
+                self.size = max(self.min_size, int(self.size * 0.75))
+
+    def shrink(self, batch_size: int) -> None:
+        """Lower the cap below a batch the provider rejected as too large."""
+        with self._lock:
+            self.max_size = max(self.min_size, batch_size // 2)
+            self.size = min(self.size, self.max_size)
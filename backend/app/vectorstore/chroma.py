@@ -1,10 +1,16 @@
+import os
+import threading
+import time
 import uuid
-from typing import Callable, Iterable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 import chromadb
 from app.config import settings as default_settings
 from app.vectorstore import VectorStore
+from app.vectorstore.batch_sizer import AdaptiveBatchSizer, is_token_limit_error
+from app.vectorstore.embedding_cache import CachedEmbeddingFunction
+from app.vectorstore.sentence_index import SentenceIndex
 from app.logger import Logger
 from chromadb import config
 from chromadb.utils import embedding_functions
@@ -14,6 +20,125 @@ logger = Logger(verbose=True)
 
 DEFAULT_EMBEDDING_FUNCTION = embedding_functions.DefaultEmbeddingFunction()
 
+# Process-wide handles shared by every ChromaDB instance
+_registry_lock = threading.Lock()
+_clients: Dict[Tuple[str, bool], chromadb.ClientAPI] = {}
+_collections: Dict[Tuple[str, str, int], Tuple[Callable, chromadb.Collection]] = {}
+_openai_embedding_functions: Dict[Tuple[str, str], OpenAIEmbeddingFunction] = {}
+_cached_embedding_functions: Dict[Tuple[str, int], CachedEmbeddingFunction] = {}
+_batch_sizers: Dict[int, Tuple[Callable, AdaptiveBatchSizer]] = {}
+
+
+def get_client(client_settings: config.Settings) -> chromadb.ClientAPI:
+    """Return the client of the persist directory, creating it on first use."""
+    key = (client_settings.persist_directory, client_settings.is_persistent)
+    client = _clients.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = chromadb.Client(client_settings)
+                _clients[key] = client
+    return client
+
+
+def get_collection(
+    client: chromadb.ClientAPI,
+    persist_directory: str,
+    collection_name: str,
+    embedding_function: Callable,
+) -> chromadb.Collection:
+    """Return a cached collection handle, creating the collection on first use."""
+    key = (persist_directory, collection_name, id(embedding_function))
+    cached = _collections.get(key)
+    if cached is None:
+        with _registry_lock:
+            cached = _collections.get(key)
+            if cached is None:
+                collection = client.get_or_create_collection(
+                    name=collection_name, embedding_function=embedding_function
+                )
+                # Keep a reference to the embedding function so its id stays unique
+                cached = (embedding_function, collection)
+                _collections[key] = cached
+    return cached[1]
+
+
+def get_openai_embedding_function(api_key: str, model_name: str) -> OpenAIEmbeddingFunction:
+    key = (api_key, model_name)
+    embedding_function = _openai_embedding_functions.get(key)
+    if embedding_function is None:
+        with _registry_lock:
+            embedding_function = _openai_embedding_functions.get(key)
+            if embedding_function is None:
+                embedding_function = OpenAIEmbeddingFunction(
+                    api_key=api_key, model_name=model_name
+                )
+                _openai_embedding_functions[key] = embedding_function
+    return embedding_function
+
+
+def get_cached_embedding_function(
+    embedding_function: Callable, model_name: str, settings: BaseSettings
+) -> CachedEmbeddingFunction:
+    """Return the caching wrapper of an embedding function, shared by its collections."""
+    key = (model_name, id(embedding_function))
+    cached_embedding_function = _cached_embedding_functions.get(key)
+    if cached_embedding_function is None:
+        with _registry_lock:
+            cached_embedding_function = _cached_embedding_functions.get(key)
+            if cached_embedding_function is None:
+                cached_embedding_function = CachedEmbeddingFunction(
+                    embedding_function,
+                    model_name,
+                    memory_size=settings.embedding_cache_memory_size,
+                    store_path=os.path.join(settings.embedding_cache_dir, model_name),
+                )
+                _cached_embedding_functions[key] = cached_embedding_function
+    return cached_embedding_function
+
+
+def get_embedding_cache_stats() -> List[dict]:
+    return [
+        cached_embedding_function.stats()
+        for cached_embedding_function in list(_cached_embedding_functions.values())
+    ]
+
+
+def get_batch_sizer(embedding_function: Callable, settings: BaseSettings) -> AdaptiveBatchSizer:
+    """Return the batch sizer of an embedding function, so sizes are learnt across calls."""
+    key = id(embedding_function)
+    cached = _batch_sizers.get(key)
+    if cached is None:
+        with _registry_lock:
+            cached = _batch_sizers.get(key)
+            if cached is None:
+                if settings.use_openai_embeddings and settings.openai_api_key:
+                    batch_sizer = AdaptiveBatchSizer(
+                        settings.openai_embedding_batch_size,
+                        max_chars=settings.embedding_batch_max_chars,
+                    )
+                else:
+                    batch_sizer = AdaptiveBatchSizer(
+                        settings.chroma_batch_size,
+                        max_size=settings.chroma_max_batch_size,
+                        max_chars=settings.embedding_batch_max_chars,
+                    )
+                # Keep a reference to the embedding function so its id stays unique
+                cached = (embedding_function, batch_sizer)
+                _batch_sizers[key] = cached
+    return cached[1]
+
+
+def clear_registry() -> None:
+    """Drop every cached client and collection handle."""
+    with _registry_lock:
+        _collections.clear()
+        _clients.clear()
+        _openai_embedding_functions.clear()
+        _cached_embedding_functions.clear()
+        _batch_sizers.clear()
+
 class ChromaDB(VectorStore):
     """
     Implementation of ChromeDB vector store
@@ -27,13 +152,12 @@ class ChromaDB(VectorStore):
         client_settings: Optional[config.Settings] = None,
         max_samples: int = 3,
         similarity_threshold: int = 1.5,
-        batch_size: Optional[int] = None,
         settings: Optional[BaseSettings] = None,
     ) -> None:
         self.settings = settings or default_settings
+        self._collection_name = collection_name
         self._max_samples = max_samples
         self._similarity_threshold = similarity_threshold
-        self._batch_size = batch_size or self.settings.chroma_batch_size
 
         # Initialize Chromadb Client
         if client_settings:
@@ -53,20 +177,34 @@ class ChromaDB(VectorStore):
             _client_settings.persist_directory = self.settings.chromadb_url
 
         self._client_settings = _client_settings
-        self._client = chromadb.Client(_client_settings)
+        self._client = get_client(_client_settings)
         self._persist_directory = _client_settings.persist_directory
 
         # Use the embedding function from config
+        embedding_model = None
         if self.settings.use_openai_embeddings and self.settings.openai_api_key:
-            self._embedding_function = OpenAIEmbeddingFunction(
-                api_key=self.settings.openai_api_key,
-                model_name=self.settings.openai_embedding_model
+            self._embedding_function = get_openai_embedding_function(
+                self.settings.openai_api_key, self.settings.openai_embedding_model
             )
+            embedding_model = self.settings.openai_embedding_model
         else:
             self._embedding_function = embedding_function or DEFAULT_EMBEDDING_FUNCTION
+            if self._embedding_function is DEFAULT_EMBEDDING_FUNCTION:
+                embedding_model = DEFAULT_EMBEDDING_FUNCTION.MODEL_NAME
+
+        # Known models get their embeddings cached, custom functions are used as is
+        self.collection_embedding_function = self._embedding_function
+        if embedding_model and self.settings.embedding_cache_enabled:
+            self.collection_embedding_function = get_cached_embedding_function(
+                self._embedding_function, embedding_model, self.settings
+            )
+        self.uses_default_embeddings = self._embedding_function is DEFAULT_EMBEDDING_FUNCTION
 
-        self._docs_collection = self._client.get_or_create_collection(
-            name=collection_name, embedding_function=self._embedding_function
+        self._docs_collection = get_collection(
+            self._client,
+            self._persist_directory,
+            collection_name,
+            self.collection_embedding_function,
         )
 
     def add_docs(
@@ -75,6 +213,7 @@ class ChromaDB(VectorStore):
         ids: Optional[Iterable[str]] = None,
         metadatas: Optional[List[dict]] = None,
         batch_size: Optional[int] = None,
+        embeddings: Optional[List[List[float]]] = None,
     ) -> List[str]:
         """
         Add docs to the training set
@@ -82,7 +221,8 @@ class ChromaDB(VectorStore):
             docs: Iterable of strings to add to the vectorstore.
             ids: Optional Iterable of ids associated with the texts.
             metadatas: Optional list of metadatas associated with the texts.
-            batch_size: Optional batch size for adding documents. If not provided, uses the instance's batch size.
+            batch_size: Optional batch size for adding documents. If not provided, batches adapt to the embedding function.
+            embeddings: Optional precomputed embeddings of the texts.
 
         Returns:
             List of ids from adding the texts into the vectorstore.
@@ -101,27 +241,54 @@ class ChromaDB(VectorStore):
         filename = metadatas[0].get('filename', 'unknown')
         logger.info(f"Adding {len(docs)} sentences to the vector store for file {filename}")
 
-        # If using OpenAI embeddings, add all documents at once
-        if self.settings.use_openai_embeddings and self.settings.openai_api_key:
-            logger.info("Using OpenAI embeddings")
+        # An explicit batch size is used as is, otherwise batches adapt to the embedder
+        sizer = (
+            AdaptiveBatchSizer(batch_size)
+            if batch_size
+            else get_batch_sizer(self.collection_embedding_function, self.settings)
+        )
+
+        start = 0
+        while start < len(docs):
+            end = sizer.next_batch_end(docs, start)
+            self._add_batch(sizer, docs, ids, metadatas, embeddings, start, end)
+            start = end
+
+        return list(ids)
+
+    def _add_batch(
+        self,
+        sizer: AdaptiveBatchSizer,
+        docs: List[str],
+        ids: List[str],
+        metadatas: List[dict],
+        embeddings: Optional[List[List[float]]],
+        start: int,
+        end: int,
+    ) -> None:
+        logger.info(f"Processing batch {start} to {end}")
+        started_at = time.monotonic()
+        try:
             self._docs_collection.add(
-                documents=list(docs),
-                metadatas=metadatas,
-                ids=ids,
+                documents=docs[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end],
+                **({"embeddings": embeddings[start:end]} if embeddings is not None else {}),
             )
-        else:
-            logger.info("Using default embedding function")
-            batch_size = batch_size or self._batch_size
-
-            for i in range(0, len(docs), batch_size):
-                logger.info(f"Processing batch {i} to {i + batch_size}")
-                self._docs_collection.add(
-                    documents=docs[i : i + batch_size],
-                    metadatas=metadatas[i : i + batch_size],
-                    ids=ids[i : i + batch_size],
-                )
+        except Exception as e:
+            if end - start <= 1 or not is_token_limit_error(e):
+                raise
 
-        return list(ids)
+            logger.info(f"Batch {start} to {end} exceeds the embedding token limit, splitting it")
+            sizer.shrink(end - start)
+            middle = (start + end) // 2
+            self._add_batch(sizer, docs, ids, metadatas, embeddings, start, middle)
+            self._add_batch(sizer, docs, ids, metadatas, embeddings, middle, end)
+            return
+
+        # Only batches embedded here tell how fast the embedder is
+        if embeddings is None:
+            sizer.record(end - start, time.monotonic() - started_at)
 
     def delete_docs(
         self, ids: Optional[List[str]] = None, where: Optional[dict] = None
@@ -169,6 +336,36 @@ class ChromaDB(VectorStore):
             relevant_data, self._similarity_threshold
         )
 
+    def get_relevant_docs_batch(
+        self, questions: List[str], where: Optional[dict] = None, k: int = None
+    ) -> List[dict]:
+        """
+        Returns the relevant documents of each question, embedding and querying
+        all the questions at once
+        """
+        if not questions:
+            return []
+
+        k = k or self._max_samples
+        query_args = {"where": where} if where else {}
+        relevant_data: chromadb.QueryResult = self._docs_collection.query(
+            query_texts=list(questions),
+            n_results=k,
+            include=["metadatas", "documents", "distances"],
+            **query_args,
+        )
+
+        return [
+            self._filter_docs_based_on_distance(
+                {
+                    key: [relevant_data[key][index]]
+                    for key in ["documents", "distances", "metadatas", "ids"]
+                },
+                self._similarity_threshold,
+            )
+            for index in range(len(questions))
+        ]
+
     def get_relevant_segments(
         self,
         question: str,
@@ -184,43 +381,137 @@ class ChromaDB(VectorStore):
             where=metadata_filter,
         )
 
+        hits = relevant_docs["metadatas"][0]
+        windows = self.get_sentence_windows(
+            relevant_docs["ids"][0],
+            relevant_docs["documents"][0],
+            hits,
+            num_surrounding_sentences,
+        )
+
         segments = []
         doc_ids = []
         metadatas = []
-        # Iterate over each document's metadata and fetch surrounding sentences
-        for index, metadata in enumerate(relevant_docs["metadatas"][0]):
-            pdf_content = ""
-            segment_data = [relevant_docs["documents"][0][index]]
-
-            # Get previous sentences
-            prev_id = metadata.get("previous_sentence_id")
-            for _ in range(num_surrounding_sentences):
-                if prev_id != -1:
-                    prev_sentence = self.get_relevant_docs_by_id(ids=[prev_id])
-                    segment_data = [prev_sentence["documents"][0]] + segment_data
-                    prev_id = prev_sentence["metadatas"][0].get(
-                        "previous_sentence_id", -1
+        for window, metadata in zip(windows, hits):
+            segments.append("\n" + " ".join(window))
+            doc_ids.append(metadata["asset_id"])
+            metadatas.append(metadata)
+
+        return (segments, doc_ids, metadatas)
+
+    def get_sentence_windows(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[dict],
+        num_surrounding_sentences: int,
+    ) -> List[List[str]]:
+        """
+        Return each sentence with up to num_surrounding_sentences sentences on both
+        sides, read from the sentence index of its asset when there is one.
+        """
+        windows = {}
+        sentence_indexes = {}
+        for index, metadata in enumerate(metadatas):
+            asset_id = metadata.get("asset_id")
+            if asset_id not in sentence_indexes:
+                sentence_indexes[asset_id] = (
+                    self.get_sentence_index(asset_id) if asset_id is not None else None
+                )
+            if sentence_indexes[asset_id]:
+                window = sentence_indexes[asset_id].window(
+                    ids[index], num_surrounding_sentences, num_surrounding_sentences
+                )
+                if window is not None:
+                    windows[index] = window
+
+        unindexed = [index for index in range(len(metadatas)) if index not in windows]
+        previous_sentences, next_sentences = self._get_surrounding_sentences(
+            [metadatas[index] for index in unindexed], num_surrounding_sentences
+        )
+        for position, index in enumerate(unindexed):
+            windows[index] = (
+                previous_sentences[position] + [documents[index]] + next_sentences[position]
+            )
+
+        return [windows[index] for index in range(len(metadatas))]
+
+    def _get_surrounding_sentences(
+        self, metadatas: List[dict], num_surrounding_sentences: int
+    ) -> Tuple[List[List[str]], List[List[str]]]:
+        """
+        Walk the previous/next sentence links of every hit at once, fetching all
+        the neighbours of one hop with a single get. Returns, for each hit, the
+        previous sentences in document order and the next sentences.
+        """
+        previous_sentences = [[] for _ in metadatas]
+        next_sentences = [[] for _ in metadatas]
+        prev_ids = [metadata.get("previous_sentence_id", -1) for metadata in metadatas]
+        next_ids = [metadata.get("next_sentence_id", -1) for metadata in metadatas]
+        fetched = {}
+
+        for _ in range(num_surrounding_sentences):
+            missing_ids = {
+                sentence_id
+                for sentence_id in prev_ids + next_ids
+                if sentence_id not in (-1, None) and sentence_id not in fetched
+            }
+            if missing_ids:
+                sentences = self.get_relevant_docs_by_id(ids=list(missing_ids))
+                fetched.update(
+                    zip(
+                        sentences["ids"],
+                        zip(sentences["documents"], sentences["metadatas"]),
                     )
+                )
+
+            for index, prev_id in enumerate(prev_ids):
+                if prev_id in fetched:
+                    document, metadata = fetched[prev_id]
+                    previous_sentences[index].insert(0, document)
+                    prev_ids[index] = metadata.get("previous_sentence_id", -1)
                 else:
-                    break
-
-            # Get next sentences
-            next_id = metadata.get("next_sentence_id")
-            for _ in range(num_surrounding_sentences):
-                if next_id != -1:
-                    next_sentence = self.get_relevant_docs_by_id(ids=[next_id])
-                    segment_data.append(next_sentence["documents"][0])
-                    next_id = next_sentence["metadatas"][0].get("next_sentence_id", -1)
+                    prev_ids[index] = -1
+
+            for index, next_id in enumerate(next_ids):
+                if next_id in fetched:
+                    document, metadata = fetched[next_id]
+                    next_sentences[index].append(document)
+                    next_ids[index] = metadata.get("next_sentence_id", -1)
                 else:
-                    break
+                    next_ids[index] = -1
 
-            # Add the segment data to the PDF content
-            pdf_content += "\n" + " ".join(segment_data)
-            segments.append(pdf_content)
-            doc_ids.append(metadata["asset_id"])
-            metadatas.append(metadata)
+            if all(sentence_id == -1 for sentence_id in prev_ids + next_ids):
+                break
 
-        return (segments, doc_ids, metadatas)
+        return previous_sentences, next_sentences
+
+    def _sentence_index_path(self, asset_id: int) -> str:
+        return os.path.join(
+            self._persist_directory,
+            "sentence_index",
+            self._collection_name,
+            f"{asset_id}.json",
+        )
+
+    def save_sentence_index(
+        self, asset_id: int, ids: List[str], docs: List[str], metadatas: List[dict]
+    ) -> SentenceIndex:
+        """
+        Persist the document order of the sentences of an asset next to the collection
+        """
+        sentence_index = SentenceIndex.build(asset_id, ids, docs, metadatas)
+        sentence_index.save(self._sentence_index_path(asset_id))
+        return sentence_index
+
+    def get_sentence_index(self, asset_id: int) -> Optional[SentenceIndex]:
+        return SentenceIndex.load(self._sentence_index_path(asset_id))
+
+    def delete_sentence_index(self, asset_id: int) -> None:
+        try:
+            os.remove(self._sentence_index_path(asset_id))
+        except FileNotFoundError:
+            pass
 
     def get_relevant_docs_by_id(self, ids: Iterable[str]) -> List[dict]:
         """
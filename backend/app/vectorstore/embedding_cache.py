@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+
+from app.logger import Logger
+
+try:
+    import fcntl
+except ImportError:  # Windows, appends are then only serialized within the process
+    fcntl = None
+
+logger = Logger()
+
+
+_default_embedding_function = None
+
+
+def embed_with_default_model(texts: List[str]) -> np.ndarray:
+    """
+    Embed texts with the default local model. Meant to run in worker processes,
+    each loading its own copy of the model on first use.
+    """
+    global _default_embedding_function
+    if _default_embedding_function is None:
+        _default_embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return np.asarray(_default_embedding_function(texts), dtype=np.float32)
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of float32 embeddings of one model.
+
+    Vectors are appended to `vectors.f32` and read back through a memory map,
+    the key of each row is appended to `keys.txt` once its vector is written.
+    Appends hold a lock file, so processes sharing the store add rows one at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.keys_path = os.path.join(path, "keys.txt")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.lock_path = os.path.join(path, "lock")
+        self.dimension: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self.row_count = 0
+        self._keys_size = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._sync()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self.lock_path, "a") as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def _sync(self) -> None:
+        """
+        Read the keys appended by other processes, then cut off what a crash left
+        behind: vectors without a key and keys without a vector, so that the nth
+        key always names the nth vector. Must be called with both locks held.
+        """
+        if self.dimension is None:
+            try:
+                with open(self.meta_path) as file:
+                    self.dimension = json.load(file)["dimension"]
+            except (OSError, ValueError, KeyError):
+                return
+
+        row_size = self.dimension * 4
+        try:
+            with open(self.keys_path, "rb") as file:
+                file.seek(self._keys_size)
+                # The last line is empty, or a key whose write was torn
+                lines = file.read().split(b"\n")[:-1]
+        except FileNotFoundError:
+            lines = []
+        try:
+            vectors_size = os.path.getsize(self.vectors_path)
+        except FileNotFoundError:
+            vectors_size = 0
+
+        for line in lines[: max(vectors_size // row_size - self.row_count, 0)]:
+            self.rows.setdefault(line.decode("utf-8"), self.row_count)
+            self.row_count += 1
+            self._keys_size += len(line) + 1
+
+        if os.path.exists(self.keys_path) and os.path.getsize(self.keys_path) > self._keys_size:
+            os.truncate(self.keys_path, self._keys_size)
+        if vectors_size > self.row_count * row_size:
+            os.truncate(self.vectors_path, self.row_count * row_size)
+
+    def _map(self) -> np.memmap:
+        if self._vectors is None or self._vectors.shape[0] < self.row_count:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.row_count, self.dimension),
+            )
+        return self._vectors
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self.rows.get(key)
+            if row is None:
+                return None
+            return self._map()[row].tolist()
+
+    def add(self, embeddings: Dict[str, List[float]]) -> None:
+        with self._lock, self._file_lock():
+            self._sync()
+            embeddings = {
+                key: embedding for key, embedding in embeddings.items() if key not in self.rows
+            }
+            if not embeddings:
+                return
+
+            if self.dimension is None:
+                self.dimension = len(next(iter(embeddings.values())))
+                with open(self.meta_path, "w") as file:
+                    json.dump({"dimension": self.dimension}, file)
+
+            vectors = np.asarray(list(embeddings.values()), dtype=np.float32)
+            if vectors.shape[1] != self.dimension:
+                logger.error(
+                    f"Skipping embeddings of dimension {vectors.shape[1]} in store of dimension {self.dimension}"
+                )
+                return
+
+            keys = "".join(f"{key}\n" for key in embeddings).encode("utf-8")
+            with open(self.vectors_path, "ab") as file:
+                file.write(vectors.tobytes())
+            with open(self.keys_path, "ab") as file:
+                file.write(keys)
+
+            for key in embeddings:
+                self.rows[key] = self.row_count
+                self.row_count += 1
+            self._keys_size += len(keys)
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Embedding function that remembers the embeddings of the texts it has seen.
+
+    Lookups go through a LRU memory tier, then an optional on-disk tier, and only
+    the texts missing from both are sent to the wrapped embedding function.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Callable[[Documents], Embeddings],
+        model_name: str,
+        memory_size: int = 10000,
+        store_path: Optional[str] = None,
+    ):
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self.store = None
+        if store_path:
+            try:
+                self.store = EmbeddingStore(store_path)
+            except OSError as e:
+                logger.error(f"Embedding cache store unavailable, using memory only: {e}")
+        self.counters = Counter()
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, embedding: List[float]) -> None:
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return embedding
+
+        embedding = self.store.get(key) if self.store else None
+        if embedding is not None:
+            self._remember(key, embedding)
+            with self._lock:
+                self.counters["disk_hits"] += 1
+        return embedding
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.embed(input)
+
+    def embed(
+        self,
+        input: Documents,
+        embed_missing: Optional[Callable[[Documents], Embeddings]] = None,
+    ) -> Embeddings:
+        """
+        Embed the texts, computing the ones missing from the cache with
+        embed_missing instead of the wrapped embedding function when given.
+        """
+        keys = [self._key(text) for text in input]
+        embeddings = [self._lookup(key) for key in keys]
+
+        missing = {}
+        for key, text, embedding in zip(keys, input, embeddings):
+            if embedding is None:
+                missing.setdefault(key, text)
+
+        if missing:
+            with self._lock:
+                self.counters["misses"] += len(missing)
+            computed = dict(
+                zip(
+                    missing,
+                    (
+                        [float(value) for value in embedding]
+                        for embedding in (embed_missing or self.embedding_function)(
+                            list(missing.values())
+                        )
+                    ),
+                )
+            )
+            for key, embedding in computed.items():
+                self._remember(key, embedding)
+            if self.store:
+                try:
+                    self.store.add(computed)
+                except OSError as e:
+                    logger.error(f"Failed to persist embeddings: {e}")
+
+            embeddings = [
+                embedding if embedding is not None else computed[key]
+                for key, embedding in zip(keys, embeddings)
+            ]
+
+        return embeddings
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self.store.rows) if self.store else 0,
+            "memory_hits": self.counters["memory_hits"],
+            "disk_hits": self.counters["disk_hits"],
+            "misses": self.counters["misses"],
+        }
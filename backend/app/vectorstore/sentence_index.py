@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+class SentenceIndex:
+    """
+    Document order of the sentences of one asset.
+
+    Keeps the vectorstore ids of the sentences in the order they appear in the
+    document, with their page numbers and their offsets in the asset text, so a
+    window around a sentence or the text of a page can be read by slicing
+    instead of following the previous/next sentence links in the vectorstore.
+    """
+
+    def __init__(
+        self,
+        asset_id: int,
+        ids: List[str],
+        page_numbers: List[int],
+        offsets: List[Tuple[int, int]],
+        text: str,
+    ):
+        self.asset_id = asset_id
+        self.ids = ids
+        self.page_numbers = page_numbers
+        self.offsets = [tuple(offset) for offset in offsets]
+        self.text = text
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(
+        cls, asset_id: int, ids: List[str], docs: List[str], metadatas: List[dict]
+    ) -> "SentenceIndex":
+        offsets = []
+        start = 0
+        for doc in docs:
+            offsets.append((start, start + len(doc)))
+            start += len(doc) + 1
+
+        return cls(
+            asset_id=asset_id,
+            ids=list(ids),
+            page_numbers=[metadata.get("page_number", 1) for metadata in metadatas],
+            offsets=offsets,
+            text="\n".join(docs),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, sentence_id: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {
+                sentence_id: position for position, sentence_id in enumerate(self.ids)
+            }
+        return self._positions.get(sentence_id)
+
+    def sentence(self, position: int) -> str:
+        start, end = self.offsets[position]
+        return self.text[start:end]
+
+    def window(self, sentence_id: str, before: int, after: int) -> Optional[List[str]]:
+        """
+        Return the sentence with up to `before` previous and `after` next sentences,
+        or None when the sentence is not part of the index.
+        """
+        position = self.position(sentence_id)
+        if position is None:
+            return None
+
+        return [
+            self.sentence(index)
+            for index in range(max(position - before, 0), min(position + after + 1, len(self)))
+        ]
+
+    def page_text(self, page_number: int) -> str:
+        return "\n".join(
+            self.sentence(position)
+            for position, sentence_page in enumerate(self.page_numbers)
+            if sentence_page == page_number
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(
+                {
+                    "asset_id": self.asset_id,
+                    "ids": self.ids,
+                    "page_numbers": self.page_numbers,
+                    "offsets": self.offsets,
+                    "text": self.text,
+                },
+                file,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SentenceIndex"]:
+        try:
+            with open(path) as file:
+                return cls(**json.load(file))
+        except (OSError, ValueError, TypeError):
+            return None
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -38,7 +38,7 @@ def field_description_request():
 
 
 @patch("app.repositories.project_repository.get_project")
-@patch("app.api.v1.extract.extract_field_descriptions")
+@patch("app.api.v1.extract.extract_field_descriptions_async", new_callable=AsyncMock)
 @patch("app.repositories.user_repository.get_user_api_key")
 def test_get_field_descriptions_success(
     mock_get_user_api_key,
@@ -93,7 +93,7 @@ def test_get_field_descriptions_project_not_found(
 
 
 @patch("app.repositories.project_repository.get_project")
-@patch("app.api.v1.extract.extract_field_descriptions")
+@patch("app.api.v1.extract.extract_field_descriptions_async", new_callable=AsyncMock)
 @patch("app.repositories.user_repository.get_user_api_key")
 def test_get_field_descriptions_exception(
     mock_get_user_api_key,
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -41,7 +41,7 @@ def extract_fields():
 
 @patch("app.repositories.project_repository.get_asset")
 @patch("app.repositories.project_repository.get_asset_content")
-@patch("app.api.v1.extract.extract_data")
+@patch("app.api.v1.extract.extract_data_async", new_callable=AsyncMock)
 @patch("app.repositories.user_repository.get_user_api_key")
 def test_extract_success(
     mock_get_user_api_key,
@@ -103,7 +103,7 @@ def test_extract_asset_permission_error(mock_get_asset, extract_fields, mock_db)
 @patch("app.repositories.project_repository.get_asset")
 @patch("app.repositories.project_repository.get_asset_content")
 @patch("app.repositories.user_repository.get_user_api_key")
-@patch("app.api.v1.extract.extract_data")
+@patch("app.api.v1.extract.extract_data_async", new_callable=AsyncMock)
 def test_extract_missing_content(
     mock_extract_data,
     mock_get_user_api_key,
@@ -130,7 +130,7 @@ def test_extract_missing_content(
 
 @patch("app.repositories.project_repository.get_asset")
 @patch("app.repositories.project_repository.get_asset_content")
-@patch("app.api.v1.extract.extract_data")
+@patch("app.api.v1.extract.extract_data_async", new_callable=AsyncMock)
 @patch("app.repositories.user_repository.get_user_api_key")
 def test_extract_exception(
     mock_get_user_api_key,
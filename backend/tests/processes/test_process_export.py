@@ -0,0 +1,223 @@
+import csv
+import json
+from datetime import date
+from io import StringIO
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import get_db
+from app.main import app
+from app.models import Asset, Process, ProcessStatus, ProcessStep, Project
+from app.models.process_step import ProcessStepStatus
+from app.processing.export_writers import iter_csv
+from app.processing.process_export import ProcessExport
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (Project, Asset, Process, ProcessStep):
+        model.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    with patch("app.processing.process_export.SessionLocal", factory):
+        yield factory
+
+
+@pytest.fixture
+def process(session_factory):
+    with session_factory() as db:
+        db.add(Project(id=1, name="Project"))
+        db.add_all(
+            [
+                Asset(id=1, filename="a.pdf", path="/a.pdf", project_id=1),
+                Asset(id=2, filename="b.pdf", path="/b.pdf", project_id=1),
+            ]
+        )
+        process = Process(
+            id=1,
+            type="extract",
+            status=ProcessStatus.COMPLETED,
+            project_id=1,
+            message="",
+            details={
+                "fields": [
+                    {"key": "date", "type": "date"},
+                    {"key": "total", "type": "number"},
+                    {"key": "name", "type": "text"},
+                ]
+            },
+        )
+        db.add(process)
+        db.add_all(
+            [
+                ProcessStep(
+                    id=1,
+                    process_id=1,
+                    asset_id=1,
+                    status=ProcessStepStatus.COMPLETED,
+                    output=[
+                        {"date": "March 3, 2024", "total": "12.0", "name": "x"},
+                        {"date": "", "total": "1.5", "name": "y"},
+                    ],
+                ),
+                ProcessStep(id=2, process_id=1, asset_id=2, status=ProcessStepStatus.FAILED),
+                ProcessStep(
+                    id=3,
+                    process_id=1,
+                    asset_id=2,
+                    status=ProcessStepStatus.COMPLETED,
+                    output=[{"date": "not a date", "total": "abc", "name": "z"}],
+                ),
+            ]
+        )
+        db.commit()
+        db.refresh(process)
+        yield process
+
+
+def test_iter_csv_writes_rows_in_chunks():
+    chunks = list(iter_csv(["a", "b"], ([i, f"v,{i}"] for i in range(5)), rows_per_chunk=2))
+
+    assert chunks[0] == "a,b\r\n"
+    assert len(chunks) == 4
+    assert list(csv.reader(StringIO("".join(chunks))))[1:] == [
+        [str(i), f"v,{i}"] for i in range(5)
+    ]
+
+
+def test_process_export_rows(session_factory, process):
+    with session_factory() as db:
+        export = ProcessExport.for_process(db, process, batch_size=1)
+
+    assert export.headers == [
+        "Filename",
+        "date",
+        "total",
+        "name",
+        "___process_step_id",
+        "___extraction_index",
+    ]
+    assert list(export.iter_rows()) == [
+        ["a.pdf", "03-03-2024", 12, "x", 1, 0],
+        ["a.pdf", "", 1.5, "y", 1, 1],
+        ["b.pdf", "not a date", "abc", "z", 3, 0],
+    ]
+
+
+def test_process_export_without_completed_steps(session_factory, process):
+    with session_factory() as db:
+        db.query(ProcessStep).update({ProcessStep.status: ProcessStepStatus.FAILED})
+        db.commit()
+        assert ProcessExport.for_process(db, process) is None
+
+
+def test_download_process_streams_csv(session_factory, process):
+    db = session_factory()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.get("/v1/processes/1/download-csv")
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == "attachment; filename=process_1.csv"
+    rows = list(csv.reader(StringIO(response.text)))
+    assert rows[0][0] == "Filename"
+    assert [row[-2] for row in rows[1:]] == ["1", "1", "3"]
+
+
+@patch("app.repositories.process_repository.get_process")
+def test_download_process_not_found(mock_get_process):
+    app.dependency_overrides[get_db] = lambda: MagicMock(spec=Session)
+    mock_get_process.return_value = None
+    try:
+        response = client.get("/v1/processes/1/download-csv")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json()["message"] == "Process not found"
+
+
+def export_process(session_factory, export_format):
+    db = session_factory()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        return client.get(f"/v1/processes/1/export?format={export_format}")
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+
+
+def test_export_process_ndjson(session_factory, process):
+    response = export_process(session_factory, "ndjson")
+
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0] == {
+        "Filename": "a.pdf",
+        "date": "2024-03-03",
+        "total": 12.0,
+        "name": "x",
+        "___process_step_id": 1,
+        "___extraction_index": 0,
+    }
+    assert (records[2]["date"], records[2]["total"]) == (None, None)
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_export_process_arrow_formats(session_factory, process, export_format):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    with patch("app.config.settings.export_row_group_size", 2):
+        response = export_process(session_factory, export_format)
+
+    assert response.status_code == 200
+    if export_format == "parquet":
+        parquet_file = pq.ParquetFile(pa.BufferReader(response.content))
+        assert parquet_file.metadata.num_row_groups == 2
+        table = parquet_file.read()
+    else:
+        table = pa.ipc.open_file(pa.BufferReader(response.content)).read_all()
+
+    assert table.schema.field("date").type == pa.date32()
+    assert table.schema.field("total").type == pa.float64()
+    assert table.schema.field("name").type == pa.string()
+    assert table.column("date").to_pylist() == [date(2024, 3, 3), None, None]
+    assert table.column("total").to_pylist() == [12.0, 1.5, None]
+    assert table.column("___process_step_id").to_pylist() == [1, 1, 3]
+
+
+def test_export_process_unknown_format(session_factory, process):
+    response = export_process(session_factory, "xlsx")
+
+    assert response.status_code == 400
+
+
+def test_process_export_uses_normalized_output(session_factory, process):
+    with session_factory() as db:
+        db.get(ProcessStep, 1).normalized_output = [
+            {"date": "2024-03-03", "total": 12.0},
+            {"date": None, "total": 1.5},
+        ]
+        db.get(ProcessStep, 3).normalized_output = [{"date": "2023-12-31", "total": 7.0}]
+        db.commit()
+        export = ProcessExport.for_process(db, process)
+
+    with patch("app.processing.normalization.parse_date") as mock_parse_date:
+        rows = list(export.iter_rows())
+
+    assert rows[2] == ["b.pdf", "31-12-2023", 7, "z", 3, 0]
+    mock_parse_date.assert_not_called()
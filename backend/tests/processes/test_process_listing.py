@@ -0,0 +1,105 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import get_db
+from app.main import app
+from app.models import Asset, Process, ProcessStatus, ProcessStep, Project
+from app.models.process_step import ProcessStepStatus
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (Project, Asset, Process, ProcessStep):
+        model.__table__.create(engine)
+
+    with sessionmaker(bind=engine)() as session:
+        session.add(Project(id=1, name="Project"))
+        session.add(Asset(id=1, filename="a.pdf", path="/a.pdf", project_id=1))
+        for process_id in (1, 2, 3):
+            session.add(
+                Process(
+                    id=process_id,
+                    type="extract",
+                    status=ProcessStatus.COMPLETED,
+                    project_id=1,
+                    message="",
+                    details={"fields": []},
+                    completed_step_count=5 if process_id == 1 else 0,
+                )
+            )
+        for step_id in range(1, 6):
+            session.add(
+                ProcessStep(
+                    id=step_id,
+                    process_id=1,
+                    asset_id=1,
+                    status=ProcessStepStatus.COMPLETED,
+                    output=[{"total": step_id}],
+                )
+            )
+        session.commit()
+
+        app.dependency_overrides[get_db] = lambda: session
+        yield session
+        app.dependency_overrides.clear()
+
+
+def test_get_processes_keyset_pagination():
+    response = client.get("/v1/processes/?limit=2")
+
+    assert response.status_code == 200
+    assert [process["id"] for process in response.json()["data"]] == [3, 2]
+    assert response.json()["next_cursor"] == 2
+
+    response = client.get("/v1/processes/?limit=2&cursor=2")
+
+    assert [process["id"] for process in response.json()["data"]] == [1]
+    assert response.json()["next_cursor"] is None
+
+
+def test_get_processes_field_projection():
+    response = client.get("/v1/processes/?fields=status,completed_step_count")
+
+    assert response.status_code == 200
+    assert response.json()["data"][2] == {"id": 1, "status": 3, "completed_step_count": 5}
+
+
+def test_get_processes_unknown_field():
+    response = client.get("/v1/processes/?fields=id,secret")
+
+    assert response.status_code == 400
+
+
+def test_get_processes_without_parameters_returns_everything():
+    data = client.get("/v1/processes/").json()["data"]
+
+    assert len(data) == 3
+    assert data[0]["details"] == {"fields": []}
+    assert data[0]["project"] == "Project"
+
+
+def test_get_process_steps_pages_leave_output_out():
+    response = client.get("/v1/processes/1/get-steps?limit=2&cursor=2")
+
+    assert response.status_code == 200
+    steps = response.json()["data"]
+    assert [step["id"] for step in steps] == [3, 4]
+    assert "output" not in steps[0]
+    assert response.json()["next_cursor"] == 4
+
+
+def test_get_process_steps_requested_output():
+    response = client.get("/v1/processes/1/get-steps?fields=output&limit=10")
+
+    assert response.json()["data"][0] == {"id": 1, "output": [{"total": 1}]}
+    assert response.json()["next_cursor"] is None
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.events import iter_events
+from app.database import get_db
+from app.main import app
+from app.models import ProcessStatus
+from app.processing.event_bus import EventBus, event_bus
+from app.repositories import process_repository
+
+client = TestClient(app)
+
+
+def test_events_reach_the_subscribers_of_their_project():
+    bus = EventBus()
+
+    async def listen():
+        project_subscription = bus.subscribe(1)
+        all_subscription = bus.subscribe()
+        assert bus.has_subscribers(1) and bus.has_subscribers(2)
+
+        # Published from worker threads, like the process steps
+        thread = threading.Thread(target=bus.publish, args=(2, "asset", {"asset_id": 5}))
+        thread.start()
+        thread.join()
+        bus.publish(1, "process", {"process_id": 3})
+
+        events = [await all_subscription.get(1), await all_subscription.get(1)]
+        project_event = await project_subscription.get(1)
+        assert await project_subscription.get(0.01) is None
+
+        bus.unsubscribe(project_subscription)
+        bus.unsubscribe(all_subscription)
+        return events, project_event
+
+    events, project_event = asyncio.run(listen())
+
+    assert [event["type"] for event in events] == ["asset", "process"]
+    assert project_event == {"type": "process", "project_id": 1, "data": {"process_id": 3}}
+    assert not bus.has_subscribers()
+
+
+def test_slow_subscribers_drop_the_oldest_events():
+    bus = EventBus(max_queue_size=2)
+
+    async def listen():
+        subscription = bus.subscribe(1)
+        for index in range(3):
+            bus.publish(1, "process", {"index": index})
+        await asyncio.sleep(0)
+        return subscription.dropped, [(await subscription.get(1))["data"]["index"] for _ in range(2)]
+
+    assert asyncio.run(listen()) == (1, [1, 2])
+
+
+def test_iter_events_streams_server_sent_events():
+    async def listen():
+        stream = iter_events(1, keepalive=0.01)
+        assert await stream.__anext__() == ": connected\n\n"
+        assert await stream.__anext__() == ": keepalive\n\n"
+
+        event_bus.publish(1, "process", {"process_id": 3, "status": 3})
+        message = await stream.__anext__()
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(listen())
+
+    event_line, data_line, _, _ = message.split("\n")
+    assert event_line == "event: process"
+    assert json.loads(data_line[len("data: "):])["data"] == {"process_id": 3, "status": 3}
+    assert not event_bus.has_subscribers(1)
+
+
+@patch("app.repositories.process_repository.event_bus")
+def test_update_process_status_publishes_event(mock_event_bus):
+    process = MagicMock(id=3, project_id=1)
+
+    process_repository.update_process_status(MagicMock(), process, ProcessStatus.COMPLETED)
+
+    mock_event_bus.publish.assert_called_once_with(
+        1, "process", {"process_id": 3, "status": ProcessStatus.COMPLETED.value}
+    )
+
+
+@patch("app.repositories.project_repository.get_project")
+def test_stream_events_project_not_found(mock_get_project):
+    mock_get_project.return_value = None
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+
+    response = client.get("/v1/events/?project_id=9")
+
+    app.dependency_overrides.clear()
+    assert response.status_code == 404
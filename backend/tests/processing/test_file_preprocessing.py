@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import threading
+from unittest.mock import DEFAULT, MagicMock, patch
+import pytest
+
+from app.models.asset_content import AssetProcessingStatus
+from app.processing.file_preprocessing import fetch_url_assets, preprocess_file, run_asset_batch
+from app.requests.schemas import TextExtractionResponse
+from app.utils import compute_file_hash
+
+
+@pytest.fixture
+def pdf_content():
+    return TextExtractionResponse(
+        content=[{"text": "Test sentence.", "metadata": {"page_number": 1}}],
+        word_count=2,
+        lang="en",
+    )
+
+
+@pytest.fixture
+def mock_preprocessing():
+    with patch("app.processing.file_preprocessing.SessionLocal"), patch(
+        "app.processing.file_preprocessing.project_repository"
+    ) as project_repository, patch(
+        "app.processing.file_preprocessing.user_repository"
+    ), patch(
+        "app.processing.file_preprocessing.segmentation_pipeline"
+    ) as segmentation_pipeline, patch(
+        "app.processing.file_preprocessing.compute_file_hash", return_value="abc"
+    ):
+        project_repository.get_asset.return_value = MagicMock(
+            id=1, path="/path/to/file.pdf", project_id=1, filename="file.pdf", details={}
+        )
+        yield project_repository, segmentation_pipeline
+
+
+def test_compute_file_hash(tmp_path):
+    file_path = tmp_path / "file.pdf"
+    file_path.write_bytes(b"Dummy PDF content")
+
+    assert compute_file_hash(file_path, chunk_size=4) == hashlib.sha256(b"Dummy PDF content").hexdigest()
+
+
+@patch("app.processing.file_preprocessing.cache_text_extraction")
+@patch("app.processing.file_preprocessing.extract_text_from_file")
+@patch("app.processing.file_preprocessing.get_cached_text_extraction")
+def test_preprocess_file_uses_cached_content(
+    mock_get_cached, mock_extract_text, mock_cache_text, mock_preprocessing, pdf_content
+):
+    project_repository, segmentation_pipeline = mock_preprocessing
+    mock_get_cached.return_value = pdf_content
+
+    preprocess_file(1)
+
+    mock_get_cached.assert_called_once_with("abc")
+    mock_extract_text.assert_not_called()
+    mock_cache_text.assert_not_called()
+    project_repository.update_or_add_asset_content.assert_called_with(
+        project_repository.update_or_add_asset_content.call_args[0][0], 1, pdf_content.model_dump()
+    )
+    segmentation_pipeline.submit.assert_called_once()
+
+
+@patch("app.processing.file_preprocessing.cache_text_extraction")
+@patch("app.processing.file_preprocessing.extract_text_from_file")
+@patch("app.processing.file_preprocessing.get_cached_text_extraction", return_value=None)
+def test_preprocess_file_caches_parsed_content(
+    mock_get_cached, mock_extract_text, mock_cache_text, mock_preprocessing, pdf_content
+):
+    _, segmentation_pipeline = mock_preprocessing
+    mock_extract_text.return_value = pdf_content
+
+    preprocess_file(1)
+
+    mock_extract_text.assert_called_once()
+    mock_cache_text.assert_called_once_with("abc", pdf_content)
+    segmentation_pipeline.submit.assert_called_once()
+
+
+@patch("app.processing.file_preprocessing.extract_text_from_file")
+@patch("app.processing.file_preprocessing.get_cached_text_extraction")
+def test_preprocess_file_uses_upload_hash(
+    mock_get_cached, mock_extract_text, mock_preprocessing, pdf_content
+):
+    project_repository, _ = mock_preprocessing
+    project_repository.get_asset.return_value.details = {"content_hash": "uploaded"}
+    mock_get_cached.return_value = pdf_content
+
+    preprocess_file(1)
+
+    mock_get_cached.assert_called_once_with("uploaded")
+
+
+@patch("app.processing.file_preprocessing.preprocess_file")
+@patch("app.processing.file_preprocessing.SessionLocal")
+@patch("app.processing.file_preprocessing.project_repository")
+def test_run_asset_batch_counts_assets(mock_project_repository, mock_session, mock_preprocess_file):
+    mock_project_repository.get_asset_batch.return_value = MagicMock(asset_ids=[1, 2])
+    statuses = {1: AssetProcessingStatus.PENDING, 2: AssetProcessingStatus.PENDING}
+    mock_project_repository.get_asset_content.side_effect = lambda db, asset_id: MagicMock(
+        processing=statuses[asset_id]
+    )
+
+    def preprocess(asset_id):
+        statuses[asset_id] = (
+            AssetProcessingStatus.FAILED if asset_id == 2 else AssetProcessingStatus.COMPLETED
+        )
+
+    mock_preprocess_file.side_effect = preprocess
+
+    run_asset_batch({"batch_id": 5})
+
+    assert sorted(call.args[0] for call in mock_preprocess_file.call_args_list) == [1, 2]
+    mock_project_repository.reset_asset_batch.assert_called_once()
+    assert sorted(
+        call.kwargs["failed"] for call in mock_project_repository.increment_asset_batch.call_args_list
+    ) == [False, True]
+
+
+@patch("app.processing.file_preprocessing.preprocess_file")
+@patch("app.processing.file_preprocessing.SessionLocal")
+@patch("app.processing.file_preprocessing.project_repository")
+def test_run_asset_batch_skips_failed_assets(mock_project_repository, mock_session, mock_preprocess_file):
+    mock_project_repository.get_asset_batch.return_value = MagicMock(asset_ids=[1])
+    mock_project_repository.get_asset_content.return_value = MagicMock(
+        processing=AssetProcessingStatus.FAILED
+    )
+
+    run_asset_batch({"batch_id": 5})
+
+    mock_preprocess_file.assert_not_called()
+    mock_project_repository.increment_asset_batch.assert_called_once_with(
+        mock_session.return_value.__enter__.return_value, 5, failed=True
+    )
+
+
+@patch("app.processing.file_preprocessing.readiness_tracker")
+@patch("app.processing.file_preprocessing.submit_asset_batch")
+@patch("app.processing.file_preprocessing.url_fetcher")
+@patch("app.processing.file_preprocessing.SessionLocal")
+@patch("app.processing.file_preprocessing.project_repository")
+def test_fetch_url_assets(
+    mock_project_repository, mock_session, mock_url_fetcher, mock_submit, mock_readiness_tracker
+):
+    url_assets = [
+        {"id": 1, "path": "/tmp/a.html", "details": {"url": "https://example.com/a"}},
+        {"id": 2, "path": "/tmp/b.html", "details": {"url": "https://example.com/b"}},
+    ]
+
+    async def fetch_all(downloads, validators):
+        assert downloads == [
+            ("https://example.com/a", "/tmp/a.html"),
+            ("https://example.com/b", "/tmp/b.html"),
+        ]
+        assert validators == [None, None]
+        return [
+            {
+                "not_modified": False,
+                "size": 10,
+                "content_hash": "abc",
+                "etag": None,
+                "last_modified": None,
+            },
+            Exception("timed out"),
+        ]
+
+    mock_url_fetcher.fetch_all = fetch_all
+    threads = []
+    mock_session.side_effect = lambda: threads.append(threading.get_ident()) or DEFAULT
+
+    asyncio.run(fetch_url_assets(7, url_assets))
+
+    # The results are recorded off the event loop thread
+    assert threads and threads[0] != threading.get_ident()
+    db = mock_session.return_value.__enter__.return_value
+    fetched, failed = mock_project_repository.update_asset.call_args_list
+    assert fetched.args == (db, 1)
+    assert fetched.kwargs["size"] == 10
+    assert fetched.kwargs["details"]["content_hash"] == "abc"
+    assert failed.kwargs["details"]["fetch_status"] == "failed"
+    mock_project_repository.update_asset_content_status.assert_called_once_with(
+        db, asset_id=2, status=AssetProcessingStatus.FAILED
+    )
+    mock_readiness_tracker.asset_failed.assert_called_once_with(2)
+    mock_submit.assert_called_once_with(7)
+
+
+@pytest.mark.parametrize(
+    "result, unchanged",
+    [
+        ({"not_modified": True, "etag": '"v1"', "last_modified": None}, True),
+        (
+            {"not_modified": False, "size": 3, "content_hash": "old", "etag": '"v2"', "last_modified": None},
+            True,
+        ),
+        (
+            {"not_modified": False, "size": 3, "content_hash": "new", "etag": '"v2"', "last_modified": None},
+            False,
+        ),
+    ],
+)
+@patch("app.processing.file_preprocessing.ChromaDB")
+@patch("app.processing.file_preprocessing.submit_asset_batch")
+@patch("app.processing.file_preprocessing.url_fetcher")
+@patch("app.processing.file_preprocessing.SessionLocal")
+@patch("app.processing.file_preprocessing.project_repository")
+def test_fetch_url_assets_refresh(
+    mock_project_repository, mock_session, mock_url_fetcher, mock_submit, mock_chroma, tmp_path, result, unchanged
+):
+    page = tmp_path / "a.html"
+    page.write_text("old")
+    details = {"url": "https://example.com/a", "content_hash": "old", "etag": '"v1"'}
+    url_asset = {
+        "id": 1,
+        "project_id": 2,
+        "path": str(page),
+        "details": details,
+        "refresh": True,
+        "reuse_content": True,
+    }
+
+    async def fetch_all(downloads, validators):
+        assert validators == [details]
+        return [result]
+
+    mock_url_fetcher.fetch_all = fetch_all
+
+    asyncio.run(fetch_url_assets(7, [url_asset]))
+
+    updated_details = mock_project_repository.update_asset.call_args.kwargs["details"]
+    assert updated_details["fetch_status"] == ("unchanged" if unchanged else "fetched")
+    if unchanged:
+        # The existing content and sentences are kept
+        mock_chroma.assert_not_called()
+        mock_project_repository.update_asset_content_status.assert_not_called()
+    else:
+        mock_chroma.return_value.delete_docs.assert_called_once_with(where={"asset_id": 1})
+        mock_project_repository.update_asset_content_status.assert_called_once_with(
+            mock_session.return_value.__enter__.return_value,
+            asset_id=1,
+            status=AssetProcessingStatus.PENDING,
+        )
+    mock_submit.assert_called_once_with(7)
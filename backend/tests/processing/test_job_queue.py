@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.queue_job import QueueJob, QueueJobStatus
+from app.processing.job_queue import JobQueue
+from app.repositories import queue_repository
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    QueueJob.__table__.create(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+def test_enqueue_job_deduplicates_active_key(db):
+    first = queue_repository.enqueue_job(db, "process", {"process_id": 1}, key="process:1")
+    second = queue_repository.enqueue_job(
+        db, "process", {"process_id": 1}, key="process:1", priority=5
+    )
+
+    assert first.id == second.id
+    assert second.priority == 5
+    assert db.query(QueueJob).count() == 1
+
+
+def test_enqueue_job_deduplicates_concurrent_key(db):
+    first = queue_repository.enqueue_job(db, "process", {"process_id": 1}, key="process:1")
+
+    # Both callers checked for an active job before either inserted it
+    with patch.object(queue_repository, "get_active_job", side_effect=[None, first]):
+        second = queue_repository.enqueue_job(db, "process", {"process_id": 1}, key="process:1")
+
+    assert second.id == first.id
+    assert db.query(QueueJob).count() == 1
+
+
+def test_claim_job_is_exclusive(db):
+    job = queue_repository.enqueue_job(db, "process", {"process_id": 1})
+
+    claimed = queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+
+    assert claimed.id == job.id
+    assert claimed.status == QueueJobStatus.LEASED
+    assert claimed.lease_owner == "worker-1"
+    assert claimed.attempts == 1
+    assert queue_repository.claim_job(db, "process", "worker-2", lease_seconds=60) is None
+
+
+def test_claim_job_respects_priority(db):
+    queue_repository.enqueue_job(db, "process", {"process_id": 1})
+    urgent = queue_repository.enqueue_job(db, "process", {"process_id": 2}, priority=10)
+
+    claimed = queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+
+    assert claimed.id == urgent.id
+
+
+def test_claim_job_ignores_delayed_jobs(db):
+    queue_repository.enqueue_job(db, "process", {"process_id": 1}, delay=60)
+
+    assert queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60) is None
+
+
+def test_expired_lease_is_reclaimed(db):
+    job = queue_repository.enqueue_job(db, "process", {"process_id": 1})
+    queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    claimed = queue_repository.claim_job(db, "process", "worker-2", lease_seconds=60)
+
+    assert claimed.id == job.id
+    assert claimed.lease_owner == "worker-2"
+    assert claimed.attempts == 2
+    assert not queue_repository.complete_job(db, job.id, "worker-1")
+    assert queue_repository.complete_job(db, job.id, "worker-2")
+
+
+def test_fail_job_retries_until_max_attempts(db):
+    job = queue_repository.enqueue_job(db, "process", {"process_id": 1}, max_attempts=2)
+
+    queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+    queue_repository.fail_job(db, job.id, "worker-1", "boom")
+    db.refresh(job)
+    assert job.status == QueueJobStatus.PENDING
+    assert job.last_error == "boom"
+
+    queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+    queue_repository.fail_job(db, job.id, "worker-1", "boom again")
+    db.refresh(job)
+    assert job.status == QueueJobStatus.FAILED
+
+
+def test_fail_exhausted_jobs(db):
+    job = queue_repository.enqueue_job(db, "process", {"process_id": 1}, max_attempts=1)
+    queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert queue_repository.claim_job(db, "process", "worker-2", lease_seconds=60) is None
+    assert [job.id for job in queue_repository.fail_exhausted_jobs(db, "process")] == [job.id]
+    db.refresh(job)
+    assert job.status == QueueJobStatus.FAILED
+
+
+def test_job_queue_run_next_completes_job(session_factory):
+    handler = MagicMock()
+    queue = JobQueue("process", handler, session_factory=session_factory, logger=MagicMock())
+
+    job_id = queue.enqueue({"process_id": 7}, key="process:7")
+
+    assert queue.run_next("worker-1") is True
+    handler.assert_called_once_with({"process_id": 7})
+    with session_factory() as db:
+        assert queue_repository.get_job(db, job_id).status == QueueJobStatus.COMPLETED
+
+    assert queue.run_next("worker-1") is False
+
+
+def test_job_queue_run_next_requeues_failed_job(session_factory):
+    handler = MagicMock(side_effect=ValueError("Test error"))
+    queue = JobQueue(
+        "process", handler, retry_delay=0, session_factory=session_factory, logger=MagicMock()
+    )
+
+    job_id = queue.enqueue({"process_id": 7})
+    queue.run_next("worker-1")
+
+    with session_factory() as db:
+        job = queue_repository.get_job(db, job_id)
+        assert job.status == QueueJobStatus.PENDING
+        assert "Test error" in job.last_error
+
+
+def test_job_queue_gives_up_on_exhausted_job(session_factory):
+    on_failure = MagicMock()
+    queue = JobQueue(
+        "process",
+        MagicMock(side_effect=ValueError("Test error")),
+        max_attempts=1,
+        session_factory=session_factory,
+        logger=MagicMock(),
+        on_failure=on_failure,
+    )
+
+    queue.enqueue({"process_id": 7})
+    queue.run_next("worker-1")
+
+    on_failure.assert_called_once_with({"process_id": 7})
+
+
+def test_job_queue_gives_up_on_expired_last_lease(session_factory):
+    on_failure = MagicMock()
+    queue = JobQueue(
+        "process",
+        MagicMock(),
+        max_attempts=1,
+        session_factory=session_factory,
+        logger=MagicMock(),
+        on_failure=on_failure,
+    )
+    job_id = queue.enqueue({"process_id": 7})
+    with session_factory() as db:
+        queue_repository.claim_job(db, "process", "worker-1", lease_seconds=60)
+        job = queue_repository.get_job(db, job_id)
+        job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+
+    assert queue.run_next("worker-2") is False
+    on_failure.assert_called_once_with({"process_id": 7})
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from app.processing.normalization import (
+    FieldNormalizer,
+    get_field_normalizer,
+    parse_date,
+)
+
+FIELDS = [
+    {"key": "date", "type": "date"},
+    {"key": "total", "type": "number"},
+    {"key": "name", "type": "text"},
+]
+
+
+def test_normalize_output():
+    normalizer = FieldNormalizer(FIELDS)
+
+    assert normalizer.normalize_output(
+        [
+            {"date": "March 3, 2024", "total": "12.5", "name": "x"},
+            {"date": "not a date", "total": "abc", "name": "y"},
+            {"date": None, "total": 4},
+        ]
+    ) == [
+        {"date": "2024-03-03", "total": 12.5},
+        {"date": None, "total": None},
+        {"date": None, "total": 4.0},
+    ]
+    assert normalizer.normalize_output(None) is None
+
+
+def test_parse_date_is_memoized():
+    parse_date.cache_clear()
+    normalizer = FieldNormalizer(FIELDS)
+
+    for _ in range(4):
+        assert normalizer.normalize_date("January 2024").startswith("2024-01-")
+
+    # The first value detects the language, the next ones are parsed in it
+    cache_info = parse_date.cache_info()
+    assert cache_info.misses == 2
+    assert cache_info.hits == 2
+
+
+def test_detected_language_is_pinned():
+    normalizer = FieldNormalizer(FIELDS)
+
+    assert normalizer.normalize_date("3 mars 2024") == "2024-03-03"
+    assert normalizer.language == "fr"
+
+    with patch(
+        "app.processing.normalization.parse_date", wraps=parse_date
+    ) as mock_parse_date:
+        assert normalizer.normalize_date("12 avril 2024") == "2024-04-12"
+    mock_parse_date.assert_called_once_with("12 avril 2024", ("fr",))
+
+    # Values in another language are still read
+    assert normalizer.normalize_date("April 12, 2024") == "2024-04-12"
+    assert normalizer.language == "fr"
+
+
+def test_get_field_normalizer_is_shared_per_process():
+    normalizer = get_field_normalizer(9001, FIELDS)
+
+    assert get_field_normalizer(9001, FIELDS) is normalizer
+    assert get_field_normalizer(9002, FIELDS) is not normalizer
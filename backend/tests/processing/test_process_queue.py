@@ -7,9 +7,14 @@ from app.processing.process_queue import (
     update_process_step_status,
     find_best_match_for_short_reference,
     vectorize_extraction_process_step,
+    extraction_cache_key,
+    get_cached_extraction,
+    extraction_cache_counters,
+    clear_extraction_cache,
+    fail_process_job,
 )
 from app.exceptions import CreditLimitExceededException
-from app.models import ProcessStepStatus
+from app.models import ProcessStatus, ProcessStepStatus
 
 @pytest.fixture
 def mock_logger():
@@ -41,14 +46,16 @@ def test_handle_exceptions_decorator_credit_limit(mock_logger):
 def test_extract_process(mock_chroma, mock_extract_data):
     mock_chroma_instance = Mock()
     mock_chroma.return_value = mock_chroma_instance
-    mock_chroma_instance.get_relevant_docs.return_value = {
+    mock_chroma_instance.get_relevant_docs_batch.return_value = [{
+        "ids": [["id1"]],
         "metadatas": [[{
             "page_number": 1,
             "previous_sentence_id": -1,
             "next_sentence_id": -1
         }]],
         "documents": [["Test document"]]
-    }
+    }]
+    mock_chroma_instance.get_sentence_windows.return_value = [["Test document"]]
     mock_extract_data.return_value = ExtractFieldsResponse(fields=[{"field1": "value1"}],
         references=[[{
         "name": "ESG_Reporting_Assurance",
@@ -69,7 +76,40 @@ def test_extract_process(mock_chroma, mock_extract_data):
     assert result["fields"] == [{"field1": "value1"}]
     assert result["context"] == [[{'name': 'ESG_Reporting_Assurance', 'sources': ['Assurance'], 'page_numbers': None}]]
     mock_extract_data.assert_called_once()
-    mock_chroma_instance.get_relevant_docs.assert_called()
+    mock_chroma_instance.get_relevant_docs_batch.assert_called_once()
+
+@patch('app.processing.process_queue.extract_data')
+@patch('app.processing.process_queue.ChromaDB')
+def test_extract_process_batches_field_queries(mock_chroma, mock_extract_data):
+    mock_chroma_instance = Mock()
+    mock_chroma.return_value = mock_chroma_instance
+
+    def relevant_docs(ids):
+        return {
+            "ids": [ids],
+            "documents": [[f"Doc {doc_id}." for doc_id in ids]],
+            "metadatas": [[{"asset_id": 1} for _ in ids]],
+        }
+
+    mock_chroma_instance.get_relevant_docs_batch.return_value = [
+        relevant_docs(["id1", "id2"]),
+        relevant_docs(["id2", "id3"]),
+    ]
+    mock_chroma_instance.get_sentence_windows.side_effect = (
+        lambda ids, documents, metadatas, num_surrounding_sentences: [[doc] for doc in documents]
+    )
+    mock_extract_data.return_value = ExtractFieldsResponse(fields=[{"field1": "value1"}], references=[])
+
+    process = Mock(id=1, project_id=1, details={"fields": [{"key": "field1"}, {"key": "field2"}]})
+    process_step = Mock(id=1, asset=Mock(id=1))
+    asset_content = Mock(content={"word_count": 1000, "content": []})
+
+    extract_process("api_key", process, process_step, asset_content)
+
+    assert mock_chroma_instance.get_relevant_docs_batch.call_args.args[0] == ["field1", "field2"]
+    mock_chroma_instance.get_relevant_docs.assert_not_called()
+    assert mock_chroma_instance.get_sentence_windows.call_args.args[0] == ["id1", "id2", "id3"]
+    assert mock_extract_data.call_args.kwargs["pdf_content"] == "\nDoc id1.\nDoc id2.\nDoc id3."
 
 def test_update_process_step_status():
     mock_db = Mock()
@@ -86,7 +126,8 @@ def test_update_process_step_status():
         mock_process_step,
         mock_status,
         output=mock_output,
-        output_references=mock_output_references
+        output_references=mock_output_references,
+        normalized_output=None,
     )
 
 @patch('app.processing.process_queue.re.findall')
@@ -285,3 +326,75 @@ def test_vectorize_extraction_process_step_empty_sources(mock_chroma_db):
 
     # Expected no calls to add_docs due to empty sources
     mock_vectorstore.add_docs.assert_not_called()
+
+
+def test_extraction_cache_key_is_canonical():
+    asset_content = Mock(content={"word_count": 2, "content": [{"text": "Test content"}]})
+    details = {"fields": [{"key": "field1", "type": "text"}], "output_type": "csv"}
+    reordered_details = {"output_type": "table", "fields": [{"type": "text", "key": "field1"}]}
+
+    key = extraction_cache_key(details, asset_content, "file.pdf")
+
+    assert key is not None
+    assert key == extraction_cache_key(reordered_details, asset_content, "file.pdf")
+    assert key != extraction_cache_key(
+        {**details, "multiple_fields": True}, asset_content, "file.pdf"
+    )
+    assert key != extraction_cache_key(
+        {"fields": [{"key": "field2", "type": "text"}]}, asset_content, "file.pdf"
+    )
+
+
+def test_extraction_cache_key_changes_with_content():
+    details = {"fields": [{"key": "field1", "type": "text"}]}
+
+    assert extraction_cache_key(
+        details, Mock(content={"content": [{"text": "a"}]}), "file.pdf"
+    ) != extraction_cache_key(details, Mock(content={"content": [{"text": "b"}]}), "file.pdf")
+
+
+@patch('app.processing.process_queue.compute_file_hash', return_value="abc")
+def test_extraction_cache_key_without_content_uses_file_hash(mock_compute_file_hash):
+    details = {"fields": [{"key": "field1", "type": "text"}]}
+
+    assert extraction_cache_key(details, Mock(content=None), "file.pdf") is not None
+    mock_compute_file_hash.assert_called_once_with("file.pdf")
+
+
+@patch('app.processing.process_queue.SessionLocal')
+@patch('app.processing.process_queue.cache_repository')
+def test_get_cached_extraction_counts_hits_and_misses(mock_cache_repository, mock_session):
+    extraction_cache_counters.clear()
+    mock_cache_repository.get_cache_entry.side_effect = [{"fields": [], "context": []}, None]
+
+    assert get_cached_extraction("key") == {"fields": [], "context": []}
+    assert get_cached_extraction("key") is None
+    assert extraction_cache_counters == {"hits": 1, "misses": 1}
+
+
+@patch('app.processing.process_queue.cache_repository')
+def test_clear_extraction_cache_resets_counters(mock_cache_repository):
+    extraction_cache_counters.update(hits=2, misses=1)
+    mock_cache_repository.clear_cache.return_value = 3
+    db = MagicMock()
+
+    assert clear_extraction_cache(db) == 3
+    mock_cache_repository.clear_cache.assert_called_once_with(db, "extraction")
+    assert not extraction_cache_counters
+
+
+@patch("app.processing.process_queue.process_repository")
+@patch("app.processing.process_queue.SessionLocal")
+def test_fail_process_job_marks_process_failed(mock_session, mock_process_repository):
+    process = MagicMock(status=ProcessStatus.IN_PROGRESS)
+    mock_process_repository.get_process.return_value = process
+
+    fail_process_job({"process_id": 7})
+
+    mock_process_repository.get_process.assert_called_once_with(
+        mock_session.return_value.__enter__.return_value, 7
+    )
+    assert mock_process_repository.update_process_status.call_args.args[1:3] == (
+        process,
+        ProcessStatus.FAILED,
+    )
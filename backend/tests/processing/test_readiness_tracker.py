@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock, patch
+
+from app.models import ProcessStatus
+from app.models.process_step import ProcessStepStatus
+from app.processing.process_queue import complete_process, release_steps
+from app.processing.readiness_tracker import ReadinessTracker
+
+
+def test_asset_ready_releases_only_its_waiting_steps():
+    tracker = ReadinessTracker(MagicMock())
+    handler = MagicMock()
+    tracker.set_release_handler(handler)
+    tracker.wait(1, {10: [100, 101], 11: [102]})
+    tracker.wait(2, {10: [200]})
+    # Steps already waiting are not counted twice
+    tracker.wait(1, {10: [100]})
+
+    tracker.asset_ready(10)
+
+    handler.assert_any_call(1, [100, 101], True)
+    handler.assert_any_call(2, [200], True)
+    assert handler.call_count == 2
+    assert tracker.has_waiting_steps(1)
+    assert not tracker.has_waiting_steps(2)
+
+    # Nothing waits for the asset anymore
+    tracker.asset_ready(10)
+    assert handler.call_count == 2
+
+
+def test_process_is_idle_once_its_last_step_finished():
+    tracker = ReadinessTracker(MagicMock())
+    tracker.set_release_handler(MagicMock())
+    tracker.start_steps(1, 1)
+    tracker.wait(1, {10: [100]})
+
+    assert not tracker.finish_step(1)
+
+    tracker.asset_ready(10)
+    assert not tracker.is_idle(1)
+    assert tracker.finish_step(1)
+
+
+def test_asset_failed_releases_steps_as_not_ready():
+    tracker = ReadinessTracker(MagicMock())
+    handler = MagicMock()
+    tracker.set_release_handler(handler)
+    tracker.wait(1, {10: [100]})
+
+    tracker.asset_failed(10)
+
+    handler.assert_called_once_with(1, [100], False)
+    assert tracker.is_idle(1)
+
+
+@patch("app.processing.process_queue.step_scheduler")
+@patch("app.processing.process_queue.user_repository")
+@patch("app.processing.process_queue.SessionLocal")
+def test_release_steps_submits_ready_steps(mock_session, mock_user_repository, mock_step_scheduler):
+    mock_user_repository.get_user_api_key.return_value = MagicMock(key="key")
+
+    release_steps(1, [100, 101], True)
+
+    assert mock_step_scheduler.submit.call_count == 2
+    assert [call.args[3] for call in mock_step_scheduler.submit.call_args_list] == [100, 101]
+
+
+@patch("app.processing.process_queue.complete_process")
+@patch("app.processing.process_queue.readiness_tracker")
+@patch("app.processing.process_queue.process_repository")
+@patch("app.processing.process_queue.SessionLocal")
+def test_release_steps_fails_steps_of_failed_assets(
+    mock_session, mock_process_repository, mock_tracker, mock_complete_process
+):
+    mock_tracker.is_idle.return_value = True
+
+    release_steps(1, [100], False)
+
+    mock_process_repository.update_process_step_status.assert_called_once()
+    assert mock_process_repository.update_process_step_status.call_args.args[2] == ProcessStepStatus.FAILED
+    mock_complete_process.assert_called_once_with(1)
+
+
+@patch("app.processing.process_queue.process_repository")
+@patch("app.processing.process_queue.SessionLocal")
+def test_complete_process_uses_failed_step_count(mock_session, mock_process_repository):
+    process = MagicMock(status=ProcessStatus.IN_PROGRESS, failed_step_count=1)
+    mock_process_repository.get_process.return_value = process
+
+    complete_process(1)
+
+    assert mock_process_repository.update_process_status.call_args.args[2] == ProcessStatus.FAILED
+
+    mock_process_repository.update_process_status.reset_mock()
+    process.status = ProcessStatus.STOPPED
+    complete_process(1)
+
+    mock_process_repository.update_process_status.assert_not_called()
@@ -0,0 +1,98 @@
+import threading
+from unittest.mock import MagicMock, patch
+import pytest
+
+from app.processing.segmentation_pipeline import SegmentationPipeline, store_segments
+
+
+SENTENCES = {
+    1: ["a1", "a2", "a3"],
+    2: ["b1", "b2", "b3"],
+    3: ["c1", "c2", "c3"],
+}
+
+
+def load_segments(project_id, asset_id, asset_file_name):
+    docs = SENTENCES[asset_id]
+    return docs, [{"asset_id": asset_id, "filename": asset_file_name} for _ in docs]
+
+
+@pytest.fixture
+def mock_pipeline():
+    embedding_function = MagicMock(
+        side_effect=lambda texts: [[float(len(text)), float(ord(text[0]))] for text in texts]
+    )
+    vectorstore = MagicMock(collection_embedding_function=embedding_function, uses_default_embeddings=False)
+    stored = {}
+    done = threading.Event()
+
+    def store_segments(vectorstore, asset_id, docs, metadatas, embeddings=None, batch_size=None):
+        stored[asset_id] = (docs, embeddings)
+        if len(stored) == len(SENTENCES):
+            done.set()
+
+    with patch("app.processing.segmentation_pipeline.load_segments", side_effect=load_segments), patch(
+        "app.processing.segmentation_pipeline.store_segments", side_effect=store_segments
+    ), patch("app.processing.segmentation_pipeline.ChromaDB", return_value=vectorstore):
+        pipeline = SegmentationPipeline(workers=2, batch_size=4, batch_wait=0.05, use_processes=False)
+        yield pipeline, embedding_function, stored, done
+        pipeline.stop()
+
+
+def test_batches_sentences_across_assets(mock_pipeline):
+    pipeline, embedding_function, stored, done = mock_pipeline
+
+    for asset_id in SENTENCES:
+        pipeline.submit(1, asset_id, f"file-{asset_id}.pdf")
+
+    assert done.wait(5)
+    assert sorted(len(call.args[0]) for call in embedding_function.call_args_list) == [1, 4, 4]
+    for asset_id, (docs, embeddings) in stored.items():
+        assert docs == SENTENCES[asset_id]
+        assert embeddings == [[float(len(text)), float(ord(text[0]))] for text in docs]
+
+
+@patch("app.processing.segmentation_pipeline.readiness_tracker")
+@patch("app.processing.segmentation_pipeline.SessionLocal")
+@patch("app.processing.segmentation_pipeline.project_repository")
+def test_embedding_failure_marks_assets_failed(
+    mock_project_repository, mock_session, mock_readiness_tracker, mock_pipeline
+):
+    pipeline, embedding_function, stored, _ = mock_pipeline
+    embedding_function.side_effect = Exception("embedding failed")
+
+    pipeline.submit(1, 1, "file-1.pdf")
+    pipeline.stop()
+
+    assert stored == {}
+    assert mock_project_repository.update_asset_content_status.call_args.kwargs["asset_id"] == 1
+    mock_readiness_tracker.asset_failed.assert_called_once_with(1)
+    assert pipeline.get_progress(1) is None
+
+
+@patch("app.processing.segmentation_pipeline.readiness_tracker")
+@patch("app.processing.segmentation_pipeline.SessionLocal")
+@patch("app.processing.segmentation_pipeline.project_repository")
+def test_store_segments_releases_waiting_steps(
+    mock_project_repository, mock_session, mock_readiness_tracker
+):
+    store_segments(MagicMock(), 1, ["a1"], [{"asset_id": 1}])
+
+    assert mock_project_repository.update_asset_content_status.call_args.kwargs["asset_id"] == 1
+    mock_readiness_tracker.asset_ready.assert_called_once_with(1)
+
+
+def test_reports_progress_until_stored(mock_pipeline):
+    pipeline, embedding_function, _, _ = mock_pipeline
+    release = threading.Event()
+    side_effect = embedding_function.side_effect
+    embedding_function.side_effect = lambda texts: release.wait(5) and side_effect(texts)
+
+    pipeline.submit(1, 1, "file-1.pdf")
+
+    assert pipeline.get_progress(1)["asset_id"] == 1
+    assert pipeline.get_progress(1)["status"] in ("queued", "embedding")
+
+    release.set()
+    pipeline.stop()
+    assert pipeline.get_progress(1) is None
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import wait
+from unittest.mock import MagicMock
+import pytest
+from app.processing.step_scheduler import StepScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return StepScheduler(1, MagicMock())
+
+
+def test_submit_returns_result(scheduler):
+    future = scheduler.submit(1, lambda a, b: a + b, 1, 2)
+
+    assert future.result(timeout=5) == 3
+
+
+def test_submit_propagates_exception(scheduler):
+    def failing_step():
+        raise ValueError("Test error")
+
+    future = scheduler.submit(1, failing_step)
+
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+
+
+def block_worker(scheduler, process_id):
+    """Keep the only worker busy until the returned event is set"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_step():
+        started.set()
+        release.wait()
+
+    future = scheduler.submit(process_id, blocking_step)
+    started.wait(timeout=5)
+    return future, release
+
+
+def test_steps_are_interleaved_between_processes(scheduler):
+    executed = []
+
+    def step(name):
+        executed.append(name)
+
+    blocker, release = block_worker(scheduler, 1)
+    futures = [scheduler.submit(1, step, f"a{index}") for index in range(3)]
+    futures.append(scheduler.submit(2, step, "b0"))
+
+    release.set()
+    wait([blocker, *futures], timeout=5)
+
+    assert executed == ["a0", "b0", "a1", "a2"]
+
+
+def test_weighted_process_gets_more_turns(scheduler):
+    executed = []
+
+    def step(name):
+        executed.append(name)
+
+    blocker, release = block_worker(scheduler, 3)
+    futures = [scheduler.submit(1, step, f"a{index}", weight=2) for index in range(4)]
+    futures += [scheduler.submit(2, step, f"b{index}") for index in range(2)]
+
+    release.set()
+    wait([blocker, *futures], timeout=5)
+
+    assert executed == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+def test_in_flight_never_exceeds_limit():
+    scheduler = StepScheduler(2, MagicMock())
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def step():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.01)
+        with lock:
+            running[0] -= 1
+
+    futures = [scheduler.submit(process_id % 3, step) for process_id in range(12)]
+    wait(futures, timeout=5)
+
+    assert all(future.done() for future in futures)
+    assert peak[0] <= 2
+    assert not scheduler.queues
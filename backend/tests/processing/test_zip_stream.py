@@ -0,0 +1,34 @@
+import io
+import zipfile
+
+from app.processing.zip_stream import iter_zip
+
+
+def test_iter_zip_streams_entries(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF" + b"x" * 5000)
+    text = tmp_path / "b.txt"
+    text.write_bytes(b"y" * 5000)
+
+    chunks = list(
+        iter_zip(
+            [(str(pdf), "a.pdf"), (str(tmp_path / "missing.pdf"), "missing.pdf"), (str(text), "b.txt")],
+            prefetch=1,
+            chunk_size=1024,
+        )
+    )
+
+    assert len(chunks) > 2
+    assert all(chunks)
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["a.pdf", "b.txt"]
+        assert archive.read("a.pdf") == pdf.read_bytes()
+        assert archive.read("b.txt") == text.read_bytes()
+        # PDFs are already compressed and stored as they are
+        assert archive.getinfo("a.pdf").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("b.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.testzip() is None
+
+
+def test_iter_zip_without_existing_files(tmp_path):
+    assert list(iter_zip([(str(tmp_path / "missing.pdf"), "missing.pdf")])) == []
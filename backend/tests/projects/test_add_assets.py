@@ -9,6 +9,8 @@ from io import BytesIO
 from app.main import app
 from app.config import settings
 from app.database import get_db
+from app.models.asset_content import AssetProcessingStatus
+from app.utils import FileTooLargeError
 
 # Test client setup
 client = TestClient(app)
@@ -48,24 +50,23 @@ def override_get_db(mock_db):
 
 
 @patch("app.repositories.project_repository.get_project")
-@patch("app.api.v1.projects.open")
+@patch("app.repositories.project_repository.add_assets")
+@patch("app.api.v1.projects.save_stream")
 @patch("app.api.v1.projects.os.makedirs")
-@patch("app.api.v1.projects.os.path")
-@patch("app.api.v1.projects.process_file")
+@patch("app.api.v1.projects.submit_asset_batch")
 def test_upload_files_success(
-    mock_preprocess_file,
-    mock_os_path,
+    mock_submit_asset_batch,
     mock_makedirs,
-    mock_open,
+    mock_save_stream,
+    mock_add_assets,
     mock_get_project,
     mock_file,
     mock_db,
 ):
     """Test uploading files successfully"""
     mock_get_project.return_value = MagicMock(id=1)
-    mock_open.return_value.__enter__.return_value.write = MagicMock()
-    mock_os_path.normcase.return_value = "normalized/path"
-    mock_os_path.join.return_value = "joined/path"
+    mock_save_stream.return_value = ("abc", 17)
+    mock_add_assets.return_value = ([MagicMock(id=1)], MagicMock(id=5))
 
     response = client.post(
         "/v1/projects/1/assets",
@@ -76,9 +77,89 @@ def test_upload_files_success(
     assert response.json() == "Successfully uploaded the files"
 
     # Check if the file was saved
-    mock_open.assert_called_once_with(
-        os.path.join(settings.upload_dir, "1", "test.pdf"), "wb"
+    assert mock_save_stream.call_args.args[1] == os.path.join(settings.upload_dir, "1", "test.pdf")
+    assert mock_add_assets.call_args.args[1:] == (
+        1,
+        [
+            {
+                "filename": "test.pdf",
+                "path": os.path.join(settings.upload_dir, "1", "test.pdf"),
+                "size": 17,
+                "details": {"content_hash": "abc"},
+            }
+        ],
     )
+    mock_submit_asset_batch.assert_called_once_with(5)
+
+
+@patch("app.repositories.project_repository.get_project")
+@patch("app.repositories.project_repository.add_assets")
+@patch("app.api.v1.projects.save_stream")
+@patch("app.api.v1.projects.os.makedirs")
+@patch("app.api.v1.projects.submit_asset_batch")
+def test_bulk_upload_files_returns_batch(
+    mock_submit_asset_batch,
+    mock_makedirs,
+    mock_save_stream,
+    mock_add_assets,
+    mock_get_project,
+    mock_db,
+):
+    """Test uploading several files as one batch"""
+    mock_get_project.return_value = MagicMock(id=1)
+    mock_save_stream.return_value = ("abc", 17)
+    mock_add_assets.return_value = ([MagicMock(id=1), MagicMock(id=2)], MagicMock(id=5))
+
+    response = client.post(
+        "/v1/projects/1/assets/bulk",
+        files=[
+            ("files", ("a.pdf", BytesIO(b"a"), "application/pdf")),
+            ("files", ("b.pdf", BytesIO(b"b"), "application/pdf")),
+        ],
+    )
+
+    assert response.status_code == 201
+    assert response.json()["data"] == {"batch_id": 5, "asset_ids": [1, 2]}
+    assert len(mock_add_assets.call_args.args[2]) == 2
+    mock_submit_asset_batch.assert_called_once_with(5)
+
+
+@patch("app.repositories.project_repository.get_asset_batch")
+def test_get_asset_batch(mock_get_asset_batch, mock_db):
+    """Test reading the preprocessing progress of a batch"""
+    mock_get_asset_batch.return_value = MagicMock(
+        id=5, project_id=1, asset_ids=[1, 2], total=2, processed=1, failed=0
+    )
+
+    response = client.get("/v1/projects/1/assets/batches/5")
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "id": 5,
+        "asset_ids": [1, 2],
+        "total": 2,
+        "processed": 1,
+        "failed": 0,
+    }
+
+
+@patch("app.repositories.project_repository.get_project")
+@patch("app.api.v1.projects.os.makedirs")
+@patch("app.api.v1.projects.save_stream")
+def test_upload_files_too_large_while_streaming(
+    mock_save_stream, mock_makedirs, mock_get_project, mock_file, mock_db
+):
+    """Test uploading a file found too large while it is written"""
+    mock_get_project.return_value = MagicMock(id=1)
+    mock_save_stream.side_effect = FileTooLargeError("too large")
+
+    response = client.post(
+        "/v1/projects/1/assets",
+        files={"files": ("test.pdf", mock_file.file, "application/pdf")},
+    )
+
+    assert response.status_code == 400
+    mock_db.commit.assert_not_called()
 
 
 @patch("app.repositories.project_repository.get_project")
@@ -107,3 +188,104 @@ def test_upload_files_non_pdf(mock_get_project, mock_non_pdf_file, mock_db):
 
     assert response.status_code == 400
     assert response.json() == {"detail": "The file 'test.txt' is not a valid PDF. Please upload only PDF files."}
+
+
+@patch("app.repositories.project_repository.get_project")
+@patch("app.repositories.project_repository.get_url_assets")
+@patch("app.repositories.project_repository.add_assets")
+@patch("app.api.v1.projects.fetch_url_assets")
+@patch("app.api.v1.projects.os.makedirs")
+def test_add_url_asset_returns_before_fetching(
+    mock_makedirs, mock_fetch_url_assets, mock_add_assets, mock_get_url_assets, mock_get_project, mock_db
+):
+    """Test that URL assets are created and downloaded in the background"""
+    mock_get_project.return_value = MagicMock(id=1)
+    mock_get_url_assets.return_value = {}
+    mock_add_assets.return_value = ([MagicMock(id=3), MagicMock(id=4)], MagicMock(id=9))
+
+    urls = ["https://example.com/a", "https://example.com/b"]
+    response = client.post("/v1/projects/1/assets/url", json={"url": urls})
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "batch_id": 9,
+        "assets": [
+            {"url": urls[0], "asset_id": 3, "status": "queued"},
+            {"url": urls[1], "asset_id": 4, "status": "queued"},
+        ],
+    }
+    batch_id, url_assets = mock_fetch_url_assets.call_args.args
+    assert batch_id == 9
+    assert [asset["id"] for asset in url_assets] == [3, 4]
+    assert [asset["details"]["url"] for asset in url_assets] == urls
+
+
+@patch("app.repositories.project_repository.get_project")
+@patch("app.repositories.project_repository.add_assets")
+def test_add_url_asset_invalid_url(mock_add_assets, mock_get_project, mock_db):
+    """Test that invalid URLs are rejected before any asset is created"""
+    mock_get_project.return_value = MagicMock(id=1)
+
+    response = client.post("/v1/projects/1/assets/url", json={"url": ["not a url"]})
+
+    assert response.status_code == 400
+    mock_add_assets.assert_not_called()
+
+
+@patch("app.repositories.project_repository.get_project")
+@patch("app.repositories.project_repository.get_url_assets")
+@patch("app.repositories.project_repository.add_assets")
+@patch("app.api.v1.projects.fetch_url_assets")
+@patch("app.api.v1.projects.os.makedirs")
+def test_add_url_asset_refreshes_existing_assets(
+    mock_makedirs, mock_fetch_url_assets, mock_add_assets, mock_get_url_assets, mock_get_project, mock_db
+):
+    """Test that URLs already in the project refresh their asset instead of adding one"""
+    mock_get_project.return_value = MagicMock(id=1)
+    completed = MagicMock(
+        id=3,
+        project_id=1,
+        path="/uploads/1/a.html",
+        details={"url": "https://example.com/a", "etag": '"v1"'},
+    )
+    completed.content.processing = AssetProcessingStatus.COMPLETED
+    in_progress = MagicMock(id=4, details={"url": "https://example.com/b"})
+    in_progress.content.processing = AssetProcessingStatus.IN_PROGRESS
+    mock_get_url_assets.return_value = {
+        "https://example.com/a": completed,
+        "https://example.com/b": in_progress,
+    }
+    mock_add_assets.return_value = ([], MagicMock(id=9))
+
+    response = client.post(
+        "/v1/projects/1/assets/url",
+        json={"url": ["https://example.com/a", "https://example.com/b"]},
+    )
+
+    assert response.status_code == 200
+    assert [asset["status"] for asset in response.json()["data"]["assets"]] == [
+        "refreshing",
+        "processing",
+    ]
+    mock_add_assets.assert_called_once_with(mock_db, 1, [], [3])
+    _, url_assets = mock_fetch_url_assets.call_args.args
+    assert url_assets == [
+        {
+            "id": 3,
+            "project_id": 1,
+            "path": "/uploads/1/a.html",
+            "details": {"url": "https://example.com/a", "etag": '"v1"'},
+            "refresh": True,
+            "reuse_content": True,
+        }
+    ]
+
+
+@patch("app.repositories.project_repository.get_asset")
+def test_refresh_url_asset_rejects_files(mock_get_asset, mock_db):
+    """Test that only URL assets can be refreshed"""
+    mock_get_asset.return_value = MagicMock(project_id=1, type="pdf")
+
+    response = client.post("/v1/projects/1/assets/2/refresh")
+
+    assert response.status_code == 400
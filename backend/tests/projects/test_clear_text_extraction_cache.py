@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.database import get_db
+
+# Test client setup
+client = TestClient(app)
+
+
+@pytest.fixture
+def mock_db():
+    """Fixture to mock the database session"""
+    db = MagicMock(spec=Session)
+    return db
+
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    """Override the get_db dependency with the mock"""
+
+    def _override_get_db():
+        return mock_db
+
+    app.dependency_overrides[get_db] = _override_get_db
+    yield
+    app.dependency_overrides.clear()
+
+
+@patch("app.processing.file_preprocessing.cache_repository.clear_cache")
+def test_clear_text_extraction_cache(mock_clear_cache, mock_db):
+    """Test clearing the cached text extraction results"""
+    mock_clear_cache.return_value = 3
+
+    response = client.delete("/v1/projects/text-extraction-cache")
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {"deleted": 3}
+    mock_clear_cache.assert_called_once_with(mock_db, "text_extraction")
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.asset_content import AssetProcessingStatus
+
+client = TestClient(app)
+
+
+@patch("app.api.v1.projects.segmentation_pipeline")
+@patch("app.repositories.project_repository.get_asset")
+def test_get_asset_progress_from_pipeline(mock_get_asset, mock_pipeline):
+    mock_get_asset.return_value = MagicMock(id=1, project_id=1)
+    mock_pipeline.get_progress.return_value = {
+        "asset_id": 1,
+        "status": "embedding",
+        "sentences": 10,
+        "embedded": 4,
+    }
+
+    response = client.get("/v1/projects/1/assets/1/progress")
+
+    assert response.status_code == 200
+    assert response.json()["data"]["embedded"] == 4
+
+
+@patch("app.api.v1.projects.segmentation_pipeline")
+@patch("app.repositories.project_repository.get_asset_content")
+@patch("app.repositories.project_repository.get_asset")
+def test_get_asset_progress_from_stored_status(mock_get_asset, mock_get_asset_content, mock_pipeline):
+    mock_get_asset.return_value = MagicMock(id=1, project_id=1)
+    mock_get_asset_content.return_value = MagicMock(processing=AssetProcessingStatus.COMPLETED)
+    mock_pipeline.get_progress.return_value = None
+
+    response = client.get("/v1/projects/1/assets/1/progress")
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {"asset_id": 1, "status": "completed"}
+
+
+@patch("app.repositories.project_repository.get_asset")
+def test_get_asset_progress_other_project(mock_get_asset):
+    mock_get_asset.return_value = MagicMock(id=1, project_id=2)
+
+    response = client.get("/v1/projects/1/assets/1/progress")
+
+    assert response.status_code == 404
@@ -32,6 +32,7 @@ def test_get_processes_success(mock_get_processes, mock_get_project, mock_db):
         completed_at="2023-08-13T12:00:00Z",
         created_at="2023-08-13T08:00:00Z",
         updated_at="2023-08-13T13:00:00Z",
+        completed_step_count=10,
     )
     mock_process_2 = MagicMock(
         id=2,
@@ -44,8 +45,9 @@ def test_get_processes_success(mock_get_processes, mock_get_project, mock_db):
         completed_at=None,
         created_at="2023-08-13T08:00:00Z",
         updated_at="2023-08-13T13:00:00Z",
+        completed_step_count=5,
     )
-    mock_get_processes.return_value = [(mock_process_1, 10), (mock_process_2, 5)]
+    mock_get_processes.return_value = [mock_process_1, mock_process_2]
 
     response = client.get("/v1/projects/1/processes")
 
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.cache_entry import CacheEntry
+from app.repositories import cache_repository
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    CacheEntry.__table__.create(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def test_get_cache_entry_miss(db):
+    assert cache_repository.get_cache_entry(db, "parse", "missing") is None
+
+
+def test_set_and_get_cache_entry(db):
+    cache_repository.set_cache_entry(db, "parse", "abc", {"word_count": 3})
+
+    assert cache_repository.get_cache_entry(db, "parse", "abc") == {"word_count": 3}
+    assert cache_repository.get_cache_entry(db, "other", "abc") is None
+    assert cache_repository.get_cache_stats(db, "parse")["hits"] == 1
+
+
+def test_set_cache_entry_overwrites(db):
+    cache_repository.set_cache_entry(db, "parse", "abc", {"word_count": 3})
+    cache_repository.set_cache_entry(db, "parse", "abc", {"word_count": 4})
+
+    assert cache_repository.get_cache_entry(db, "parse", "abc") == {"word_count": 4}
+    assert cache_repository.get_cache_stats(db, "parse")["entries"] == 1
+
+
+def test_eviction_removes_least_recently_used(db):
+    value = {"text": "x" * 100}
+    for key in ["a", "b", "c"]:
+        cache_repository.set_cache_entry(db, "parse", key, value)
+
+    # Make "a" the most recently used entry
+    db.query(CacheEntry).filter(CacheEntry.key == "a").update(
+        {CacheEntry.last_used_at: datetime.utcnow() + timedelta(minutes=1)}
+    )
+    db.commit()
+
+    entry_size = db.query(CacheEntry).first().size
+    evicted = cache_repository.evict_cache_entries(db, "parse", max_size=entry_size * 2)
+
+    assert evicted == 1
+    assert cache_repository.get_cache_entry(db, "parse", "b") is None
+    assert cache_repository.get_cache_entry(db, "parse", "a") == value
+    assert cache_repository.get_cache_entry(db, "parse", "c") == value
+
+
+def test_set_cache_entry_enforces_max_size(db):
+    value = {"text": "x" * 100}
+    for key in ["a", "b", "c"]:
+        cache_repository.set_cache_entry(db, "parse", key, value, max_size=250)
+
+    stats = cache_repository.get_cache_stats(db, "parse")
+    assert stats["entries"] == 2
+    assert stats["size"] <= 250
+
+
+def test_clear_cache(db):
+    cache_repository.set_cache_entry(db, "parse", "a", {"text": "a"})
+    cache_repository.set_cache_entry(db, "extract", "a", {"text": "a"})
+
+    assert cache_repository.clear_cache(db, "parse") == 1
+    assert cache_repository.get_cache_stats(db, "extract")["entries"] == 1
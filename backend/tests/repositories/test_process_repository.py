@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Asset, Process, ProcessStatus, ProcessStep, Project
+from app.models.process_step import ProcessStepStatus
+from app.repositories import process_repository
+from app.schemas.process import ProcessData
+
+
+def step_counts(process):
+    return (
+        process.pending_step_count,
+        process.in_progress_step_count,
+        process.completed_step_count,
+        process.failed_step_count,
+    )
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (Project, Asset, Process, ProcessStep):
+        model.__table__.create(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(Project(id=1, name="Project"))
+        for asset_id in (1, 2, 3):
+            session.add(
+                Asset(id=asset_id, filename=f"{asset_id}.pdf", path=f"/{asset_id}.pdf", project_id=1)
+            )
+        session.add(
+            Process(id=1, type="extract", status=ProcessStatus.PENDING, project_id=1, message="")
+        )
+        session.commit()
+        yield session
+
+
+def test_step_counts_follow_step_status(db):
+    process_repository.create_process_steps(db, 1, [1, 2, 3])
+    process = process_repository.get_process(db, 1)
+    db.refresh(process)
+    assert step_counts(process) == (3, 0, 0, 0)
+
+    steps = db.query(ProcessStep).order_by(ProcessStep.id).all()
+    process_repository.update_process_step_status(db, steps[0], ProcessStepStatus.IN_PROGRESS)
+    process_repository.update_process_step_status(db, steps[0], ProcessStepStatus.COMPLETED)
+    process_repository.update_process_step_status(db, steps[1], ProcessStepStatus.FAILED)
+    # Same status again is not counted twice
+    process_repository.update_process_step_status(db, steps[1], ProcessStepStatus.FAILED)
+    db.refresh(process)
+    assert step_counts(process) == (1, 0, 1, 1)
+
+    process_repository.delete_process_steps(db, 1)
+    db.refresh(process)
+    assert step_counts(process) == (0, 0, 0, 0)
+
+
+def test_repair_step_counts(db):
+    process_repository.create_process_steps(db, 1, [1, 2, 3])
+    steps = db.query(ProcessStep).order_by(ProcessStep.id).all()
+    steps[0].status = ProcessStepStatus.COMPLETED
+    steps[1].status = ProcessStepStatus.IN_PROGRESS
+    db.commit()
+
+    assert process_repository.repair_step_counts(db) == [1]
+    process = process_repository.get_process(db, 1)
+    db.refresh(process)
+    assert step_counts(process) == (1, 1, 1, 0)
+
+    assert process_repository.repair_step_counts(db, [1]) == []
+
+
+@patch("app.repositories.process_repository.event_bus")
+def test_update_process_step_status_publishes_event(mock_event_bus, db):
+    mock_event_bus.has_subscribers.return_value = True
+    process_repository.create_process_steps(db, 1, [2])
+    step = db.query(ProcessStep).one()
+
+    process_repository.update_process_step_status(db, step, ProcessStepStatus.COMPLETED)
+
+    mock_event_bus.publish.assert_called_once_with(
+        1,
+        "process_step",
+        {"process_id": 1, "step_id": step.id, "asset_id": 2, "status": ProcessStepStatus.COMPLETED.value},
+    )
+
+
+def test_create_process_keeps_bypass_cache_out_of_details(db):
+    process = process_repository.create_process(
+        db,
+        ProcessData(
+            name="Process",
+            type="extract",
+            data={"fields": []},
+            project_id=1,
+            bypass_cache=True,
+        ),
+    )
+
+    assert process.bypass_cache is True
+    assert process.details == {"fields": []}
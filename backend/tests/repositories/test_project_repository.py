@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Asset, AssetBatch, AssetContent, Project
+from app.models.asset_content import AssetProcessingStatus
+from app.repositories import project_repository
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (Project, Asset, AssetContent, AssetBatch):
+        model.__table__.create(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(Project(id=1, name="Project"))
+        session.commit()
+        yield session
+
+
+def test_add_assets_inserts_assets_contents_and_batch(db):
+    assets, asset_batch = project_repository.add_assets(
+        db,
+        1,
+        [
+            {"filename": "a.pdf", "path": "/a.pdf", "size": 1},
+            {"filename": "b.html", "path": "/b.html", "type": "url", "details": {"url": "https://b"}},
+        ],
+    )
+
+    assert [asset.filename for asset in assets] == ["a.pdf", "b.html"]
+    assert assets[0].type == "pdf"
+    assert asset_batch.asset_ids == [asset.id for asset in assets]
+    assert asset_batch.total == 2
+    contents = db.query(AssetContent).order_by(AssetContent.asset_id).all()
+    assert [content.asset_id for content in contents] == asset_batch.asset_ids
+    assert all(content.processing == AssetProcessingStatus.PENDING for content in contents)
+
+
+def test_asset_batch_counters(db):
+    _, asset_batch = project_repository.add_assets(
+        db, 1, [{"filename": "a.pdf", "path": "/a.pdf"}, {"filename": "b.pdf", "path": "/b.pdf"}]
+    )
+
+    project_repository.increment_asset_batch(db, asset_batch.id)
+    project_repository.increment_asset_batch(db, asset_batch.id, failed=True)
+    db.refresh(asset_batch)
+    assert (asset_batch.processed, asset_batch.failed) == (2, 1)
+
+    project_repository.reset_asset_batch(db, asset_batch.id)
+    db.refresh(asset_batch)
+    assert (asset_batch.processed, asset_batch.failed) == (0, 0)
+
+
+def test_get_url_assets_and_refresh_batch(db):
+    assets, _ = project_repository.add_assets(
+        db,
+        1,
+        [
+            {"filename": "a.html", "path": "/a.html", "type": "url", "details": {"url": "https://a"}},
+            {"filename": "b.pdf", "path": "/b.pdf"},
+        ],
+    )
+
+    url_assets = project_repository.get_url_assets(db, 1, ["https://a", "https://c"])
+    assert {url: asset.id for url, asset in url_assets.items()} == {"https://a": assets[0].id}
+
+    new_assets, asset_batch = project_repository.add_assets(db, 1, [], [assets[0].id])
+    assert new_assets == []
+    assert (asset_batch.asset_ids, asset_batch.total) == ([assets[0].id], 1)
+
+
+def test_get_asset_content_statuses(db):
+    assets, _ = project_repository.add_assets(
+        db, 1, [{"filename": "a.pdf", "path": "/a.pdf"}, {"filename": "b.pdf", "path": "/b.pdf"}]
+    )
+
+    project_repository.update_asset_content_status(
+        db, AssetProcessingStatus.COMPLETED, asset_id=assets[0].id
+    )
+
+    assert project_repository.get_asset_content_statuses(db, [asset.id for asset in assets]) == {
+        assets[0].id: AssetProcessingStatus.COMPLETED,
+        assets[1].id: AssetProcessingStatus.PENDING,
+    }
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from unittest.mock import patch
+import httpx
+import pytest
+
+from app.exceptions import CreditLimitExceededException
+from app.requests import chat_query, extract_data, extract_data_async
+from app.requests.http_client import close_client, get_async_client, get_client
+
+
+def mock_client(handler, client_class=httpx.Client):
+    return client_class(transport=httpx.MockTransport(handler))
+
+
+def test_get_client_is_shared():
+    client = get_client()
+
+    assert get_client() is client
+
+    close_client()
+    assert get_client() is not client
+
+
+def test_get_async_client_is_shared():
+    assert get_async_client() is get_async_client()
+
+
+def test_extract_data_uses_shared_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"fields": [{"field1": "value1"}], "references": None})
+
+    with patch("app.requests.get_client", return_value=mock_client(handler)):
+        response = extract_data("api_key", {"fields": []}, pdf_content="Test content")
+
+    assert response.fields == [{"field1": "value1"}]
+    assert requests[0].url.path.endswith("/v1/extract")
+    assert requests[0].headers["x-authorization"] == "Bearer api_key"
+    assert b"pdf_content=Test+content" in requests[0].content
+
+
+def test_extract_data_credit_limit():
+    def handler(request):
+        return httpx.Response(402, json={"detail": "Credit limit exceeded!"})
+
+    with patch("app.requests.get_client", return_value=mock_client(handler)):
+        with pytest.raises(CreditLimitExceededException):
+            extract_data("api_key", {"fields": []}, pdf_content="Test content")
+
+
+def test_extract_data_async():
+    def handler(request):
+        return httpx.Response(201, json={"fields": [{"field1": "value1"}], "references": None})
+
+    client = mock_client(handler, httpx.AsyncClient)
+    with patch("app.requests.get_async_client", return_value=client):
+        response = asyncio.run(
+            extract_data_async("api_key", {"fields": []}, pdf_content="Test content")
+        )
+
+    assert response.fields == [{"field1": "value1"}]
+
+
+def test_extract_data_async_uploads_file(tmp_path):
+    file_path = tmp_path / "document.pdf"
+    file_path.write_bytes(b"%PDF-1.4 content")
+
+    def handler(request):
+        assert b"%PDF-1.4 content" in request.content
+        return httpx.Response(201, json={"fields": [], "references": None})
+
+    client = mock_client(handler, httpx.AsyncClient)
+    with patch("app.requests.get_async_client", return_value=client):
+        response = asyncio.run(extract_data_async("api_key", {"fields": []}, file_path=str(file_path)))
+
+    assert response.fields == []
+
+
+def test_chat_query():
+    def handler(request):
+        body = json.loads(request.content)
+        return httpx.Response(200, json={"response": body["query"], "references": []})
+
+    with patch("app.requests.get_client", return_value=mock_client(handler)):
+        assert chat_query("api_key", "hello", [])["response"] == "hello"
+
+
+def test_requests_use_client_timeout():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"response": "ok", "fields": [], "references": None})
+
+    client = httpx.Client(
+        transport=httpx.MockTransport(handler), timeout=httpx.Timeout(42, connect=3)
+    )
+    with patch("app.requests.get_client", return_value=client):
+        chat_query("api_key", "hello", [])
+        extract_data("api_key", {"fields": []})
+
+    for request in requests:
+        assert request.extensions["timeout"] == {"connect": 3, "read": 42, "write": 42, "pool": 42}
+
+
+def test_chat_query_error():
+    def handler(request):
+        return httpx.Response(500, text="error")
+
+    with patch("app.requests.get_client", return_value=mock_client(handler)):
+        with pytest.raises(Exception, match="Unable to process user query!"):
+            chat_query("api_key", "hello", [])
@@ -0,0 +1,125 @@
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+import httpx
+import pytest
+
+from app.exceptions import UpstreamServiceException
+from app.requests import extract_data
+from app.requests.rate_limiter import AdaptiveRateLimiter, backoff_delay, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("5") == 5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(tz=timezone.utc) + timedelta(seconds=30)
+
+    assert 25 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_backoff_delay_uses_retry_after():
+    assert backoff_delay(1, retry_after=7) == 7
+    assert backoff_delay(1, retry_after=120, max_delay=60) == 60
+
+
+def test_backoff_delay_is_jittered_exponential():
+    for attempt in range(1, 8):
+        delay = backoff_delay(attempt, base_delay=1, max_delay=10)
+        assert 0 <= delay <= min(10, 2 ** (attempt - 1))
+
+
+def test_throttle_shrinks_and_success_grows_window():
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=8)
+
+    limiter.acquire()
+    limiter.release(0.1, throttled=True)
+    assert limiter.concurrency_limit == 4
+
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert 5 < limiter.concurrency_limit <= 8
+
+
+def test_slow_responses_shrink_window():
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=8)
+
+    limiter.acquire()
+    limiter.release(0.1)
+    limiter.acquire()
+    limiter.release(5)
+
+    assert limiter.concurrency_limit < 8
+
+
+def test_window_never_below_min_concurrency():
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=4, min_concurrency=2)
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.1, throttled=True)
+
+    assert limiter.concurrency_limit == 2
+
+
+def test_acquire_blocks_at_concurrency_limit():
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    assert not acquired.wait(0.1)
+
+    limiter.release(0.1)
+    assert acquired.wait(1)
+
+
+def test_token_bucket_limits_rate():
+    limiter = AdaptiveRateLimiter(rate=20, burst=1, max_concurrency=10)
+
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(0)
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retry_after_pauses_callers():
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=4)
+
+    def send():
+        return httpx.Response(429, headers={"Retry-After": "0.2"})
+
+    limiter.call(send)
+
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_extract_data_raises_retryable_error():
+    def handler(request):
+        return httpx.Response(503, headers={"Retry-After": "3"}, text="busy")
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    limiter = AdaptiveRateLimiter(rate=0, burst=1, max_concurrency=4)
+    with patch("app.requests.get_client", return_value=client), patch(
+        "app.requests.pandaetl_rate_limiter", limiter
+    ):
+        with pytest.raises(UpstreamServiceException) as error:
+            extract_data("api_key", {"fields": []}, pdf_content="Test content")
+
+    assert error.value.status_code == 503
+    assert error.value.retry_after == 3
+    assert limiter.concurrency_limit == 2
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import os
+import httpx
+
+from app.requests.url_fetcher import UrlFetcher, UrlFetchError, normalize_url
+
+
+def make_fetcher(handler, **kwargs):
+    return UrlFetcher(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_normalize_url():
+    assert normalize_url("example.com") == "https://example.com"
+    assert normalize_url("http://example.com") == "http://example.com"
+
+
+def test_fetch_all_saves_pages(tmp_path):
+    def handler(request):
+        return httpx.Response(
+            200,
+            content=b"<html>" + request.url.path.encode() + b"</html>",
+            headers={"ETag": '"abc"', "Content-Type": "text/html"},
+        )
+
+    downloads = [(f"https://example.com/{i}", str(tmp_path / f"{i}.html")) for i in range(3)]
+    results = asyncio.run(make_fetcher(handler).fetch_all(downloads))
+
+    for i, result in enumerate(results):
+        content = f"<html>/{i}</html>".encode()
+        assert (tmp_path / f"{i}.html").read_bytes() == content
+        assert result["size"] == len(content)
+        assert result["content_hash"] == hashlib.sha256(content).hexdigest()
+        assert result["etag"] == '"abc"'
+    assert sorted(os.listdir(tmp_path)) == ["0.html", "1.html", "2.html"]
+
+
+def test_fetch_all_returns_errors_per_url(tmp_path):
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"ok")
+
+    results = asyncio.run(
+        make_fetcher(handler).fetch_all(
+            [
+                ("https://example.com/missing", str(tmp_path / "missing.html")),
+                ("https://example.com/page", str(tmp_path / "page.html")),
+            ]
+        )
+    )
+
+    assert isinstance(results[0], httpx.HTTPStatusError)
+    assert results[1]["size"] == 2
+    assert os.listdir(tmp_path) == ["page.html"]
+
+
+def test_fetch_all_enforces_max_size(tmp_path):
+    def handler(request):
+        if request.url.path == "/declared":
+            return httpx.Response(200, content=b"x" * 20)
+
+        async def chunks():
+            yield b"x" * 8
+            yield b"x" * 8
+
+        # Streamed without a Content-Length header
+        return httpx.Response(200, content=chunks())
+
+    results = asyncio.run(
+        make_fetcher(handler, max_size=10, chunk_size=8).fetch_all(
+            [
+                ("https://example.com/declared", str(tmp_path / "declared.html")),
+                ("https://example.com/streamed", str(tmp_path / "streamed.html")),
+            ]
+        )
+    )
+
+    assert all(isinstance(result, UrlFetchError) for result in results)
+    assert os.listdir(tmp_path) == []
+
+
+def test_fetch_all_limits_requests_per_host(tmp_path):
+    in_flight = {"example.com": 0, "other.com": 0}
+    peak = {"example.com": 0, "other.com": 0}
+
+    async def handler(request):
+        host = request.url.host
+        in_flight[host] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        return httpx.Response(200, content=b"ok")
+
+    downloads = [
+        (f"https://{host}/{i}", str(tmp_path / f"{host}-{i}.html"))
+        for host in in_flight
+        for i in range(5)
+    ]
+    results = asyncio.run(make_fetcher(handler, per_host_limit=2).fetch_all(downloads))
+
+    assert all(isinstance(result, dict) for result in results)
+    assert peak == {"example.com": 2, "other.com": 2}
+
+
+def test_fetch_all_conditional_requests(tmp_path):
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=b"new", headers={"ETag": '"v2"'})
+
+    page = tmp_path / "page.html"
+    page.write_bytes(b"old")
+    fetcher = make_fetcher(handler)
+
+    not_modified, modified = asyncio.run(
+        fetcher.fetch_all(
+            [("https://example.com/a", str(page)), ("https://example.com/b", str(page))],
+            validators=[{"etag": '"v1"'}, {"etag": '"v0"'}],
+        )
+    )
+
+    assert not_modified["not_modified"] is True
+    assert not_modified["etag"] == '"v1"'
+    assert modified["not_modified"] is False
+    assert modified["etag"] == '"v2"'
+    assert page.read_bytes() == b"new"
@@ -0,0 +1,28 @@
+import hashlib
+import os
+from io import BytesIO
+import pytest
+
+from app.utils import FileTooLargeError, save_stream
+
+
+def test_save_stream_hashes_and_renames(tmp_path):
+    destination = str(tmp_path / "file.pdf")
+    content = b"Dummy PDF content" * 100
+
+    content_hash, size = save_stream(BytesIO(content), destination, chunk_size=64)
+
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert size == len(content)
+    with open(destination, "rb") as file:
+        assert file.read() == content
+    assert os.listdir(tmp_path) == ["file.pdf"]
+
+
+def test_save_stream_too_large_keeps_nothing(tmp_path):
+    destination = str(tmp_path / "file.pdf")
+
+    with pytest.raises(FileTooLargeError):
+        save_stream(BytesIO(b"x" * 100), destination, chunk_size=16, max_size=50)
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+from app.config import Settings
+from app.vectorstore.batch_sizer import AdaptiveBatchSizer, is_token_limit_error
+from app.vectorstore.chroma import ChromaDB, clear_registry
+
+
+def test_batches_respect_size_and_char_budget():
+    sizer = AdaptiveBatchSizer(3, max_chars=10)
+    docs = ["aaaa", "bbbb", "cccc", "dddddddddddddddd", "e"]
+
+    assert sizer.next_batch_end(docs, 0) == 2
+    assert sizer.next_batch_end(docs, 2) == 3
+    # A single document over the budget still makes a batch
+    assert sizer.next_batch_end(docs, 3) == 4
+    assert sizer.next_batch_end(docs, 4) == 5
+
+
+def test_grows_while_latency_per_item_improves():
+    sizer = AdaptiveBatchSizer(4, max_size=64)
+
+    sizer.record(4, 4.0)
+    assert sizer.size == 8
+    sizer.record(8, 4.0)
+    assert sizer.size == 16
+    # No improvement: hold
+    sizer.record(16, 8.0)
+    assert sizer.size == 16
+    # Slower per item: shrink
+    sizer.record(16, 16.0)
+    assert sizer.size == 12
+
+
+def test_never_grows_past_max_size():
+    sizer = AdaptiveBatchSizer(4, max_size=6)
+
+    sizer.record(4, 4.0)
+
+    assert sizer.size == 6
+
+
+def test_is_token_limit_error():
+    assert is_token_limit_error(
+        Exception("This model's maximum context length is 8192 tokens")
+    )
+    assert is_token_limit_error(Exception("Requested 400000 tokens, max_tokens_per_request"))
+    assert not is_token_limit_error(Exception("Connection reset"))
+
+
+def test_add_docs_splits_batches_over_the_token_limit(monkeypatch):
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "test_key")
+    clear_registry()
+    chroma_db = ChromaDB(collection_name="token-limit", settings=Settings())
+    added = []
+
+    def add(documents, metadatas, ids):
+        if len(documents) > 2:
+            raise Exception("max_tokens_per_request exceeded")
+        added.append(documents)
+
+    chroma_db._docs_collection.add = MagicMock(side_effect=add)
+    docs = [f"doc{index}" for index in range(5)]
+
+    ids = chroma_db.add_docs(docs, metadatas=[{"filename": "test.pdf"} for _ in docs])
+
+    assert [doc for batch in added for doc in batch] == docs
+    assert len(ids) == 5
+    # Later calls start below the rejected size
+    added.clear()
+    chroma_db.add_docs(docs, metadatas=[{"filename": "test.pdf"} for _ in docs])
+    assert max(len(batch) for batch in added) <= 2
+    clear_registry()
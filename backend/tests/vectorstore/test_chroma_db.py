@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import MagicMock
 from app.config import Settings
-from app.vectorstore.chroma import ChromaDB
+from app.vectorstore.chroma import ChromaDB, clear_registry
 
 @pytest.fixture
 def mock_settings(monkeypatch):
@@ -13,7 +13,6 @@ def mock_settings(monkeypatch):
 
 def test_chroma_db_initialization(mock_settings):
     chroma_db = ChromaDB(settings=mock_settings)
-    assert chroma_db._batch_size == mock_settings.chroma_batch_size
     assert chroma_db._embedding_function.__class__.__name__ == "ONNXMiniLM_L6_V2"
 
 def test_chroma_db_with_openai_embeddings():
@@ -22,7 +21,7 @@ def test_chroma_db_with_openai_embeddings():
     assert chroma_db._embedding_function.__class__.__name__ == "OpenAIEmbeddingFunction"
 
 def test_add_docs_with_custom_batch_size(mock_settings):
-    chroma_db = ChromaDB(batch_size=3, settings=mock_settings)
+    chroma_db = ChromaDB(settings=mock_settings)
     docs = ["doc1", "doc2", "doc3", "doc4", "doc5"]
     ids = ["id1", "id2", "id3", "id4", "id5"]
     metadatas = [{"key": "value", "filename": "test.txt"} for _ in range(5)]
@@ -62,3 +61,112 @@ def test_max_file_size_setting(mock_settings):
 
 def test_chroma_batch_size_setting(mock_settings):
     assert mock_settings.chroma_batch_size == 10  # Set by the mock_settings fixture
+
+def test_chroma_db_shares_client_and_collection(mock_settings, tmp_path):
+    clear_registry()
+    persist_path = str(tmp_path / "chromadb")
+
+    first = ChromaDB(collection_name="shared", persist_path=persist_path, settings=mock_settings)
+    second = ChromaDB(collection_name="shared", persist_path=persist_path, settings=mock_settings)
+    other = ChromaDB(collection_name="other", persist_path=persist_path, settings=mock_settings)
+
+    assert first._client is second._client is other._client
+    assert first._docs_collection is second._docs_collection
+    assert other._docs_collection is not first._docs_collection
+
+    clear_registry()
+    assert ChromaDB(
+        collection_name="shared", persist_path=persist_path, settings=mock_settings
+    )._docs_collection is not first._docs_collection
+
+def test_chroma_db_reuses_openai_embedding_function():
+    settings = Settings(use_openai_embeddings=True, openai_api_key="test_key")
+
+    assert (
+        ChromaDB(settings=settings)._embedding_function
+        is ChromaDB(settings=settings)._embedding_function
+    )
+
+class KeywordEmbeddingFunction:
+    """Embeds a text as the one-hot vector of the first keyword it contains."""
+
+    keywords = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+    def __call__(self, input):
+        return [
+            [1.0 if keyword in text.split() else 0.0 for keyword in self.keywords]
+            for text in input
+        ]
+
+def test_get_relevant_segments_batches_neighbour_lookups(mock_settings, tmp_path):
+    chroma_db = ChromaDB(
+        collection_name="segments",
+        embedding_function=KeywordEmbeddingFunction(),
+        persist_path=str(tmp_path / "chromadb"),
+        settings=mock_settings,
+    )
+    docs = [f"{keyword} sentence" for keyword in KeywordEmbeddingFunction.keywords]
+    ids = [f"sentence-{index}" for index in range(len(docs))]
+    chroma_db.add_docs(
+        docs,
+        ids=ids,
+        metadatas=[{"asset_id": 1, "filename": "test.pdf"} for _ in docs],
+    )
+
+    get = MagicMock(wraps=chroma_db._docs_collection.get)
+    chroma_db._docs_collection.get = get
+    try:
+        segments, doc_ids, metadatas = chroma_db.get_relevant_segments(
+            "beta", k=1, num_surrounding_sentences=3
+        )
+    finally:
+        del chroma_db._docs_collection.get
+
+    assert segments == ["\nalpha sentence beta sentence gamma sentence delta sentence epsilon sentence"]
+    assert doc_ids == [1]
+    assert metadatas[0]["previous_sentence_id"] == "sentence-0"
+    # One lookup per hop instead of one per neighbour, stopping at the document start
+    assert get.call_count == 3
+
+def test_get_relevant_segments_uses_sentence_index(mock_settings, tmp_path):
+    chroma_db = ChromaDB(
+        collection_name="indexed-segments",
+        embedding_function=KeywordEmbeddingFunction(),
+        persist_path=str(tmp_path / "chromadb"),
+        settings=mock_settings,
+    )
+    docs = [f"{keyword} sentence" for keyword in KeywordEmbeddingFunction.keywords]
+    metadatas = [{"asset_id": 1, "filename": "test.pdf"} for _ in docs]
+    ids = chroma_db.add_docs(docs, metadatas=metadatas)
+    chroma_db.save_sentence_index(1, ids, docs, metadatas)
+
+    get = MagicMock(wraps=chroma_db._docs_collection.get)
+    chroma_db._docs_collection.get = get
+    try:
+        segments, _, _ = chroma_db.get_relevant_segments("epsilon", k=1, num_surrounding_sentences=2)
+    finally:
+        del chroma_db._docs_collection.get
+
+    assert segments == ["\ngamma sentence delta sentence epsilon sentence zeta sentence eta sentence"]
+    get.assert_not_called()
+
+    chroma_db.delete_sentence_index(1)
+    assert chroma_db.get_sentence_index(1) is None
+
+def test_get_relevant_docs_batch_embeds_all_questions_at_once(mock_settings, tmp_path):
+    embedding_function = MagicMock(wraps=KeywordEmbeddingFunction())
+    chroma_db = ChromaDB(
+        collection_name="batch",
+        embedding_function=KeywordEmbeddingFunction(),
+        persist_path=str(tmp_path / "chromadb"),
+        settings=mock_settings,
+    )
+    docs = [f"{keyword} sentence" for keyword in KeywordEmbeddingFunction.keywords]
+    chroma_db.add_docs(docs, metadatas=[{"asset_id": 1, "filename": "test.pdf"} for _ in docs])
+    chroma_db._docs_collection._embedding_function = embedding_function
+
+    results = chroma_db.get_relevant_docs_batch(["beta", "eta"], where={"asset_id": 1}, k=2)
+
+    embedding_function.assert_called_once()
+    assert [result["documents"] for result in results] == [[["beta sentence"]], [["eta sentence"]]]
+    assert chroma_db.get_relevant_docs_batch([]) == []
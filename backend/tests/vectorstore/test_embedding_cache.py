@@ -0,0 +1,115 @@
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from app.config import Settings
+from app.vectorstore.chroma import ChromaDB, clear_registry, get_embedding_cache_stats
+from app.vectorstore.embedding_cache import CachedEmbeddingFunction, EmbeddingStore
+
+
+def fake_embeddings(input):
+    return [[float(len(text)), float(text.count("a")), 0.5] for text in input]
+
+
+def as_lists(embeddings):
+    return [[float(value) for value in embedding] for embedding in embeddings]
+
+
+def test_memory_tier_only_embeds_missing_texts():
+    embedding_function = MagicMock(side_effect=fake_embeddings)
+    cached = CachedEmbeddingFunction(embedding_function, "fake", memory_size=10)
+
+    assert as_lists(cached(["alpha", "beta", "alpha"])) == [[5.0, 2.0, 0.5], [4.0, 1.0, 0.5], [5.0, 2.0, 0.5]]
+    assert as_lists(cached(["beta", "gamma"])) == [[4.0, 1.0, 0.5], [5.0, 2.0, 0.5]]
+
+    assert [call.args[0] for call in embedding_function.call_args_list] == [["alpha", "beta"], ["gamma"]]
+    assert cached.stats()["memory_hits"] == 1
+    assert cached.stats()["misses"] == 3
+
+
+def test_memory_tier_evicts_least_recently_used():
+    embedding_function = MagicMock(side_effect=fake_embeddings)
+    cached = CachedEmbeddingFunction(embedding_function, "fake", memory_size=2)
+
+    cached(["a"])
+    cached(["b"])
+    cached(["a"])
+    cached(["c"])
+    cached(["a"])
+    cached(["b"])
+
+    assert embedding_function.call_count == 4
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    store_path = str(tmp_path / "fake")
+    cached = CachedEmbeddingFunction(fake_embeddings, "fake", store_path=store_path)
+    cached(["alpha", "beta"])
+
+    embedding_function = MagicMock(side_effect=fake_embeddings)
+    restarted = CachedEmbeddingFunction(embedding_function, "fake", store_path=store_path)
+
+    assert as_lists(restarted(["beta", "alpha"])) == [[4.0, 1.0, 0.5], [5.0, 2.0, 0.5]]
+    embedding_function.assert_not_called()
+    assert restarted.stats()["disk_hits"] == 2
+    assert restarted.stats()["disk_entries"] == 2
+
+
+def test_disk_tier_ignores_partially_written_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.add({"key1": [1.0, 2.0], "key2": [3.0, 4.0]})
+    with open(store.keys_path, "a") as file:
+        file.write("key3\n")
+
+    reloaded = EmbeddingStore(str(tmp_path))
+
+    assert reloaded.get("key2") == [3.0, 4.0]
+    assert reloaded.get("key3") is None
+
+    reloaded.add({"key4": [5.0, 6.0]})
+    assert EmbeddingStore(str(tmp_path)).get("key4") == [5.0, 6.0]
+
+
+def test_disk_tier_drops_vectors_without_key(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.add({"key1": [1.0, 2.0]})
+    # Torn write: the vector reached the disk, its key did not
+    with open(store.vectors_path, "ab") as file:
+        file.write(np.asarray([[9.0, 9.0]], dtype=np.float32).tobytes())
+    with open(store.keys_path, "a") as file:
+        file.write("key")
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    reloaded.add({"key2": [3.0, 4.0]})
+
+    assert reloaded.get("key2") == [3.0, 4.0]
+    assert EmbeddingStore(str(tmp_path)).get("key2") == [3.0, 4.0]
+    assert os.path.getsize(store.vectors_path) == 2 * 2 * 4
+
+
+def test_disk_tier_shared_between_stores(tmp_path):
+    first = EmbeddingStore(str(tmp_path))
+    second = EmbeddingStore(str(tmp_path))
+
+    first.add({"key1": [1.0, 2.0]})
+    second.add({"key2": [3.0, 4.0], "key1": [1.0, 2.0]})
+    first.add({"key3": [5.0, 6.0]})
+
+    assert first.get("key2") == [3.0, 4.0]
+    assert second.get("key1") == [1.0, 2.0]
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert [reloaded.get(key) for key in ("key1", "key2", "key3")] == [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+
+
+def test_chroma_db_caches_default_embeddings(monkeypatch, tmp_path):
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+    settings = Settings(embedding_cache_dir=str(tmp_path / "embeddings"))
+    clear_registry()
+
+    chroma_db = ChromaDB(persist_path=str(tmp_path / "chromadb"), settings=settings)
+
+    assert isinstance(chroma_db._docs_collection._embedding_function, CachedEmbeddingFunction)
+    assert chroma_db._docs_collection._embedding_function.embedding_function is chroma_db._embedding_function
+    assert get_embedding_cache_stats()[0]["model"] == "all-MiniLM-L6-v2"
+    clear_registry()
@@ -0,0 +1,38 @@
+from app.vectorstore.sentence_index import SentenceIndex
+
+
+def build_index():
+    return SentenceIndex.build(
+        7,
+        ["id0", "id1", "id2", "id3", "id4"],
+        ["Zero.", "One.", "Two.", "Three.", "Four."],
+        [{"page_number": 1}, {"page_number": 1}, {"page_number": 2}, {"page_number": 2}, {}],
+    )
+
+
+def test_window_is_sliced_from_document_order():
+    sentence_index = build_index()
+
+    assert sentence_index.window("id2", 1, 1) == ["One.", "Two.", "Three."]
+    assert sentence_index.window("id0", 3, 1) == ["Zero.", "One."]
+    assert sentence_index.window("id4", 1, 3) == ["Three.", "Four."]
+    assert sentence_index.window("unknown", 1, 1) is None
+
+
+def test_page_text_is_rebuilt_from_offsets():
+    sentence_index = build_index()
+
+    assert sentence_index.page_text(2) == "Two.\nThree."
+    assert sentence_index.page_text(1) == "Zero.\nOne.\nFour."
+    assert sentence_index.page_text(3) == ""
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index" / "7.json")
+    build_index().save(path)
+
+    sentence_index = SentenceIndex.load(path)
+
+    assert sentence_index.asset_id == 7
+    assert sentence_index.window("id1", 1, 1) == ["Zero.", "One.", "Two."]
+    assert SentenceIndex.load(str(tmp_path / "missing.json")) is None